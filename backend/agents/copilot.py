@@ -2,7 +2,43 @@ from __future__ import annotations
 
 import asyncio
 import os
-from typing import Any, List, Optional, Tuple
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.deadline import (
+    MAX_DEADLINE_SECONDS,
+    Deadline,
+    DeadlineExceeded,
+    LatencyWindow,
+    request_deadline,
+)
+from agents.prompt_budget import AssembledPrompt, PromptAssembler
+from observability.metrics import (
+    COPILOT_CONTEXT_DROPPED_TOTAL,
+    COPILOT_HEDGES_TOTAL,
+    COPILOT_PATH_TOTAL,
+    COPILOT_PROMPT_TOKENS,
+    COPILOT_SPAN_SECONDS,
+)
+
+
+SYSTEM_PROMPT = (
+    "You are a healthcare sustainability copilot. "
+    "Give concise, practical recommendations."
+)
+# Every degraded answer starts with this, so callers can tell it from advice.
+UNAVAILABLE_PREFIX = "Copilot is temporarily unavailable"
+# RAG path samples needed before the hedge delay follows their percentile.
+HEDGE_MIN_SAMPLES = 20
+
+
+@dataclass
+class CopilotAnswer:
+    answer: str
+    sources: List[str]
+    # Tokens in the prompt sent for this answer; None if no prompt was sent.
+    prompt_tokens: Optional[int] = None
 
 
 class SustainabilityCopilot:
@@ -29,6 +65,24 @@ class SustainabilityCopilot:
         self._require_rag = self._env_truthy(
             os.getenv("GREENHEALTH_REQUIRE_RAG", "true")
         )
+        # "client": retrieve chunks from the RAG server and assemble a
+        # token-budgeted prompt here. "server": let the RAG server build the
+        # prompt; only the telemetry part is budgeted.
+        self._prompt_assembly = (
+            os.getenv("GREENHEALTH_PROMPT_ASSEMBLY", "client").strip().lower()
+        )
+        self._assembler = PromptAssembler()
+        # With GREENHEALTH_REQUIRE_RAG off, race a direct LLM call against a
+        # RAG path that is slower than GREENHEALTH_COPILOT_HEDGE_PERCENTILE of
+        # its recent calls (a fixed delay until enough calls were seen).
+        self._hedge = self._env_truthy(os.getenv("GREENHEALTH_COPILOT_HEDGE", "true"))
+        self._hedge_percentile = (
+            float(os.getenv("GREENHEALTH_COPILOT_HEDGE_PERCENTILE", "95")) / 100.0
+        )
+        self._hedge_initial_delay = float(
+            os.getenv("GREENHEALTH_COPILOT_HEDGE_DELAY_SECONDS", "5")
+        )
+        self._rag_latency = LatencyWindow()
         self._startup_error: Optional[str] = None
         self._ensure_env()
         self._rag_client = self._build_rag_client()
@@ -60,7 +114,9 @@ class SustainabilityCopilot:
             return None
 
         try:
-            return RAGClient(url=rag_url, timeout=90)
+            # Calls are cut off at the request deadline; this only bounds the
+            # worker thread that is left behind.
+            return RAGClient(url=rag_url, timeout=MAX_DEADLINE_SECONDS)
         except Exception as exc:  # pragma: no cover - runtime environment issue
             self._startup_error = str(exc)
             return None
@@ -70,44 +126,298 @@ class SustainabilityCopilot:
         question: str,
         department: Optional[str] = None,
         live_context: Optional[str] = None,
-    ) -> Tuple[str, List[str]]:
-        enriched_question = self._build_enriched_question(
-            question=question,
-            department=department,
-            live_context=live_context,
-        )
+        deadline: Optional[Deadline] = None,
+    ) -> CopilotAnswer:
+        deadline = deadline or request_deadline()
+        if self._hedge and not self._require_rag and self._rag_client is not None:
+            return await self._answer_hedged(question, department, live_context, deadline)
+
+        answer = await self._rag_path(question, department, live_context, deadline)
+        self._record_path("rag", answer)
+        if answer is not None:
+            return answer
+        answer = await self._fallback(question, department, live_context, deadline)
+        if not self._require_rag:
+            self._record_path("llm", answer)
+        return answer
+
+    @property
+    def uses_retrieval(self) -> bool:
+        """Whether answers need `retrieve` first (client-side prompt assembly)."""
+        return self._prompt_assembly != "server" and self._rag_client is not None
+
+    @staticmethod
+    def retrieval_query(question: str) -> str:
+        # Policies are looked up by the question alone; the department only
+        # shapes the telemetry part of the prompt. The same question asked
+        # for several departments therefore shares one retrieval.
+        return " ".join(question.split())
+
+    async def retrieve(self, query: str, deadline: Optional[Deadline] = None) -> Optional[List[Dict]]:
+        """Chunks for `query` from the RAG server, or None if retrieval failed."""
+        if self._rag_client is None:
+            return None
+        deadline = deadline or request_deadline()
+        try:
+            with COPILOT_SPAN_SECONDS.time(span="retrieve"):
+                docs = await deadline.run(
+                    asyncio.to_thread(
+                        self._rag_client.retrieve,
+                        query=query,
+                        k=self._assembler.budget.retrieve_k,
+                    )
+                )
+        except Exception as exc:
+            self._startup_error = str(exc)
+            return None
+        return [doc for doc in docs if isinstance(doc, dict)] if isinstance(docs, list) else []
+
+    async def answer_with_documents(
+        self,
+        question: str,
+        department: Optional[str],
+        live_context: Optional[str],
+        chunks: Optional[List[Dict]],
+        deadline: Optional[Deadline] = None,
+    ) -> CopilotAnswer:
+        """Answer from already retrieved `chunks` (None: retrieval failed or not used)."""
+        deadline = deadline or request_deadline()
+        answer = await self._rag_answer(question, department, live_context, chunks, deadline)
+        if answer is not None:
+            return answer
+        return await self._fallback(question, department, live_context, deadline)
+
+    async def _rag_path(
+        self,
+        question: str,
+        department: Optional[str],
+        live_context: Optional[str],
+        deadline: Deadline,
+    ) -> Optional[CopilotAnswer]:
+        """Retrieve and answer from the documents; None if RAG gave no answer."""
+        if self._rag_client is None:
+            return None
+        chunks = None
+        if self.uses_retrieval:
+            chunks = await self.retrieve(self.retrieval_query(question), deadline)
+        return await self._rag_answer(question, department, live_context, chunks, deadline)
 
-        rag_answer = await self._answer_with_rag(enriched_question)
-        if rag_answer is not None:
-            return rag_answer
+    async def _rag_answer(
+        self,
+        question: str,
+        department: Optional[str],
+        live_context: Optional[str],
+        chunks: Optional[List[Dict]],
+        deadline: Deadline,
+    ) -> Optional[CopilotAnswer]:
+        with COPILOT_SPAN_SECONDS.time(span="rag"):
+            if self._prompt_assembly == "server":
+                prompt = self._build_enriched_question(question, department, live_context)
+                rag_answer = await self._answer_with_rag(prompt.prompt, deadline)
+            elif chunks is None:
+                rag_answer, prompt = None, None
+            else:
+                rag_answer, prompt = await self._answer_from_chunks(
+                    question, department, live_context, chunks, deadline
+                )
+        if rag_answer is None:
+            return None
+        answer, sources = rag_answer
+        return CopilotAnswer(answer, sources, prompt.token_count if prompt else None)
 
+    async def _fallback(
+        self,
+        question: str,
+        department: Optional[str],
+        live_context: Optional[str],
+        deadline: Deadline,
+    ) -> CopilotAnswer:
         if self._require_rag:
             reason = self._startup_error or "RAG backend unavailable or no answer returned."
-            return (
+            return CopilotAnswer(
                 "Copilot is temporarily unavailable because GREENHEALTH_REQUIRE_RAG "
                 f"is enabled. Details: {reason}",
                 [],
             )
 
-        return await self._answer_with_llm(enriched_question)
+        prompt = self._build_enriched_question(question, department, live_context)
+        with COPILOT_SPAN_SECONDS.time(span="llm"):
+            answer, sources = await self._answer_with_llm(prompt.prompt, deadline)
+        return CopilotAnswer(answer, sources, prompt.token_count)
+
+    async def _answer_hedged(
+        self,
+        question: str,
+        department: Optional[str],
+        live_context: Optional[str],
+        deadline: Deadline,
+    ) -> CopilotAnswer:
+        """
+        Run the RAG path and, if it is still running after the hedge delay (or
+        fails), a direct LLM call. The first usable answer wins and the other
+        call is cancelled, so the worst case is the deadline rather than the
+        sum of both paths.
+        """
+        started = time.monotonic()
+        rag = asyncio.ensure_future(self._rag_path(question, department, live_context, deadline))
+        llm: Optional[asyncio.Future] = None
+
+        def start_llm() -> asyncio.Future:
+            return asyncio.ensure_future(
+                self._fallback(question, department, live_context, deadline)
+            )
+
+        try:
+            await asyncio.wait({rag}, timeout=min(self._hedge_delay(), deadline.remaining()))
+            if not rag.done() and not deadline.expired:
+                COPILOT_HEDGES_TOTAL.inc(reason="slow_rag")
+                llm = start_llm()
+            pending = {rag} if llm is None else {rag, llm}
+            degraded: Optional[CopilotAnswer] = None
+            while pending:
+                # The paths stop themselves at the deadline; the grace covers
+                # a thread that does not return promptly.
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=deadline.remaining() + 1.0,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    answer = task.result()
+                    path = "rag" if task is rag else "llm"
+                    if answer is not None and not self.is_unavailable(answer.answer):
+                        if task is rag:
+                            # Failures return fast and would pull the hedge delay down.
+                            self._rag_latency.observe(time.monotonic() - started)
+                        COPILOT_PATH_TOTAL.inc(path=path, outcome="won")
+                        return answer
+                    self._record_path(path, answer)
+                    degraded = answer or degraded
+                    if task is rag and llm is None:
+                        COPILOT_HEDGES_TOTAL.inc(reason="rag_failed")
+                        llm = start_llm()
+                        pending.add(llm)
+            return degraded or self._deadline_answer(deadline)
+        finally:
+            for task, path in ((rag, "rag"), (llm, "llm")):
+                if task is not None and not task.done():
+                    task.cancel()
+                    COPILOT_PATH_TOTAL.inc(path=path, outcome="cancelled")
+                    if task is rag:
+                        # A lower bound, but it keeps slow calls in the window.
+                        self._rag_latency.observe(time.monotonic() - started)
+
+    def _hedge_delay(self) -> float:
+        if len(self._rag_latency) < HEDGE_MIN_SAMPLES:
+            return self._hedge_initial_delay
+        return self._rag_latency.percentile(self._hedge_percentile)
+
+    @staticmethod
+    def _record_path(path: str, answer: Optional[CopilotAnswer]) -> None:
+        if answer is None:
+            outcome = "no_answer"
+        elif answer.answer.startswith(UNAVAILABLE_PREFIX):
+            outcome = "failed"
+        else:
+            outcome = "won"
+        COPILOT_PATH_TOTAL.inc(path=path, outcome=outcome)
+
+    @staticmethod
+    def _deadline_answer(deadline: Deadline) -> CopilotAnswer:
+        return CopilotAnswer(
+            "Copilot is temporarily unavailable. The request deadline of "
+            f"{deadline.seconds:g}s was exceeded.",
+            [],
+        )
 
     def get_runtime_status(self) -> dict:
         return {
             "rag_required": self._require_rag,
             "rag_client_ready": self._rag_client is not None,
+            "prompt_assembly": self._prompt_assembly,
+            "prompt_token_budget": self._assembler.budget.max_tokens,
+            "deadline_seconds": MAX_DEADLINE_SECONDS,
+            "hedge": self._hedge and not self._require_rag,
+            "hedge_delay_seconds": self._hedge_delay(),
             "startup_error": self._startup_error,
         }
 
-    async def _answer_with_rag(self, question: str) -> Optional[Tuple[str, List[str]]]:
+    async def _answer_from_chunks(
+        self,
+        question: str,
+        department: Optional[str],
+        live_context: Optional[str],
+        chunks: List[Dict],
+        deadline: Deadline,
+    ) -> Tuple[Optional[Tuple[str, List[str]]], Optional[AssembledPrompt]]:
+        """(answer, sources) or None, and the prompt sent; None when no call was made."""
+        prompt = self._assembler.assemble(
+            question,
+            department,
+            live_context,
+            chunks=chunks,
+            instructions=self._rag_instructions(),
+        )
+        self._record_prompt(prompt)
+        if not prompt.chunks:
+            # What the RAG server answers when nothing relevant is indexed.
+            if self._require_rag:
+                return (self._rag_no_answer, []), None
+            return None, prompt
+
+        try:
+            answer = await self._complete(prompt.prompt, deadline)
+        except Exception as exc:
+            self._startup_error = str(exc)
+            return None, prompt
+        if not answer:
+            return None, prompt
+
+        sources = self._extract_rag_sources({"context_docs": prompt.chunks})
+        if self._is_no_answer(answer):
+            if self._require_rag:
+                return (answer, sources), prompt
+            return None, prompt
+        return (answer, sources), prompt
+
+    def _rag_instructions(self) -> str:
+        # Mirrors the RAG server's own question-answering prompt.
+        return (
+            "Please provide an answer based solely on the provided sources and "
+            "live telemetry. Keep your answer concise and accurate. If the "
+            f"question cannot be inferred from them SAY `{self._rag_no_answer}`."
+        )
+
+    @staticmethod
+    def _record_prompt(prompt: AssembledPrompt) -> None:
+        COPILOT_PROMPT_TOKENS.observe(prompt.token_count, part="total")
+        COPILOT_PROMPT_TOKENS.observe(prompt.telemetry_tokens, part="telemetry")
+        COPILOT_PROMPT_TOKENS.observe(prompt.document_tokens, part="documents")
+        if prompt.telemetry_lines_dropped:
+            COPILOT_CONTEXT_DROPPED_TOTAL.inc(
+                prompt.telemetry_lines_dropped, reason="telemetry_budget"
+            )
+        if prompt.chunks_dropped:
+            COPILOT_CONTEXT_DROPPED_TOTAL.inc(prompt.chunks_dropped, reason="document_budget")
+        if prompt.duplicate_chunks:
+            COPILOT_CONTEXT_DROPPED_TOTAL.inc(prompt.duplicate_chunks, reason="duplicate_chunk")
+
+    async def _answer_with_rag(
+        self, question: str, deadline: Deadline
+    ) -> Optional[Tuple[str, List[str]]]:
         if self._rag_client is None:
             return None
 
         try:
-            result = await asyncio.to_thread(
-                self._rag_client.answer,
-                prompt=question,
-                model=self.model,
-                return_context_docs=True,
+            result = await deadline.run(
+                asyncio.to_thread(
+                    self._rag_client.answer,
+                    prompt=question,
+                    model=self.model,
+                    return_context_docs=True,
+                )
             )
         except Exception as exc:
             self._startup_error = str(exc)
@@ -133,23 +443,23 @@ class SustainabilityCopilot:
         question: str,
         department: Optional[str],
         live_context: Optional[str],
-    ) -> str:
-        parts: List[str] = []
-        if department:
-            parts.append(f"Department focus: {department}")
-        if live_context:
-            parts.append(f"Live telemetry snapshot:\n{live_context}")
-        parts.append(f"User question: {question}")
-        return "\n\n".join(parts)
+    ) -> AssembledPrompt:
+        prompt = self._assembler.assemble(question, department, live_context)
+        self._record_prompt(prompt)
+        return prompt
+
+    @staticmethod
+    def is_unavailable(answer: str) -> bool:
+        return answer.startswith(UNAVAILABLE_PREFIX)
 
     def _is_no_answer(self, answer: str) -> bool:
         normalized = answer.strip().lower().rstrip(".")
         configured = self._rag_no_answer.lower().rstrip(".")
         return normalized == configured
 
-    async def _answer_with_llm(self, question: str) -> Tuple[str, List[str]]:
+    async def _answer_with_llm(self, question: str, deadline: Deadline) -> Tuple[str, List[str]]:
         try:
-            from litellm import acompletion
+            import litellm  # noqa: F401
         except Exception as exc:
             reason = self._startup_error or str(exc)
             return (
@@ -159,23 +469,7 @@ class SustainabilityCopilot:
             )
 
         try:
-            response = await acompletion(
-                model=self.model,
-                api_key=self.groq_api_key,
-                base_url=self.base_url,
-                temperature=0.2,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a healthcare sustainability copilot. "
-                            "Give concise, practical recommendations."
-                        ),
-                    },
-                    {"role": "user", "content": question},
-                ],
-            )
-            answer = self._extract_completion_text(response)
+            answer = await self._complete(question, deadline)
             if answer:
                 return answer, []
             return (
@@ -183,6 +477,8 @@ class SustainabilityCopilot:
                 "returned an empty response.",
                 [],
             )
+        except DeadlineExceeded:
+            return self._deadline_answer(deadline).answer, []
         except Exception as exc:
             reason = self._startup_error or str(exc)
             return (
@@ -191,6 +487,24 @@ class SustainabilityCopilot:
                 [],
             )
 
+    async def _complete(self, prompt: str, deadline: Deadline) -> str:
+        from litellm import acompletion
+
+        response = await deadline.run(
+            acompletion(
+                model=self.model,
+                api_key=self.groq_api_key,
+                base_url=self.base_url,
+                temperature=0.2,
+                timeout=deadline.remaining(),
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+            )
+        )
+        return self._extract_completion_text(response)
+
     @staticmethod
     def _extract_completion_text(response: Any) -> str:
         choices = getattr(response, "choices", None)
@@ -0,0 +1,84 @@
+"""
+Request deadlines and the latency window that times hedged copilot calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from threading import Lock
+from typing import Awaitable, Deque, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+# End-to-end budget for one copilot request; clients may ask for less.
+MAX_DEADLINE_SECONDS = float(os.getenv("GREENHEALTH_COPILOT_DEADLINE_SECONDS", "60"))
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    pass
+
+
+class Deadline:
+    """A point in time a request must be answered by, passed down to every call."""
+
+    def __init__(self, expires_at: float, seconds: float):
+        self.expires_at = expires_at
+        self.seconds = seconds
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds, seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable` for at most the remaining time; DeadlineExceeded after."""
+        remaining = self.remaining()
+        if remaining <= 0.0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded.")
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError as exc:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded.") from exc
+
+
+def request_deadline(seconds: Optional[float] = None) -> Deadline:
+    """Deadline starting now; `seconds` from a client is capped at the configured budget."""
+    if seconds is None or seconds <= 0:
+        seconds = MAX_DEADLINE_SECONDS
+    return Deadline.after(min(seconds, MAX_DEADLINE_SECONDS))
+
+
+class LatencyWindow:
+    """Recent durations of one call path; percentiles over the last `size` samples."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(fraction * len(samples)) - 1))
+        return samples[index]
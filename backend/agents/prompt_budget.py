@@ -0,0 +1,255 @@
+"""
+Token-budgeted prompt assembly for the sustainability copilot.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+_encoder: Optional[Any] = None
+_encoder_loaded = False
+_encoder_lock = Lock()
+
+
+def _load_encoder() -> Optional[Any]:
+    """tiktoken encoder, or None when it is not installed or cannot load."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        with _encoder_lock:
+            if not _encoder_loaded:
+                encoding = os.getenv("GREENHEALTH_TOKENIZER_ENCODING", "cl100k_base")
+                try:
+                    import tiktoken
+
+                    _encoder = tiktoken.get_encoding(encoding)
+                except Exception as exc:  # pragma: no cover - missing or offline
+                    logger.warning(
+                        "tiktoken encoding %s unavailable (%s); estimating tokens "
+                        "from text length. Offline hosts need the encoding in "
+                        "TIKTOKEN_CACHE_DIR.",
+                        encoding,
+                        exc,
+                    )
+                    _encoder = None
+                _encoder_loaded = True
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count of `text`.
+
+    Uses tiktoken's cl100k_base (a declared dependency; the Docker image bakes
+    its BPE file into TIKTOKEN_CACHE_DIR). It is not Llama's own vocabulary but
+    lands within a few percent on English prose, which is all a budget needs.
+    If the encoding cannot load, roughly four characters make a token.
+    """
+    if not text:
+        return 0
+    encoder = _load_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    encoder = _load_encoder()
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoder.decode(tokens[:max_tokens]).rstrip() + " ..."
+    if len(text) <= max_tokens * 4:
+        return text
+    return text[: max_tokens * 4].rstrip() + " ..."
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[Tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return frozenset([tuple(words)]) if words else frozenset()
+    return frozenset(tuple(words[i : i + size]) for i in range(len(words) - size + 1))
+
+
+def _jaccard(left: FrozenSet, right: FrozenSet) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def dedupe_chunks(chunks: Sequence[Dict], threshold: float) -> Tuple[List[Dict], int]:
+    """
+    Drop chunks whose word-trigram Jaccard similarity to a better-ranked chunk
+    is at least `threshold`. Overlapping splitter windows and documents copied
+    between policy files otherwise spend the budget on the same text twice.
+    """
+    kept: List[Dict] = []
+    kept_shingles: List[FrozenSet] = []
+    duplicates = 0
+    for chunk in chunks:
+        shingles = _shingles(str(chunk.get("text") or ""))
+        if any(_jaccard(shingles, other) >= threshold for other in kept_shingles):
+            duplicates += 1
+            continue
+        kept.append(chunk)
+        kept_shingles.append(shingles)
+    return kept, duplicates
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    # Tokens for the whole user prompt, instructions included.
+    max_tokens: int = 1800
+    # Share of the budget telemetry may take before documents get their turn;
+    # telemetry can grow into whatever documents leave unused.
+    telemetry_share: float = 0.4
+    # Chunks requested from the retriever; more than fit, so duplicates and
+    # trimming still leave enough.
+    retrieve_k: int = 6
+    # A partially fitting chunk is cut down unless fewer tokens than this remain.
+    min_chunk_tokens: int = 64
+    dedupe_threshold: float = 0.8
+
+    @classmethod
+    def from_env(cls) -> "PromptBudget":
+        return cls(
+            max_tokens=max(256, int(os.getenv("GREENHEALTH_PROMPT_TOKEN_BUDGET", cls.max_tokens))),
+            telemetry_share=min(
+                1.0,
+                max(0.0, float(os.getenv("GREENHEALTH_PROMPT_TELEMETRY_SHARE", cls.telemetry_share))),
+            ),
+            retrieve_k=max(1, int(os.getenv("GREENHEALTH_RAG_RETRIEVE_K", cls.retrieve_k))),
+            min_chunk_tokens=cls.min_chunk_tokens,
+            dedupe_threshold=float(
+                os.getenv("GREENHEALTH_PROMPT_DEDUPE_THRESHOLD", cls.dedupe_threshold)
+            ),
+        )
+
+
+@dataclass
+class AssembledPrompt:
+    prompt: str
+    token_count: int
+    telemetry_tokens: int = 0
+    document_tokens: int = 0
+    telemetry_lines_dropped: int = 0
+    chunks: List[Dict] = field(default_factory=list)
+    chunks_dropped: int = 0
+    duplicate_chunks: int = 0
+
+
+class PromptAssembler:
+    """
+    Fits the question, live telemetry and retrieved chunks into a token budget.
+
+    The question and instructions are always kept. Telemetry lines arrive
+    ranked (see transforms/live_context.py), so trimming drops from the end;
+    chunks arrive in retrieval order, are de-duplicated and then kept while
+    they fit, with the first one that does not fit cut down to the remainder.
+    """
+
+    def __init__(
+        self,
+        budget: Optional[PromptBudget] = None,
+        counter: Callable[[str], int] = count_tokens,
+    ):
+        self.budget = budget or PromptBudget.from_env()
+        self._count = counter
+
+    def assemble(
+        self,
+        question: str,
+        department: Optional[str],
+        live_context: Optional[str],
+        chunks: Optional[Sequence[Dict]] = None,
+        instructions: str = "",
+    ) -> AssembledPrompt:
+        """
+        Build the prompt. Without `chunks` (the RAG server retrieves for
+        itself), the result is the enriched question: focus, telemetry and
+        question only.
+        """
+        head: List[str] = []
+        if instructions:
+            head.append(instructions)
+        if department:
+            head.append(f"Department focus: {department}")
+        tail = [f"User question: {question}"]
+        # Separators between sections cost a token or two each; count them once.
+        fixed_tokens = self._count("\n\n".join(head + tail)) + 8
+        available = max(0, self.budget.max_tokens - fixed_tokens)
+
+        lines = [line for line in (live_context or "").splitlines() if line.strip()]
+        line_tokens = [self._count(line) + 1 for line in lines]
+        telemetry_cap = int(available * self.budget.telemetry_share) if chunks else available
+        kept_lines = self._take_lines(line_tokens, telemetry_cap)
+        telemetry_tokens = sum(line_tokens[:kept_lines])
+
+        kept_chunks: List[Dict] = []
+        rendered_chunks: List[str] = []
+        document_tokens = 0
+        duplicates = 0
+        chunks_dropped = 0
+        if chunks:
+            unique, duplicates = dedupe_chunks(chunks, self.budget.dedupe_threshold)
+            remaining = available - telemetry_tokens
+            for index, chunk in enumerate(unique):
+                text = str(chunk.get("text") or "").strip()
+                if not text:
+                    continue
+                cost = self._count(text) + 2
+                if cost > remaining:
+                    if remaining - 2 >= self.budget.min_chunk_tokens:
+                        text = truncate_to_tokens(text, remaining - 2)
+                        cost = self._count(text) + 2
+                    else:
+                        chunks_dropped += len(unique) - index
+                        break
+                kept_chunks.append(chunk)
+                rendered_chunks.append(text)
+                document_tokens += cost
+                remaining -= cost
+            # Telemetry reclaims what the documents did not use.
+            kept_lines = self._take_lines(line_tokens, available - document_tokens)
+            telemetry_tokens = sum(line_tokens[:kept_lines])
+
+        sections = list(head)
+        if kept_lines:
+            sections.append("Live telemetry snapshot:\n" + "\n".join(lines[:kept_lines]))
+        if rendered_chunks:
+            sections.append(
+                "Sources:\n------\n" + "\n------\n".join(rendered_chunks) + "\n------"
+            )
+        sections.extend(tail)
+        prompt = "\n\n".join(sections)
+        return AssembledPrompt(
+            prompt=prompt,
+            token_count=self._count(prompt),
+            telemetry_tokens=telemetry_tokens,
+            document_tokens=document_tokens,
+            telemetry_lines_dropped=len(lines) - kept_lines,
+            chunks=kept_chunks,
+            chunks_dropped=chunks_dropped,
+            duplicate_chunks=duplicates,
+        )
+
+    @staticmethod
+    def _take_lines(line_tokens: Sequence[int], limit: int) -> int:
+        used = 0
+        for index, tokens in enumerate(line_tokens):
+            if used + tokens > limit:
+                return index
+            used += tokens
+        return len(line_tokens)
@@ -0,0 +1,87 @@
+"""
+Operator-facing endpoints: telemetry export and guarded runtime diagnostics.
+"""
+
+import asyncio
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from observability import diagnostics
+from observability.metrics import registry
+
+
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False)
+
+
+def _require_diagnostics(token: Optional[str]) -> None:
+    # Hide the endpoints entirely unless explicitly enabled.
+    if not diagnostics.diagnostics_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = diagnostics.diagnostics_token()
+    if expected is None:
+        # Stack samples and heap snapshots expose internals; never serve them openly.
+        raise HTTPException(
+            status_code=503, detail="Diagnostics need GREENHEALTH_DIAGNOSTICS_TOKEN to be set."
+        )
+    if not hmac.compare_digest((token or "").encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid diagnostics token.")
+
+
+async def _run_memory_diagnostic(func, *args):
+    try:
+        return await asyncio.to_thread(func, *args)
+    except diagnostics.DiagnosticsBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+
+@router.get("/metrics")
+async def read_internal_metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/diagnostics/profile")
+async def profile_stacks(
+    seconds: float = Query(5.0, gt=0, le=diagnostics.MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(10.0, ge=1.0, le=1000.0),
+    x_diagnostics_token: Optional[str] = Header(default=None),
+):
+    _require_diagnostics(x_diagnostics_token)
+    try:
+        collapsed = await asyncio.to_thread(
+            diagnostics.sample_stacks, seconds, interval_ms / 1000.0
+        )
+    except diagnostics.DiagnosticsBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return PlainTextResponse(collapsed)
+
+
+@router.post("/diagnostics/memory/start")
+async def start_memory_tracing(
+    frames: int = Query(10, ge=1, le=50),
+    x_diagnostics_token: Optional[str] = Header(default=None),
+):
+    _require_diagnostics(x_diagnostics_token)
+    return await _run_memory_diagnostic(diagnostics.start_tracemalloc, frames)
+
+
+@router.get("/diagnostics/memory/snapshot")
+async def read_memory_snapshot(
+    limit: int = Query(25, ge=1, le=500),
+    reset_baseline: bool = False,
+    x_diagnostics_token: Optional[str] = Header(default=None),
+):
+    _require_diagnostics(x_diagnostics_token)
+    return await _run_memory_diagnostic(diagnostics.memory_snapshot, limit, reset_baseline)
+
+
+@router.post("/diagnostics/memory/stop")
+async def stop_memory_tracing(
+    x_diagnostics_token: Optional[str] = Header(default=None),
+):
+    _require_diagnostics(x_diagnostics_token)
+    return await _run_memory_diagnostic(diagnostics.stop_tracemalloc)
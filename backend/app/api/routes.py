@@ -1,17 +1,67 @@
-from fastapi import APIRouter
+import asyncio
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 
 from app.api import schemas
-from app.services.metrics_service import get_current_metrics, get_sustainability_score
+from app.services.metrics_service import (
+    available_windows,
+    get_current_metrics,
+    get_sustainability_score,
+)
 from app.services.alerts_service import get_active_alerts
-from app.services.copilot_service import CopilotQueryRequest, run_copilot_query
+from app.services.export_service import ExportsBusy, plan_export, stream_export
+from app.services.forecast_service import get_forecast
+from app.services.history_service import get_history_aggregate
+from app.services.scenario_service import ScenarioRequest, evaluate_scenarios
+from app.services.wire_format import (
+    JSON,
+    MEDIA_TYPES,
+    encode_frame,
+    negotiate_accept,
+    table_frame,
+)
+from app.services.copilot_service import (
+    CopilotBatchRequest,
+    CopilotQueryRequest,
+    run_copilot_query,
+    stream_copilot_batch,
+    validate_batch,
+)
 
 
 router = APIRouter(prefix="", tags=["greenhealth"])
 
 
-@router.get("/metrics", response_model=schemas.MetricsResponse)
-async def read_metrics():
-    return await get_current_metrics()
+@router.get(
+    "/metrics",
+    response_model=schemas.MetricsResponse,
+    response_model_exclude_none=True,
+)
+async def read_metrics(request: Request, window: Optional[str] = Query(None)):
+    if window is not None and window not in available_windows():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown window {window!r}; available: {', '.join(available_windows())}",
+        )
+    response = await get_current_metrics(window)
+    encoding = negotiate_accept(request.headers.get("accept"))
+    if encoding == JSON:
+        return response
+    rows = [metric.model_dump(exclude_none=True) for metric in response.metrics]
+    columns = [
+        name
+        for name in schemas.DepartmentMetric.model_fields
+        if any(name in row for row in rows)
+    ] or ["department"]
+    return Response(
+        content=encode_frame(table_frame(rows, columns), encoding),
+        media_type=MEDIA_TYPES[encoding],
+        headers={"Vary": "Accept"},
+    )
 
 
 @router.get("/alerts", response_model=schemas.AlertsResponse)
@@ -24,7 +74,96 @@ async def read_sustainability_score():
     return await get_sustainability_score()
 
 
+@router.get("/forecast", response_model=schemas.ForecastResponse)
+async def read_forecast(department: str, horizon: str = Query("1h")):
+    try:
+        forecast = await get_forecast(department, horizon)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if forecast is None:
+        raise HTTPException(
+            status_code=404, detail=f"No forecast available for department {department!r}."
+        )
+    return forecast
+
+
+@router.get(
+    "/history/aggregate",
+    response_model=schemas.HistoryAggregateResponse,
+    response_model_exclude_none=True,
+)
+async def read_history_aggregate(
+    metric: str,
+    bucket: str = Query("1d"),
+    group_by: Literal["department", "none"] = Query("department"),
+    agg: str = Query("avg"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    department: Optional[str] = Query(None),
+):
+    departments = [item.strip() for item in department.split(",")] if department else None
+    try:
+        return await asyncio.to_thread(
+            get_history_aggregate, metric, bucket, group_by, agg, start, end, departments
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.get("/export")
+async def export_history(
+    kind: Literal["metrics", "scores", "alerts"],
+    format: Literal["csv", "parquet"] = Query("csv"),
+    compression: Literal["none", "gzip"] = Query("none"),
+    bucket: Optional[str] = Query(None),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    department: Optional[str] = Query(None),
+):
+    departments = [item.strip() for item in department.split(",")] if department else None
+    try:
+        plan = plan_export(kind, format, compression, bucket, start, end, departments)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except ExportsBusy as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "30"}) from exc
+    # A plain generator: Starlette advances it in its thread pool, off the event loop.
+    # The background release covers a client that goes away before streaming starts.
+    try:
+        return StreamingResponse(
+            stream_export(plan),
+            media_type=plan.media_type,
+            headers=plan.headers,
+            background=BackgroundTask(plan.release),
+        )
+    except Exception:
+        plan.release()
+        raise
+
+
+@router.post(
+    "/scenarios/evaluate",
+    response_model=schemas.ScenarioEvaluateResponse,
+    response_model_exclude_none=True,
+)
+async def evaluate_what_if(req: ScenarioRequest):
+    try:
+        return await asyncio.to_thread(evaluate_scenarios, req)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except LookupError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+
 @router.post("/copilot-query", response_model=schemas.CopilotResponse)
 async def copilot_query(req: CopilotQueryRequest):
     return await run_copilot_query(req)
 
+
+@router.post("/copilot-query/batch")
+async def copilot_query_batch(req: CopilotBatchRequest):
+    try:
+        validate_batch(req)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return StreamingResponse(stream_copilot_batch(req), media_type="application/x-ndjson")
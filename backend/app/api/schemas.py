@@ -1,4 +1,4 @@
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel
 
 
@@ -11,31 +11,116 @@ class DepartmentMetric(BaseModel):
     medical_waste_kg: float
     paper_kg: float
     timestamp: str
+    energy_kwh_p50: Optional[float] = None
+    energy_kwh_p95: Optional[float] = None
+    energy_kwh_max: Optional[float] = None
+    window_start: Optional[str] = None
+    window_end: Optional[str] = None
+    # Raw snapshot only: when the row reached the API state and how long after
+    # its event time that was.
+    published_at: Optional[str] = None
+    lag_seconds: Optional[float] = None
 
 
 class MetricsResponse(BaseModel):
     metrics: List[DepartmentMetric]
+    window: Optional[str] = None
+    # Departments with no event for GREENHEALTH_STALE_AFTER_SECONDS (raw snapshot only).
+    stale_departments: Optional[List[str]] = None
+
+
+class AlertRecommendation(BaseModel):
+    answer: str
+    sources: List[str]
+    generated_at: str
 
 
 class Alert(BaseModel):
     id: str
-    type: Literal["energy_anomaly", "waste_anomaly", "paper_anomaly"]
+    type: Literal[
+        "energy_anomaly",
+        "waste_anomaly",
+        "paper_anomaly",
+        "energy_forecast_breach",
+        "waste_forecast_breach",
+        "paper_forecast_breach",
+    ]
     department: Department
     severity: Literal["low", "medium", "high"]
     message: str
     created_at: str
+    recommendation: Optional[AlertRecommendation] = None
 
 
 class AlertsResponse(BaseModel):
     alerts: List[Alert]
 
 
+class ForecastPoint(BaseModel):
+    timestamp: str
+    energy_kwh: float
+    medical_waste_kg: float
+    paper_kg: float
+
+
+class ForecastResponse(BaseModel):
+    department: str
+    horizon: str
+    points: List[ForecastPoint]
+
+
+class HistoryPoint(BaseModel):
+    bucket_start: str
+    department: Optional[str] = None
+    value: float
+    samples: int
+
+
+class HistoryAggregateResponse(BaseModel):
+    metric: str
+    agg: str
+    bucket: str
+    group_by: Literal["department", "none"]
+    start: str
+    end: str
+    points: List[HistoryPoint]
+
+
 class SustainabilityScoreResponse(BaseModel):
     overall_score: float
     breakdown: dict
 
 
+class ScenarioAlert(BaseModel):
+    department: str
+    type: Literal["energy_anomaly", "waste_anomaly", "paper_anomaly"]
+    severity: Literal["low", "medium", "high"]
+    value: float
+
+
+class ScenarioResult(BaseModel):
+    name: Optional[str] = None
+    overall_score: float
+    # Change against the baseline overall score.
+    delta: float
+    department_scores: Optional[Dict[str, float]] = None
+    alerts: List[ScenarioAlert]
+
+
+class ScenarioBaseline(BaseModel):
+    overall_score: float
+    department_scores: Dict[str, float]
+
+
+class ScenarioEvaluateResponse(BaseModel):
+    rules_version: str
+    baseline: ScenarioBaseline
+    scenarios: List[ScenarioResult]
+    elapsed_ms: float
+
+
 class CopilotResponse(BaseModel):
     answer: str
     sources: List[str]
+    prompt_tokens: Optional[int] = None
 
@@ -0,0 +1,153 @@
+"""
+Background copilot recommendations for newly opened alerts.
+
+When the stream engine opens a high or medium alert, the advisor asks the
+copilot what to do about it, using the department's live context and the
+policy documents, so an answer is usually attached to the alert before an
+operator asks. At most GREENHEALTH_ALERT_ADVISOR_CONCURRENCY recommendations
+are generated at a time. A (department, alert type) pair is advised at most
+once per cooldown; alerts that reopen within it reuse the last answer.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.services.alerts_stream import SEVERITY_RANK
+from app.services.copilot_service import build_live_context, get_copilot
+from observability.metrics import ALERT_RECOMMENDATIONS_TOTAL, COPILOT_SPAN_SECONDS
+from transforms.state import alerts_state
+
+
+logger = logging.getLogger(__name__)
+
+_QUESTION = (
+    "An alert just opened: {message} What should the {department} team do in the "
+    "next hour to bring this back within target? List the most effective actions first."
+)
+
+
+def _enabled() -> bool:
+    return os.getenv("GREENHEALTH_ALERT_ADVISOR_ENABLED", "true").strip().lower() in {
+        "1",
+        "true",
+        "yes",
+        "on",
+    }
+
+
+class AlertAdvisor:
+    def __init__(self) -> None:
+        self.min_severity = os.getenv("GREENHEALTH_ALERT_ADVISOR_MIN_SEVERITY", "medium").lower()
+        if self.min_severity not in SEVERITY_RANK:
+            self.min_severity = "medium"
+        self.concurrency = max(1, int(os.getenv("GREENHEALTH_ALERT_ADVISOR_CONCURRENCY", "2")))
+        self.cooldown_seconds = float(os.getenv("GREENHEALTH_ALERT_ADVISOR_COOLDOWN_SECONDS", "900"))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limit: Optional[asyncio.Semaphore] = None
+        # (department, type) -> task generating its recommendation.
+        self._pending: Dict[Tuple[str, str], asyncio.Task] = {}
+        # (department, type) -> (monotonic time, recommendation) of the last answer.
+        self._recent: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        if not _enabled():
+            return
+        if self._loop is None:
+            alerts_state.add_listener(self._on_transition)
+        self._loop = loop
+        self._limit = asyncio.Semaphore(self.concurrency)
+
+    async def stop(self) -> None:
+        for task in list(self._pending.values()):
+            task.cancel()
+        self._pending.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self._loop is not None,
+            "min_severity": self.min_severity,
+            "concurrency": self.concurrency,
+            "cooldown_seconds": self.cooldown_seconds,
+            "pending": len(self._pending),
+        }
+
+    def _on_transition(self, opened: List[Dict], closed: List[Dict]) -> None:
+        # Called on the stream-engine thread.
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._dispatch, opened, closed)
+
+    def _dispatch(self, opened: List[Dict], closed: List[Dict]) -> None:
+        reopened = {(alert["department"], alert["type"]) for alert in opened}
+        for alert in closed:
+            key = (alert["department"], alert["type"])
+            if key in reopened:
+                # Replaced by an alert for the same pair; its advice still applies.
+                continue
+            task = self._pending.pop(key, None)
+            if task is not None:
+                # Nobody needs advice on an alert that already cleared.
+                task.cancel()
+                ALERT_RECOMMENDATIONS_TOTAL.inc(outcome="cancelled")
+
+        now = time.monotonic()
+        for alert in opened:
+            if SEVERITY_RANK.get(alert["severity"], 0) < SEVERITY_RANK[self.min_severity]:
+                continue
+            key = (alert["department"], alert["type"])
+            recent = self._recent.get(key)
+            if key in self._pending or (
+                recent is not None and now - recent[0] < self.cooldown_seconds
+            ):
+                # An answer still being generated is attached when it lands.
+                if recent is not None and recent[1]:
+                    alerts_state.attach_recommendation(*key, recent[1])
+                ALERT_RECOMMENDATIONS_TOTAL.inc(outcome="reused")
+                continue
+            # Claim the cooldown now so a burst of reopenings queues one call.
+            self._recent[key] = (now, {})
+            self._pending[key] = asyncio.ensure_future(self._advise(alert, key))
+
+    async def _advise(self, alert: Dict, key: Tuple[str, str]) -> None:
+        try:
+            async with self._limit:
+                with COPILOT_SPAN_SECONDS.time(span="alert_advisor"):
+                    copilot = await asyncio.to_thread(get_copilot)
+                    result = await copilot.answer_question(
+                        question=_QUESTION.format(
+                            message=alert["message"], department=alert["department"]
+                        ),
+                        department=alert["department"],
+                        live_context=build_live_context(alert["department"]),
+                    )
+            if copilot.is_unavailable(result.answer):
+                # Let the next alert for this pair try again.
+                self._recent.pop(key, None)
+                ALERT_RECOMMENDATIONS_TOTAL.inc(outcome="unavailable")
+                return
+            recommendation = {
+                "answer": result.answer,
+                "sources": result.sources,
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self._recent[key] = (self._recent.get(key, (time.monotonic(), {}))[0], recommendation)
+            alerts_state.attach_recommendation(*key, recommendation)
+            ALERT_RECOMMENDATIONS_TOTAL.inc(outcome="generated")
+        except asyncio.CancelledError:
+            self._recent.pop(key, None)
+            raise
+        except Exception:  # pragma: no cover - advice is best effort
+            self._recent.pop(key, None)
+            ALERT_RECOMMENDATIONS_TOTAL.inc(outcome="failed")
+            logger.exception("Recommendation for alert %s failed.", alert["id"])
+        finally:
+            if self._pending.get(key) is asyncio.current_task():
+                del self._pending[key]
+
+
+alert_advisor = AlertAdvisor()
@@ -1,19 +1,24 @@
-from app.api.schemas import AlertsResponse, Alert
+from app.api.schemas import AlertRecommendation, AlertsResponse, Alert
 from transforms.state import alerts_state
 
 
 async def get_active_alerts() -> AlertsResponse:
     rows = alerts_state.get_active_alerts()
-    alerts = [
-        Alert(
-            id=row["id"],
-            type=row["type"],
-            department=row["department"],
-            severity=row["severity"],
-            message=row["message"],
-            created_at=row["created_at"],
+    recommendations = alerts_state.get_recommendations()
+    alerts = []
+    for row in rows:
+        recommendation = recommendations.get((row["department"], row["type"]))
+        alerts.append(
+            Alert(
+                id=row["id"],
+                type=row["type"],
+                department=row["department"],
+                severity=row["severity"],
+                message=row["message"],
+                created_at=row["created_at"],
+                recommendation=(
+                    None if recommendation is None else AlertRecommendation(**recommendation)
+                ),
+            )
         )
-        for row in rows
-    ]
     return AlertsResponse(alerts=alerts)
-
@@ -0,0 +1,136 @@
+"""
+Filtered alert subscriptions for the `/ws/alerts` socket.
+
+The stream engine reports alert transitions (opened/closed) from its own
+thread; the hub hops onto the event loop and evaluates every distinct filter
+once per change, then hands the same message to all clients sharing it.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from transforms.state import alerts_state
+
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+# Pending messages per client before it is resynced with a snapshot.
+CLIENT_QUEUE_SIZE = 64
+
+
+def _split(raw_value: Optional[str]) -> Optional[FrozenSet[str]]:
+    if not raw_value:
+        return None
+    values = frozenset(item.strip() for item in raw_value.split(",") if item.strip())
+    return values or None
+
+
+@dataclass(frozen=True)
+class AlertFilter:
+    departments: Optional[FrozenSet[str]] = None
+    types: Optional[FrozenSet[str]] = None
+    min_severity: str = "low"
+
+    @classmethod
+    def from_query(
+        cls,
+        departments: Optional[str],
+        types: Optional[str],
+        min_severity: Optional[str],
+    ) -> "AlertFilter":
+        severity = (min_severity or "low").strip().lower()
+        if severity not in SEVERITY_RANK:
+            raise ValueError(f"Unknown severity {min_severity!r}.")
+        return cls(departments=_split(departments), types=_split(types), min_severity=severity)
+
+    def matches(self, alert: Dict) -> bool:
+        if self.departments is not None and alert.get("department") not in self.departments:
+            return False
+        if self.types is not None and alert.get("type") not in self.types:
+            return False
+        return SEVERITY_RANK.get(alert.get("severity"), 0) >= SEVERITY_RANK[self.min_severity]
+
+    def describe(self) -> Dict:
+        return {
+            "departments": sorted(self.departments) if self.departments else None,
+            "types": sorted(self.types) if self.types else None,
+            "min_severity": self.min_severity,
+        }
+
+
+def _compact(alert: Dict) -> Dict:
+    return {
+        "id": alert["id"],
+        "department": alert["department"],
+        "type": alert["type"],
+        "severity": alert["severity"],
+        "message": alert["message"],
+        "created_at": alert["created_at"],
+    }
+
+
+# Queued instead of changes a client fell behind on; it gets a fresh snapshot.
+RESYNC = {"type": "resync"}
+
+
+def _enqueue(queue: asyncio.Queue, message: Dict) -> None:
+    if queue.full():
+        while not queue.empty():
+            queue.get_nowait()
+        message = RESYNC
+    queue.put_nowait(message)
+
+
+class AlertsHub:
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._groups: Dict[AlertFilter, Set[asyncio.Queue]] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is None:
+            alerts_state.add_listener(self._on_transition)
+        self._loop = loop
+
+    def subscribe(self, alert_filter: AlertFilter) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._groups.setdefault(alert_filter, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, alert_filter: AlertFilter, queue: asyncio.Queue) -> None:
+        group = self._groups.get(alert_filter)
+        if group is None:
+            return
+        group.discard(queue)
+        if not group:
+            self._groups.pop(alert_filter, None)
+
+    def snapshot(self, alert_filter: AlertFilter) -> Dict:
+        alerts = [
+            _compact(alert)
+            for alert in alerts_state.get_active_alerts()
+            if alert_filter.matches(alert)
+        ]
+        return {"type": "snapshot", "filter": alert_filter.describe(), "alerts": alerts}
+
+    def subscriber_count(self) -> int:
+        return sum(len(group) for group in self._groups.values())
+
+    def _on_transition(self, opened: List[Dict], closed: List[Dict]) -> None:
+        # Called on the stream-engine thread.
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._dispatch, opened, closed)
+
+    def _dispatch(self, opened: List[Dict], closed: List[Dict]) -> None:
+        for alert_filter, queues in list(self._groups.items()):
+            matched_opened = [_compact(alert) for alert in opened if alert_filter.matches(alert)]
+            matched_closed = [alert["id"] for alert in closed if alert_filter.matches(alert)]
+            if not matched_opened and not matched_closed:
+                continue
+            message = {"type": "changes", "opened": matched_opened, "closed": matched_closed}
+            for queue in queues:
+                _enqueue(queue, message)
+
+
+alerts_hub = AlertsHub()
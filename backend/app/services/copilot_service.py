@@ -1,98 +1,184 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
 import os
 
 from app.api.schemas import CopilotResponse
 from agents.copilot import SustainabilityCopilot
-from transforms.state import alerts_state, metrics_state, score_state
+from agents.deadline import DeadlineExceeded, request_deadline
+from observability.metrics import COPILOT_SPAN_SECONDS
+from transforms.state import live_context_state
 
 
 @dataclass
 class CopilotQueryRequest:
     question: str
     department: Optional[str] = None
+    # End-to-end answer deadline; capped at GREENHEALTH_COPILOT_DEADLINE_SECONDS.
+    timeout_seconds: Optional[float] = None
 
 
-_copilot = SustainabilityCopilot(
-    groq_api_key=os.getenv("GROQ_API_KEY"),
-    model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
-    base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
-)
+@dataclass
+class CopilotBatchRequest:
+    queries: List[CopilotQueryRequest] = field(default_factory=list)
 
 
-def get_copilot_runtime_status() -> dict:
-    return _copilot.get_runtime_status()
+logger = logging.getLogger(__name__)
+# Built lazily: constructing the copilot imports the Pathway xPack RAG client,
+# which is too heavy for the API cold-start path.
+_copilot: Optional[SustainabilityCopilot] = None
+_copilot_lock = Lock()
+BATCH_CONCURRENCY = max(1, int(os.getenv("GREENHEALTH_COPILOT_BATCH_CONCURRENCY", "4")))
+BATCH_MAX_QUERIES = max(1, int(os.getenv("GREENHEALTH_COPILOT_BATCH_MAX_QUERIES", "500")))
 
 
-def _metric_value(row: dict, average_key: str, raw_key: str) -> float:
-    value = row.get(average_key)
-    if value is None:
-        value = row.get(raw_key, 0.0)
-    return float(value)
+def get_copilot() -> SustainabilityCopilot:
+    global _copilot
+    if _copilot is None:
+        with _copilot_lock:
+            if _copilot is None:
+                _copilot = SustainabilityCopilot(
+                    groq_api_key=os.getenv("GROQ_API_KEY"),
+                    model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+                    base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+                )
+    return _copilot
 
 
-def _build_live_context(department: Optional[str]) -> str:
-    rows = metrics_state.get_latest_snapshot()
-    alerts = alerts_state.get_active_alerts()
-    score = score_state.get_latest_score()
+def warm_up_copilot() -> None:
+    try:
+        get_copilot()
+    except Exception:  # pragma: no cover - depends on image deps
+        logger.exception("Copilot warm-up failed.")
 
-    if department:
-        rows = [row for row in rows if row.get("department") == department]
-        alerts = [row for row in alerts if row.get("department") == department]
 
-    lines = []
+def get_copilot_runtime_status() -> dict:
+    if _copilot is None:
+        return {
+            "rag_required": SustainabilityCopilot._env_truthy(
+                os.getenv("GREENHEALTH_REQUIRE_RAG", "true")
+            ),
+            "rag_client_ready": False,
+            "startup_error": None,
+            "loaded": False,
+        }
+    return {**_copilot.get_runtime_status(), "loaded": True}
+
+
+def build_live_context(department: Optional[str]) -> str:
+    # Maintained by the stream engine on every state publish; see
+    # transforms/live_context.py.
+    lines = live_context_state.get_lines(department)
+    if lines is None:
+        lines = ["No live metrics snapshot available yet.", "No active sustainability alerts."]
+    return "\n".join(lines)
 
-    overall_score = score.get("overall_score")
-    if isinstance(overall_score, (int, float)):
-        lines.append(f"Current sustainability score: {overall_score:.2f}/100")
 
-    if rows:
-        avg_energy = (
-            sum(_metric_value(row, "energy_kwh_avg", "energy_kwh") for row in rows)
-            / len(rows)
-        )
-        avg_waste = (
-            sum(
-                _metric_value(row, "medical_waste_kg_avg", "medical_waste_kg")
-                for row in rows
-            )
-            / len(rows)
-        )
-        avg_paper = (
-            sum(_metric_value(row, "paper_kg_avg", "paper_kg") for row in rows) / len(rows)
-        )
-        lines.append(
-            "Average live usage "
-            f"(energy={avg_energy:.2f} kWh, waste={avg_waste:.2f} kg, paper={avg_paper:.2f} kg)."
+async def run_copilot_query(req: CopilotQueryRequest) -> CopilotResponse:
+    deadline = request_deadline(req.timeout_seconds)
+    with COPILOT_SPAN_SECONDS.time(span="total"):
+        with COPILOT_SPAN_SECONDS.time(span="live_context"):
+            live_context = build_live_context(req.department)
+        copilot = await asyncio.to_thread(get_copilot)
+        result = await copilot.answer_question(
+            question=req.question,
+            department=req.department,
+            live_context=live_context,
+            deadline=deadline,
         )
-        for row in rows[:4]:
-            lines.append(
-                f"{row.get('department')}: "
-                f"energy={_metric_value(row, 'energy_kwh_avg', 'energy_kwh'):.2f} kWh, "
-                f"waste={_metric_value(row, 'medical_waste_kg_avg', 'medical_waste_kg'):.2f} kg, "
-                f"paper={_metric_value(row, 'paper_kg_avg', 'paper_kg'):.2f} kg."
-            )
-    else:
-        lines.append("No live metrics snapshot available yet.")
-
-    if alerts:
-        lines.append("Current alerts:")
-        for alert in alerts[:4]:
-            lines.append(
-                f"- [{alert.get('severity')}] {alert.get('department')}: {alert.get('message')}"
-            )
-    else:
-        lines.append("No active sustainability alerts.")
+    return CopilotResponse(
+        answer=result.answer,
+        sources=result.sources,
+        prompt_tokens=result.prompt_tokens,
+    )
 
-    return "\n".join(lines)
 
+def validate_batch(req: CopilotBatchRequest) -> None:
+    if not req.queries:
+        raise ValueError("queries must not be empty.")
+    if len(req.queries) > BATCH_MAX_QUERIES:
+        raise ValueError(
+            f"At most {BATCH_MAX_QUERIES} queries per batch; got {len(req.queries)}."
+        )
 
-async def run_copilot_query(req: CopilotQueryRequest) -> CopilotResponse:
-    live_context = _build_live_context(req.department)
-    answer, sources = await _copilot.answer_question(
-        question=req.question,
-        department=req.department,
-        live_context=live_context,
-    )
-    return CopilotResponse(answer=answer, sources=sources)
 
+async def stream_copilot_batch(req: CopilotBatchRequest) -> AsyncIterator[str]:
+    """
+    Answer a batch of questions, yielding one JSON line per result in
+    completion order.
+
+    Live context is built once per department and each distinct retrieval
+    query is sent once, shared by every question that needs it. Retrievals
+    go out concurrently, which lets the RAG server embed them together, and
+    at most BATCH_CONCURRENCY retrievals and LLM calls run at a time.
+    """
+    with COPILOT_SPAN_SECONDS.time(span="batch"):
+        copilot = await asyncio.to_thread(get_copilot)
+        with COPILOT_SPAN_SECONDS.time(span="live_context"):
+            contexts = {
+                department: build_live_context(department)
+                for department in {query.department for query in req.queries}
+            }
+
+        # Separate limits, so queued retrievals never hold back answers.
+        retrieval_limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+        answer_limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+        retrievals: Dict[str, asyncio.Task] = {}
+
+        async def retrieve(text: str) -> Optional[List[Dict]]:
+            async with retrieval_limit:
+                # Bounded from when it starts, not from when the batch arrived.
+                try:
+                    return await request_deadline().run(copilot.retrieve(text))
+                except DeadlineExceeded:
+                    return None
+
+        if copilot.uses_retrieval:
+            for query in req.queries:
+                text = copilot.retrieval_query(query.question)
+                if text not in retrievals:
+                    retrievals[text] = asyncio.create_task(retrieve(text))
+
+        async def answer(index: int, query: CopilotQueryRequest) -> Tuple[int, Dict]:
+            item = {"index": index, "question": query.question, "department": query.department}
+            try:
+                chunks = None
+                if retrievals:
+                    # Shielded: other questions may still be waiting for it.
+                    chunks = await asyncio.shield(
+                        retrievals[copilot.retrieval_query(query.question)]
+                    )
+                async with answer_limit:
+                    # The deadline starts with the answer, so queued items do
+                    # not expire before they get a slot.
+                    deadline = request_deadline(query.timeout_seconds)
+                    result = await copilot.answer_with_documents(
+                        query.question,
+                        query.department,
+                        contexts[query.department],
+                        chunks,
+                        deadline,
+                    )
+            except Exception as exc:  # pragma: no cover - one failure must not end the batch
+                logger.exception("Batch copilot query %d failed.", index)
+                item["error"] = str(exc)
+                return index, item
+            item.update(
+                answer=result.answer,
+                sources=result.sources,
+                prompt_tokens=result.prompt_tokens,
+            )
+            return index, item
+
+        tasks = [asyncio.create_task(answer(index, query)) for index, query in enumerate(req.queries)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                _, item = await finished
+                yield json.dumps(item) + "\n"
+        finally:
+            # The client may disconnect mid-stream; do not keep calling the LLM.
+            for task in tasks + list(retrievals.values()):
+                task.cancel()
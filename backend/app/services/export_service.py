@@ -0,0 +1,341 @@
+"""
+Bulk export of retained telemetry, sustainability scores and alerts.
+
+Exports stream straight from the history rollups one time segment at a time
+(and from the alert log in fixed-size chunks), so memory stays bounded by one
+segment whatever the range. The generators are synchronous: Starlette runs
+each step in its thread pool, away from the event loop serving the live API,
+and the history lock is only held while a single segment is copied.
+"""
+
+import csv
+import importlib.util
+import io
+import os
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from observability.metrics import EXPORT_ROWS_TOTAL, EXPORTS_ACTIVE
+from transforms.alert_log import alert_log
+from transforms.anomaly import METRICS
+from transforms.history import LevelSpec, SegmentRows, history_store
+from transforms.rules import rules_engine
+from transforms.state import alerts_state
+
+
+KINDS = ("metrics", "scores", "alerts")
+FORMATS = ("csv", "parquet")
+COMPRESSIONS = ("none", "gzip")
+DEFAULT_RANGE = timedelta(days=30)
+MAX_CONCURRENT_EXPORTS = max(1, int(os.getenv("GREENHEALTH_EXPORT_CONCURRENCY", "2")))
+
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# Column name -> type: time (epoch seconds), str, int or float.
+COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "metrics": [("bucket_start", "time"), ("department", "str"), ("samples", "int")]
+    + [(f"{metric}_{stat}", "float") for metric in METRICS for stat in ("avg", "max")],
+    "scores": [("bucket_start", "time"), ("department", "str"), ("score", "float")]
+    + [(f"{metric}_score", "float") for metric in METRICS],
+    "alerts": [
+        ("id", "str"),
+        ("department", "str"),
+        ("type", "str"),
+        ("severity", "str"),
+        ("message", "str"),
+        ("opened_at", "time"),
+        ("closed_at", "time"),
+    ],
+}
+
+# One chunk: column name -> values, all of the same length.
+Chunk = Dict[str, list]
+
+_active_lock = Lock()
+_active = 0
+
+
+class ExportsBusy(RuntimeError):
+    pass
+
+
+@dataclass
+class ExportPlan:
+    kind: str
+    format: str
+    compression: str
+    start: datetime
+    end: datetime
+    departments: Optional[List[str]]
+    # Rollup level read for metrics and scores; None for alerts.
+    level: Optional[LevelSpec]
+    # Whether this plan's export slot has been given back.
+    released: bool = field(default=False, repr=False)
+
+    def release(self) -> None:
+        """Give back the export slot taken by plan_export; safe to call more than once."""
+        global _active
+        with _active_lock:
+            if self.released:
+                return
+            self.released = True
+            _active -= 1
+        EXPORTS_ACTIVE.dec()
+
+    @property
+    def filename(self) -> str:
+        suffix = ".csv.gz" if self.format == "csv" and self.compression == "gzip" else f".{self.format}"
+        return f"greenhealth-{self.kind}-{self.start:%Y%m%dT%H%M}-{self.end:%Y%m%dT%H%M}{suffix}"
+
+    @property
+    def media_type(self) -> str:
+        if self.format == "csv" and self.compression == "gzip":
+            return "application/gzip"
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Disposition": f'attachment; filename="{self.filename}"'}
+        if self.level is not None:
+            headers["X-Export-Bucket"] = self.level.name
+        if self.kind == "scores":
+            headers["X-Rules-Version"] = rules_engine.active().version
+        return headers
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def plan_export(
+    kind: str,
+    fmt: str,
+    compression: str,
+    bucket: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    departments: Optional[List[str]],
+) -> ExportPlan:
+    """
+    Validate an export request and take one of the export slots. Raises
+    ValueError for invalid parameters and ExportsBusy while the configured
+    number of exports is already running. The caller must stream the plan or
+    call its release().
+    """
+    global _active
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind!r}; expected one of {', '.join(KINDS)}.")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}."
+        )
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("Parquet export needs the pyarrow package; use format=csv.")
+    now = datetime.now(timezone.utc)
+    end = _as_utc(end) if end else now
+    start = _as_utc(start) if start else end - DEFAULT_RANGE
+    if start >= end:
+        raise ValueError("'from' must be before 'to'.")
+    level = None
+    if kind != "alerts":
+        level = history_store.level_for_export(bucket, int(start.timestamp()), int(now.timestamp()))
+    # Checked and taken together, so concurrent requests cannot overshoot the cap.
+    with _active_lock:
+        if _active >= MAX_CONCURRENT_EXPORTS:
+            raise ExportsBusy(f"{_active} export(s) already running; retry shortly.")
+        _active += 1
+    EXPORTS_ACTIVE.inc()
+    return ExportPlan(kind, fmt, compression, start, end, departments, level)
+
+
+def stream_export(plan: ExportPlan) -> Iterator[bytes]:
+    """Encoded export in chunks; iterate from a worker thread. Releases the plan's slot."""
+    try:
+        chunks = _counted(_chunks(plan), plan)
+        if plan.format == "parquet":
+            yield from _parquet(chunks, COLUMNS[plan.kind], plan.compression)
+        elif plan.compression == "gzip":
+            yield from _gzip(_csv(chunks, COLUMNS[plan.kind]))
+        else:
+            yield from _csv(chunks, COLUMNS[plan.kind])
+    finally:
+        plan.release()
+
+
+def _counted(chunks: Iterator[Chunk], plan: ExportPlan) -> Iterator[Chunk]:
+    for chunk in chunks:
+        rows = len(next(iter(chunk.values()), []))
+        if rows:
+            EXPORT_ROWS_TOTAL.inc(rows, kind=plan.kind, format=plan.format)
+            yield chunk
+
+
+def _chunks(plan: ExportPlan) -> Iterator[Chunk]:
+    start, end = plan.start.timestamp(), plan.end.timestamp()
+    if plan.kind == "alerts":
+        yield from _alert_chunks(start, end, plan.departments)
+        return
+    assert plan.level is not None
+    segments = history_store.iter_segments(plan.level.name, int(start), int(end), plan.departments)
+    to_chunk = _metric_chunk if plan.kind == "metrics" else _score_chunk
+    for segment in segments:
+        yield to_chunk(segment)
+
+
+def _metric_chunk(segment: SegmentRows) -> Chunk:
+    bucket_ids, department_ids = np.nonzero(segment.count)
+    counts = segment.count[bucket_ids, department_ids]
+    averages = segment.sums[bucket_ids, department_ids] / counts[:, None]
+    maxima = segment.maxima[bucket_ids, department_ids]
+    chunk: Chunk = {
+        "bucket_start": segment.bucket_starts[bucket_ids].tolist(),
+        "department": [segment.departments[index] for index in department_ids.tolist()],
+        "samples": counts.tolist(),
+    }
+    for index, metric in enumerate(METRICS):
+        chunk[f"{metric}_avg"] = averages[:, index].tolist()
+        chunk[f"{metric}_max"] = maxima[:, index].astype(np.float64).tolist()
+    return chunk
+
+
+def _score_chunk(segment: SegmentRows) -> Chunk:
+    bucket_ids, department_ids = np.nonzero(segment.count)
+    departments = [segment.departments[index] for index in department_ids.tolist()]
+    averages = (
+        segment.sums[bucket_ids, department_ids]
+        / segment.count[bucket_ids, department_ids][:, None]
+    )
+    # The rules in force now, applied to each bucket's average usage.
+    components, scores = rules_engine.active().score(departments, averages)
+    chunk: Chunk = {
+        "bucket_start": segment.bucket_starts[bucket_ids].tolist(),
+        "department": departments,
+        "score": scores.tolist(),
+    }
+    for index, metric in enumerate(METRICS):
+        chunk[f"{metric}_score"] = components[:, index].tolist()
+    return chunk
+
+
+def _alert_chunks(start: float, end: float, departments: Optional[Sequence[str]]) -> Iterator[Chunk]:
+    def to_chunk(entries: List[Dict]) -> Chunk:
+        chunk: Chunk = {name: [entry.get(name) for entry in entries] for name, _ in COLUMNS["alerts"]}
+        for name in ("opened_at", "closed_at"):
+            chunk[name] = [_epoch(value) for value in chunk[name]]
+        return chunk
+
+    for entries in alert_log.iter_closed(start, end, departments):
+        yield to_chunk(entries)
+    # Alerts still open, after the closed ones.
+    wanted = set(departments) if departments else None
+    active = [
+        {**alert, "opened_at": alert["created_at"], "closed_at": None}
+        for alert in alerts_state.get_active_alerts()
+        if (wanted is None or alert["department"] in wanted)
+        and _epoch(alert["created_at"]) < end
+    ]
+    if active:
+        yield to_chunk(active)
+
+
+def _epoch(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _iso(epoch: Optional[float]) -> str:
+    if epoch is None:
+        return ""
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+def _csv(chunks: Iterator[Chunk], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    names = [name for name, _ in columns]
+    times = [name for name, kind in columns if kind == "time"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    yield buffer.getvalue().encode()
+    for chunk in chunks:
+        for name in times:
+            # Bucket starts repeat once per department; format each only once.
+            labels = {value: _iso(value) for value in set(chunk[name])}
+            chunk[name] = [labels[value] for value in chunk[name]]
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(zip(*(chunk[name] for name in names)))
+        yield buffer.getvalue().encode()
+
+
+def _gzip(parts: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file for the Parquet writer whose bytes are taken as they are written."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _parquet(
+    chunks: Iterator[Chunk], columns: List[Tuple[str, str]], compression: str
+) -> Iterator[bytes]:
+    # Imported here: pyarrow is only needed for Parquet and is slow to import.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "time": pa.timestamp("ms", tz="UTC"),
+        "str": pa.string(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    times = [name for name, kind in columns if kind == "time"]
+    sink = _ChunkSink()
+    # One row group per chunk, flushed to the client as soon as it is written.
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for chunk in chunks:
+            for name in times:
+                chunk[name] = [None if value is None else round(value * 1000) for value in chunk[name]]
+            writer.write_table(pa.Table.from_pydict(chunk, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
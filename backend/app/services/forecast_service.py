@@ -0,0 +1,24 @@
+from datetime import timedelta
+from typing import Optional
+
+from app.api.schemas import ForecastPoint, ForecastResponse
+from transforms.forecast import forecaster
+from transforms.windows import parse_duration
+
+
+MAX_HORIZON = timedelta(days=7)
+
+
+async def get_forecast(department: str, horizon: str) -> Optional[ForecastResponse]:
+    """Return the Holt-Winters forecast for a department, or None if unknown."""
+    horizon_delta = parse_duration(horizon)
+    if horizon_delta > MAX_HORIZON:
+        raise ValueError("Forecast horizon is limited to 7d.")
+    points = forecaster.forecast(department, horizon_delta)
+    if points is None:
+        return None
+    return ForecastResponse(
+        department=department,
+        horizon=horizon,
+        points=[ForecastPoint(**point) for point in points],
+    )
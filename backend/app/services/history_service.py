@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from app.api.schemas import HistoryAggregateResponse, HistoryPoint
+from transforms.history import history_store
+from transforms.windows import parse_duration
+
+
+DEFAULT_RANGE = timedelta(days=30)
+MAX_BUCKETS = 50_000
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def get_history_aggregate(
+    metric: str,
+    bucket: str,
+    group_by: str,
+    agg: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    departments: Optional[List[str]],
+) -> HistoryAggregateResponse:
+    """
+    Aggregate retained history. Raises ValueError for invalid parameters.
+
+    Runs synchronously; callers on the event loop should offload it.
+    """
+    bucket_seconds = int(parse_duration(bucket).total_seconds())
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - DEFAULT_RANGE
+    if start >= end:
+        raise ValueError("'from' must be before 'to'.")
+    if (end - start).total_seconds() / bucket_seconds > MAX_BUCKETS:
+        raise ValueError(f"Query spans more than {MAX_BUCKETS} buckets; use a larger bucket.")
+
+    rows = history_store.aggregate(
+        metric=metric,
+        bucket_seconds=bucket_seconds,
+        start=int(start.timestamp()),
+        end=int(end.timestamp()),
+        agg=agg,
+        group_by_department=group_by == "department",
+        departments=departments,
+    )
+    points = [
+        HistoryPoint(
+            bucket_start=datetime.fromtimestamp(row["bucket_start"], timezone.utc).isoformat(),
+            department=row.get("department"),
+            value=row["value"],
+            samples=row["samples"],
+        )
+        for row in rows
+    ]
+    return HistoryAggregateResponse(
+        metric=metric,
+        agg=agg,
+        bucket=bucket,
+        group_by=group_by,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        points=points,
+    )
@@ -0,0 +1,217 @@
+"""
+Single-serialization fan-out for the `/ws/metrics` socket.
+
+One task snapshots `metrics_state` on a fixed interval, encodes the frame once
+and hands the same string to every subscriber's bounded queue. A subscriber
+that cannot keep up loses frames (coalesced to the newest, or oldest dropped)
+instead of buffering without limit, and is disconnected after too many drops.
+
+Clients that negotiated a binary encoding (see `wire_format`) receive a delta
+against the previous tick when they got that tick, and a keyframe otherwise;
+each (encoding, keyframe/delta) pair is still encoded at most once per tick.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from app.services.wire_format import JSON, DeltaEncoder, Frame, encode_frame
+from observability.metrics import registry
+from transforms.state import metrics_state
+
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_ENCODE_SECONDS = registry.histogram(
+    "greenhealth_broadcast_encode_seconds",
+    "Time spent encoding one broadcast frame.",
+    ("channel",),
+)
+BROADCAST_FRAMES_TOTAL = registry.counter(
+    "greenhealth_broadcast_frames_total",
+    "Frames encoded by the broadcaster.",
+    ("channel",),
+)
+BROADCAST_DROPPED_TOTAL = registry.counter(
+    "greenhealth_broadcast_dropped_frames_total",
+    "Frames dropped for subscribers that could not keep up.",
+    ("channel",),
+)
+BROADCAST_DISCONNECTS_TOTAL = registry.counter(
+    "greenhealth_broadcast_slow_disconnects_total",
+    "Subscribers disconnected for being chronically slow or timing out on a send.",
+    ("channel",),
+)
+BROADCAST_SUBSCRIBERS = registry.gauge(
+    "greenhealth_broadcast_subscribers",
+    "Current broadcaster subscribers.",
+    ("channel",),
+)
+BROADCAST_FRAME_BYTES = registry.counter(
+    "greenhealth_broadcast_frame_bytes_total",
+    "Bytes of encoded broadcast frames (each frame counted once, not per client).",
+    ("encoding", "kind"),
+)
+
+
+class Tick:
+    """One broadcast snapshot, encoded lazily and at most once per format."""
+
+    def __init__(self, rows: List[Dict], keyframe: Frame, delta: Frame):
+        self.seq = keyframe.seq
+        self._rows = rows
+        self._keyframe = keyframe
+        self._delta = delta
+        self._encoded: Dict[Tuple[str, str], Union[str, bytes]] = {}
+
+    def frame_for(self, encoding: str, last_seq: Optional[int]) -> Union[str, bytes]:
+        kind = "delta" if encoding != JSON and last_seq == self.seq - 1 else "keyframe"
+        cached = self._encoded.get((encoding, kind))
+        if cached is None:
+            with BROADCAST_ENCODE_SECONDS.time(channel=MetricsBroadcaster.channel):
+                if encoding == JSON:
+                    cached = json.dumps({"metrics": self._rows}, default=str)
+                else:
+                    cached = encode_frame(
+                        self._delta if kind == "delta" else self._keyframe, encoding
+                    )
+            self._encoded[(encoding, kind)] = cached
+            BROADCAST_FRAMES_TOTAL.inc(channel=MetricsBroadcaster.channel)
+            BROADCAST_FRAME_BYTES.inc(
+                len(cached) if isinstance(cached, bytes) else len(cached.encode("utf-8")),
+                encoding=encoding,
+                kind=kind,
+            )
+        return cached
+
+
+class Subscriber:
+    def __init__(self, queue_size: int, coalesce: bool, max_drops: int, encoding: str = JSON):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=1 if coalesce else queue_size)
+        self._max_drops = max_drops
+        self.encoding = encoding
+        # Sequence number of the last tick sent; deltas need the one before.
+        self.last_seq: Optional[int] = None
+        self.consecutive_drops = 0
+        self.dropped = 0
+        self.evicted = False
+
+    def render(self, tick: Tick) -> Union[str, bytes]:
+        frame = tick.frame_for(self.encoding, self.last_seq)
+        self.last_seq = tick.seq
+        return frame
+
+    def offer(self, frame: Tick) -> bool:
+        """Queue a frame without blocking; returns False once the client is evicted."""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+            self.consecutive_drops += 1
+            if self.consecutive_drops >= self._max_drops:
+                self.evicted = True
+                # Wake the sender so it can close the socket.
+                self._queue.put_nowait(None)
+                return False
+        else:
+            self.consecutive_drops = 0
+        self._queue.put_nowait(frame)
+        return True
+
+    async def next_frame(self) -> Optional[Tick]:
+        """Next frame to send, or None if the subscriber was evicted."""
+        frame = await self._queue.get()
+        return None if self.evicted else frame
+
+
+class MetricsBroadcaster:
+    channel = "metrics"
+
+    def __init__(self) -> None:
+        self.interval_seconds = float(os.getenv("GREENHEALTH_WS_INTERVAL_SECONDS", "3"))
+        self.queue_size = max(1, int(os.getenv("GREENHEALTH_WS_QUEUE_SIZE", "4")))
+        self.coalesce = (
+            os.getenv("GREENHEALTH_WS_QUEUE_POLICY", "coalesce").strip().lower()
+            != "drop_oldest"
+        )
+        self.max_drops = max(1, int(os.getenv("GREENHEALTH_WS_MAX_DROPS", "10")))
+        self.send_timeout_seconds = float(
+            os.getenv("GREENHEALTH_WS_SEND_TIMEOUT_SECONDS", "10")
+        )
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._delta_encoder = DeltaEncoder()
+        self._latest_tick: Optional[Tick] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, encoding: str = JSON) -> Subscriber:
+        subscriber = Subscriber(self.queue_size, self.coalesce, self.max_drops, encoding)
+        self._subscribers.add(subscriber)
+        BROADCAST_SUBSCRIBERS.set(len(self._subscribers), channel=self.channel)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        BROADCAST_SUBSCRIBERS.set(len(self._subscribers), channel=self.channel)
+
+    def record_slow_disconnect(self) -> None:
+        """Count a socket closed because a send exceeded `send_timeout_seconds`."""
+        BROADCAST_DISCONNECTS_TOTAL.inc(channel=self.channel)
+
+    def latest_tick(self) -> Tick:
+        if self._latest_tick is None:
+            self._latest_tick = self._advance()
+        return self._latest_tick
+
+    def stats(self) -> dict:
+        encodings: Dict[str, int] = {}
+        for subscriber in self._subscribers:
+            encodings[subscriber.encoding] = encodings.get(subscriber.encoding, 0) + 1
+        return {
+            "subscribers": len(self._subscribers),
+            "encodings": encodings,
+            "dropped_frames": int(BROADCAST_DROPPED_TOTAL.value(channel=self.channel)),
+            "slow_disconnects": int(BROADCAST_DISCONNECTS_TOTAL.value(channel=self.channel)),
+            "policy": "coalesce" if self.coalesce else "drop_oldest",
+        }
+
+    def _advance(self) -> Tick:
+        rows = metrics_state.get_latest_snapshot()
+        keyframe, delta = self._delta_encoder.advance(rows)
+        return Tick(rows, keyframe, delta)
+
+    def publish(self, frame: Tick) -> None:
+        for subscriber in list(self._subscribers):
+            before = subscriber.dropped
+            if not subscriber.offer(frame):
+                BROADCAST_DISCONNECTS_TOTAL.inc(channel=self.channel)
+                self.unsubscribe(subscriber)
+            if subscriber.dropped != before:
+                BROADCAST_DROPPED_TOTAL.inc(channel=self.channel)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._subscribers:
+                    tick = self._advance()
+                    self._latest_tick = tick
+                    self.publish(tick)
+            except Exception:  # pragma: no cover - keep broadcasting
+                logger.exception("Metrics broadcast tick failed.")
+            await asyncio.sleep(self.interval_seconds)
+
+
+metrics_broadcaster = MetricsBroadcaster()
@@ -1,13 +1,37 @@
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional
 
 from app.api.schemas import MetricsResponse, DepartmentMetric, SustainabilityScoreResponse
-from transforms.state import metrics_state, score_state
+from transforms.freshness import freshness_tracker
+from transforms.state import metrics_state, score_state, windowed_metrics_state
+from transforms.windows import configured_window_specs, primary_window_name
 
 
-async def get_current_metrics() -> MetricsResponse:
-    """Return latest metrics snapshot from the streaming engine state."""
+def available_windows() -> List[str]:
+    names = [spec.name for spec in configured_window_specs()]
+    primary = primary_window_name()
+    if primary not in names:
+        names.append(primary)
+    return names
+
+
+def _optional_str(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+async def get_current_metrics(window: Optional[str] = None) -> MetricsResponse:
+    """
+    Return latest metrics snapshot from the streaming engine state.
+
+    Without `window` the latest raw event per department is returned; with a
+    configured window name (e.g. `1h`) the latest aggregate of that window,
+    including p50/p95/max energy.
+    """
+    if window:
+        return _get_windowed_metrics(window)
+
     rows = metrics_state.get_latest_snapshot()
+    freshness = freshness_tracker.departments()
     metrics = [
         DepartmentMetric(
             department=row["department"],
@@ -19,10 +43,34 @@ async def get_current_metrics() -> MetricsResponse:
             timestamp=str(
                 row.get("timestamp", row.get("window_end", datetime.utcnow().isoformat()))
             ),
+            published_at=freshness.get(row["department"], {}).get("published_at"),
+            lag_seconds=freshness.get(row["department"], {}).get("lag_seconds"),
+        )
+        for row in rows
+    ]
+    return MetricsResponse(
+        metrics=metrics, stale_departments=freshness_tracker.stale_departments()
+    )
+
+
+def _get_windowed_metrics(window: str) -> MetricsResponse:
+    rows = windowed_metrics_state.get_latest_snapshot(window)
+    metrics = [
+        DepartmentMetric(
+            department=row["department"],
+            energy_kwh=row.get("energy_kwh_avg", 0.0),
+            medical_waste_kg=row.get("medical_waste_kg_avg", 0.0),
+            paper_kg=row.get("paper_kg_avg", 0.0),
+            timestamp=str(row.get("window_end", datetime.utcnow().isoformat())),
+            energy_kwh_p50=row.get("energy_kwh_p50"),
+            energy_kwh_p95=row.get("energy_kwh_p95"),
+            energy_kwh_max=row.get("energy_kwh_max"),
+            window_start=_optional_str(row.get("window_start")),
+            window_end=_optional_str(row.get("window_end")),
         )
         for row in rows
     ]
-    return MetricsResponse(metrics=metrics)
+    return MetricsResponse(metrics=metrics, window=window)
 
 
 async def get_sustainability_score() -> SustainabilityScoreResponse:
@@ -0,0 +1,151 @@
+"""
+What-if evaluation of the sustainability score and static alerts.
+
+Every scenario scales the current usage of some departments. The adjustments
+become one (scenarios x departments x metrics) factor array, and the active
+rules score and threshold all scenarios in a single broadcast NumPy operation,
+the same way the pipeline scores the live state.
+"""
+
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from transforms.anomaly import ALERT_TYPES, METRICS
+from transforms.rules import SEVERITIES, rules_engine, usage_matrix
+from transforms.state import metrics_state, windowed_metrics_state
+from transforms.windows import primary_window_name
+
+
+# Adjusts every department; department entries multiply on top of it.
+ALL_DEPARTMENTS = "*"
+MAX_SCENARIOS = max(1, int(os.getenv("GREENHEALTH_SCENARIO_MAX", "10000")))
+_METRIC_INDEX = {metric: index for index, metric in enumerate(METRICS)}
+
+
+@dataclass
+class Scenario:
+    # department (or "*") -> metric -> multiplier, e.g. {"Radiology": {"energy_kwh": 0.85}}
+    adjustments: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    name: Optional[str] = None
+
+
+@dataclass
+class ScenarioRequest:
+    scenarios: List[Scenario] = field(default_factory=list)
+    # Return per-department scores for each scenario; off for large sweeps.
+    include_departments: bool = False
+
+
+def _current_rows() -> List[Dict]:
+    # Same source the pipeline scores: the primary window, else raw events.
+    rows = windowed_metrics_state.get_latest_snapshot(primary_window_name())
+    return rows or metrics_state.get_latest_snapshot()
+
+
+def _factors(scenarios: List[Scenario], departments: List[str]) -> np.ndarray:
+    index = {department: position for position, department in enumerate(departments)}
+    factors = np.ones((len(scenarios), len(departments), len(METRICS)))
+    for position, scenario in enumerate(scenarios):
+        for department, adjustment in scenario.adjustments.items():
+            if department == ALL_DEPARTMENTS:
+                target = slice(None)
+            elif department in index:
+                target = index[department]
+            else:
+                raise ValueError(
+                    f"Scenario {position}: no current data for department {department!r}."
+                )
+            for metric, factor in adjustment.items():
+                column = _METRIC_INDEX.get(metric)
+                if column is None:
+                    raise ValueError(
+                        f"Scenario {position}: unknown metric {metric!r}; "
+                        f"expected one of {', '.join(METRICS)}."
+                    )
+                if not (math.isfinite(factor) and factor >= 0):
+                    raise ValueError(
+                        f"Scenario {position}: multipliers must be finite and >= 0."
+                    )
+                with np.errstate(over="ignore"):
+                    factors[position, target, column] *= factor
+    # Finite multipliers can still overflow when several apply to one value.
+    if not np.isfinite(factors).all():
+        raise ValueError("Scenario multipliers are too large.")
+    return factors
+
+
+def evaluate_scenarios(req: ScenarioRequest) -> Dict:
+    """
+    Score every scenario against the current state, shaped like
+    `ScenarioEvaluateResponse`. Plain dicts: the route validates the response
+    once, and building models here as well doubled the cost of large sweeps.
+
+    Raises ValueError for invalid scenarios and LookupError before the
+    pipeline has published any metrics.
+    """
+    if not req.scenarios:
+        raise ValueError("scenarios must not be empty.")
+    if len(req.scenarios) > MAX_SCENARIOS:
+        raise ValueError(
+            f"At most {MAX_SCENARIOS} scenarios per request; got {len(req.scenarios)}."
+        )
+
+    started = time.perf_counter()
+    rows = _current_rows()
+    if not rows:
+        raise LookupError("No current metrics to evaluate scenarios against yet.")
+    departments = [row["department"] for row in rows]
+    usage = usage_matrix(rows)
+    rules = rules_engine.active()
+
+    values = usage[None, :, :] * _factors(req.scenarios, departments)
+    _, department_scores = rules.score(departments, values)
+    overall = department_scores.mean(axis=1)
+    levels = rules.alert_levels(departments, values)
+    _, baseline_scores = rules.score(departments, usage)
+    baseline_overall = float(baseline_scores.mean())
+
+    # Alerts in scenario order (np.nonzero is row-major); offsets per scenario.
+    scenario_ids, department_ids, metric_ids = np.nonzero(levels >= 0)
+    offsets = np.searchsorted(scenario_ids, np.arange(len(req.scenarios) + 1)).tolist()
+    # Gather alert fields in bulk; indexing arrays per alert would dominate.
+    alert_departments = department_ids.tolist()
+    alert_metrics = metric_ids.tolist()
+    alert_levels = levels[scenario_ids, department_ids, metric_ids].tolist()
+    alert_values = values[scenario_ids, department_ids, metric_ids].tolist()
+
+    overall_list = overall.tolist()
+    scores_list = department_scores.tolist() if req.include_departments else None
+    results = []
+    for position, scenario in enumerate(req.scenarios):
+        result = {
+            "name": scenario.name,
+            "overall_score": overall_list[position],
+            "delta": overall_list[position] - baseline_overall,
+            "alerts": [
+                {
+                    "department": departments[alert_departments[item]],
+                    "type": ALERT_TYPES[alert_metrics[item]],
+                    "severity": SEVERITIES[alert_levels[item]],
+                    "value": alert_values[item],
+                }
+                for item in range(offsets[position], offsets[position + 1])
+            ],
+        }
+        if scores_list is not None:
+            result["department_scores"] = dict(zip(departments, scores_list[position]))
+        results.append(result)
+    return {
+        "rules_version": rules.version,
+        "baseline": {
+            "overall_score": baseline_overall,
+            "department_scores": dict(zip(departments, baseline_scores.tolist())),
+        },
+        "scenarios": results,
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
@@ -0,0 +1,337 @@
+"""
+Compact encodings for metric snapshots: msgpack and a binary columnar layout.
+
+Both carry the same logical frame: a department dictionary (id -> name),
+columns of dictionary ids, integer epoch seconds and float32 values, and for
+delta frames the ids removed since the base frame. JSON stays the default so
+existing dashboards are unaffected.
+
+Columnar layout, little-endian:
+
+    u8 version (1) | u8 flags (bit 0: delta) | u32 seq | u32 base seq (0 = keyframe)
+    u16 n_entries, n_entries * (u16 id | u8 len | utf-8 name)
+    u8 n_columns, n_columns * (u8 len | name | u8 type: 0 u16 id, 1 u32 epoch, 2 f32)
+    u16 n_rows, then each column's n_rows values back to back
+    u16 n_removed, n_removed * u16 id
+"""
+
+import math
+import struct
+from functools import lru_cache
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - in requirements.txt; minimal installs fall back
+    msgpack = None
+
+
+JSON = "json"
+MSGPACK = "msgpack"
+COLUMNAR = "columnar"
+
+SUBPROTOCOLS = {
+    "greenhealth.json.v1": JSON,
+    "greenhealth.msgpack.v1": MSGPACK,
+    "greenhealth.columnar.v1": COLUMNAR,
+}
+MEDIA_TYPES = {
+    JSON: "application/json",
+    MSGPACK: "application/msgpack",
+    COLUMNAR: "application/vnd.greenhealth.columnar",
+}
+_ACCEPT_TYPES = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.greenhealth.columnar": COLUMNAR,
+}
+
+TIME_COLUMNS = ("timestamp", "window_start", "window_end", "published_at")
+METRIC_COLUMNS = ("department", "timestamp", "energy_kwh", "medical_waste_kg", "paper_kg")
+
+_ID, _EPOCH, _FLOAT = 0, 1, 2
+_DTYPES = {_ID: np.dtype("<u2"), _EPOCH: np.dtype("<u4"), _FLOAT: np.dtype("<f4")}
+_HEADER = struct.Struct("<BBII")
+
+
+def available_encodings() -> List[str]:
+    encodings = [JSON, COLUMNAR]
+    if msgpack is not None:
+        encodings.append(MSGPACK)
+    return encodings
+
+
+def negotiate_subprotocol(offered: Iterable[str]) -> Tuple[str, Optional[str]]:
+    """First supported subprotocol in the client's order, as (encoding, subprotocol)."""
+    available = available_encodings()
+    for subprotocol in offered:
+        encoding = SUBPROTOCOLS.get(subprotocol.strip())
+        if encoding in available:
+            return encoding, subprotocol.strip()
+    return JSON, None
+
+
+def negotiate_accept(accept: Optional[str]) -> str:
+    """Preferred supported encoding in an `Accept` header; JSON otherwise."""
+    if not accept:
+        return JSON
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        candidates.append((-quality, position, media_type.strip().lower()))
+    available = available_encodings()
+    for negative_quality, _, media_type in sorted(candidates):
+        encoding = _ACCEPT_TYPES.get(media_type)
+        if negative_quality < 0 and encoding in available:
+            return encoding
+    return JSON
+
+
+def _epoch(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    to_epoch = getattr(value, "timestamp", None)
+    if callable(to_epoch):
+        return int(to_epoch())
+    try:
+        return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return 0
+
+
+def _float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+class DepartmentDictionary:
+    """Stable department -> small integer ids for the lifetime of the process."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def id_for(self, name: str) -> int:
+        department_id = self._ids.get(name)
+        if department_id is None:
+            department_id = len(self._names)
+            self._ids[name] = department_id
+            self._names.append(name)
+        return department_id
+
+    def name(self, department_id: int) -> str:
+        return self._names[department_id]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+@dataclass
+class Frame:
+    seq: int
+    # Sequence number this frame is a delta against; None for a keyframe.
+    base: Optional[int]
+    names: Dict[int, str]
+    columns: Dict[str, np.ndarray]
+    removed: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype="<u2"))
+
+    @property
+    def rows(self) -> int:
+        return len(self.columns["department"])
+
+
+def _column_kind(name: str) -> int:
+    if name == "department":
+        return _ID
+    if name in TIME_COLUMNS:
+        return _EPOCH
+    return _FLOAT
+
+
+def to_columns(
+    rows: Sequence[Dict], names: Sequence[str], dictionary: DepartmentDictionary
+) -> Dict[str, np.ndarray]:
+    columns: Dict[str, np.ndarray] = {}
+    for name in names:
+        kind = _column_kind(name)
+        if kind == _ID:
+            values = [dictionary.id_for(row["department"]) for row in rows]
+        elif kind == _EPOCH:
+            values = [_epoch(row.get(name)) for row in rows]
+        else:
+            values = [_float(row.get(name)) for row in rows]
+        columns[name] = np.asarray(values, dtype=_DTYPES[kind])
+    return columns
+
+
+def table_frame(rows: Sequence[Dict], names: Sequence[str]) -> Frame:
+    """Stand-alone keyframe, e.g. for a REST response."""
+    dictionary = DepartmentDictionary()
+    columns = to_columns(rows, names, dictionary)
+    ids = columns["department"].tolist()
+    return Frame(seq=0, base=None, names={i: dictionary.name(i) for i in ids}, columns=columns)
+
+
+class DeltaEncoder:
+    """
+    Turns successive snapshots into a keyframe and a delta per tick.
+
+    The delta against the previous tick carries only departments whose row
+    changed (after float32 rounding), plus dictionary entries for departments
+    that were not in the previous tick and the ids that disappeared.
+    """
+
+    def __init__(self, names: Sequence[str] = METRIC_COLUMNS):
+        self.names = tuple(names)
+        self.dictionary = DepartmentDictionary()
+        self.seq = 0
+        # Previous tick's values per department id, as raw 32-bit words.
+        self._previous = np.zeros((0, len(self.names) - 1), dtype="<u4")
+        self._present = np.zeros(0, dtype=bool)
+
+    def advance(self, rows: Sequence[Dict]) -> Tuple[Frame, Frame]:
+        columns = to_columns(rows, self.names, self.dictionary)
+        ids = columns["department"].astype(np.intp)
+        # float32 and u32 columns are both 4 bytes: compare them bitwise.
+        words = np.column_stack(
+            [columns[name].view("<u4") for name in self.names if name != "department"]
+        ) if len(ids) else np.zeros((0, self._previous.shape[1]), dtype="<u4")
+
+        size = len(self.dictionary)
+        if size > len(self._present):
+            grown = np.zeros((size, self._previous.shape[1]), dtype="<u4")
+            grown[: len(self._previous)] = self._previous
+            self._previous = grown
+            self._present = np.concatenate(
+                [self._present, np.zeros(size - len(self._present), dtype=bool)]
+            )
+        was_present = self._present[ids]
+        changed = ~was_present | (self._previous[ids] != words).any(axis=1)
+        present = np.zeros_like(self._present)
+        present[ids] = True
+        removed = np.nonzero(self._present & ~present)[0]
+
+        self.seq += 1
+        keyframe = Frame(
+            seq=self.seq,
+            base=None,
+            names={i: self.dictionary.name(i) for i in ids.tolist()},
+            columns=columns,
+        )
+        delta = Frame(
+            seq=self.seq,
+            base=self.seq - 1,
+            names={i: self.dictionary.name(i) for i in ids[~was_present].tolist()},
+            columns={name: column[changed] for name, column in columns.items()},
+            removed=removed.astype("<u2"),
+        )
+        self._previous[ids] = words
+        self._present = present
+        return keyframe, delta
+
+
+@lru_cache(maxsize=32)
+def _column_header(names: Tuple[str, ...]) -> bytes:
+    parts = [struct.pack("<B", len(names))]
+    for name in names:
+        encoded = name.encode("utf-8")
+        parts.append(struct.pack("<B", len(encoded)) + encoded + struct.pack("<B", _column_kind(name)))
+    return b"".join(parts)
+
+
+def encode_columnar(frame: Frame) -> bytes:
+    parts = [
+        _HEADER.pack(1, 0 if frame.base is None else 1, frame.seq, frame.base or 0),
+        struct.pack("<H", len(frame.names)),
+    ]
+    for department_id, name in frame.names.items():
+        encoded = name.encode("utf-8")[:255]
+        parts.append(struct.pack("<HB", department_id, len(encoded)) + encoded)
+    parts.append(_column_header(tuple(frame.columns)))
+    parts.append(struct.pack("<H", frame.rows))
+    for name, column in frame.columns.items():
+        parts.append(column.astype(_DTYPES[_column_kind(name)], copy=False).tobytes())
+    parts.append(struct.pack("<H", len(frame.removed)))
+    parts.append(frame.removed.astype("<u2", copy=False).tobytes())
+    return b"".join(parts)
+
+
+def decode_columnar(payload: bytes) -> Frame:
+    """Inverse of `encode_columnar`; used by the benchmark and client tests."""
+    version, flags, seq, base = _HEADER.unpack_from(payload, 0)
+    if version != 1:
+        raise ValueError(f"Unsupported columnar frame version {version}.")
+    offset = _HEADER.size
+    (entries,) = struct.unpack_from("<H", payload, offset)
+    offset += 2
+    names: Dict[int, str] = {}
+    for _ in range(entries):
+        department_id, length = struct.unpack_from("<HB", payload, offset)
+        offset += 3
+        names[department_id] = payload[offset : offset + length].decode("utf-8")
+        offset += length
+    (column_count,) = struct.unpack_from("<B", payload, offset)
+    offset += 1
+    layout = []
+    for _ in range(column_count):
+        (length,) = struct.unpack_from("<B", payload, offset)
+        offset += 1
+        name = payload[offset : offset + length].decode("utf-8")
+        offset += length
+        (kind,) = struct.unpack_from("<B", payload, offset)
+        offset += 1
+        layout.append((name, _DTYPES[kind]))
+    (rows,) = struct.unpack_from("<H", payload, offset)
+    offset += 2
+    columns: Dict[str, np.ndarray] = {}
+    for name, dtype in layout:
+        columns[name] = np.frombuffer(payload, dtype=dtype, count=rows, offset=offset)
+        offset += rows * dtype.itemsize
+    (removed_count,) = struct.unpack_from("<H", payload, offset)
+    offset += 2
+    removed = np.frombuffer(payload, dtype="<u2", count=removed_count, offset=offset)
+    return Frame(
+        seq=seq,
+        base=base if flags & 1 else None,
+        names=names,
+        columns=columns,
+        removed=removed,
+    )
+
+
+def encode_msgpack(frame: Frame) -> bytes:
+    if msgpack is None:  # pragma: no cover - negotiation never selects it
+        raise RuntimeError("msgpack is not installed.")
+    return msgpack.packb(
+        {
+            "seq": frame.seq,
+            "base": frame.base,
+            # [id, name] pairs: msgpack readers reject integer map keys by default.
+            "departments": [[department_id, name] for department_id, name in frame.names.items()],
+            "columns": {name: column.tolist() for name, column in frame.columns.items()},
+            "removed": frame.removed.tolist(),
+        },
+        use_single_float=True,
+    )
+
+
+def encode_frame(frame: Frame, encoding: str) -> bytes:
+    if encoding == MSGPACK:
+        return encode_msgpack(frame)
+    if encoding == COLUMNAR:
+        return encode_columnar(frame)
+    raise ValueError(f"Unknown binary encoding {encoding!r}.")
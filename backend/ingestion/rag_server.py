@@ -3,15 +3,14 @@ from __future__ import annotations
 import logging
 import os
 from threading import Lock
-from typing import Dict, Optional
-
-import pathway as pw
-from pathway.xpacks.llm import embedders, llms, parsers, question_answering, splitters
-from pathway.xpacks.llm.vector_store import VectorStoreServer
+from typing import Any, Dict, Optional
 
 
 logger = logging.getLogger(__name__)
-_rag_app: Optional[question_answering.BaseRAGQuestionAnswerer] = None
+# Pathway and the LLM xPack (torch, sentence-transformers) are imported inside
+# build_rag_qa_server so the API can import this module for status reporting
+# without paying for the embedding stack.
+_rag_app: Optional[Any] = None
 _rag_status_lock = Lock()
 _rag_status: Dict[str, Optional[str] | bool] = {
     "enabled": False,
@@ -81,6 +80,16 @@ def build_rag_qa_server() -> bool:
         return False
 
     try:
+        import pathway as pw
+        from pathway.xpacks.llm import (
+            embedders,
+            llms,
+            parsers,
+            question_answering,
+            splitters,
+        )
+        from pathway.xpacks.llm.vector_store import VectorStoreServer
+
         docs = pw.io.fs.read(
             path=docs_dir,
             format="binary",
@@ -1,11 +1,63 @@
 from __future__ import annotations
 
+import logging
+import os
+from typing import Dict
+
 import pathway as pw
 
 from transforms.pipeline import build_streaming_graph
 from ingestion.rag_server import build_rag_qa_server
 
 
+logger = logging.getLogger(__name__)
+
+
+def _int_env(name: str, default: int, minimum: int = 1) -> int:
+    raw_value = os.getenv(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+    try:
+        value = int(raw_value)
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r; using %d.", name, raw_value, default)
+        return default
+    return max(minimum, value)
+
+
+def configure_worker_topology() -> Dict[str, int]:
+    """
+    Translate GREENHEALTH_PATHWAY_THREADS into the env var Pathway reads when
+    `pw.run()` starts its workers. A value already exported by `pathway spawn`
+    (PATHWAY_THREADS) wins.
+
+    The engine publishes into in-memory state read by the API in the same
+    process, so it is always a single Pathway process; more processes would
+    wait for peers nothing launches, and their state would never reach the API.
+    Raises ValueError if launched as one of several processes
+    (`pathway spawn --processes N`).
+    """
+    threads = _int_env("PATHWAY_THREADS", _int_env("GREENHEALTH_PATHWAY_THREADS", 1))
+    processes = _int_env("PATHWAY_PROCESSES", 1)
+    if processes > 1:
+        raise ValueError(
+            f"{processes} Pathway processes configured, but the stream engine "
+            "publishes its state into this process's memory; scale with "
+            "GREENHEALTH_PATHWAY_THREADS instead."
+        )
+
+    os.environ["PATHWAY_THREADS"] = str(threads)
+    os.environ["PATHWAY_PROCESSES"] = "1"
+    os.environ["PATHWAY_PROCESS_ID"] = "0"
+
+    topology = {"processes": 1, "threads": threads}
+    logger.info(
+        "Pathway topology: threads=%d (windows partitioned by department across workers)",
+        threads,
+    )
+    return topology
+
+
 def main() -> None:
     """
     Entry point for the Pathway streaming engine.
@@ -14,7 +66,11 @@ def main() -> None:
     streaming concerns isolated from the API layer:
 
         python -m ingestion.runner
+
+    Worker count is controlled with GREENHEALTH_PATHWAY_THREADS; the engine
+    always runs as one process (see `configure_worker_topology`).
     """
+    configure_worker_topology()
     build_streaming_graph()
     build_rag_qa_server()
     pw.run()
@@ -22,4 +78,3 @@ def main() -> None:
 
 if __name__ == "__main__":
     main()
-
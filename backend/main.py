@@ -16,11 +16,19 @@ for _candidate in (_BACKEND_DIR / ".env", _BACKEND_DIR.parent / ".env"):
     if _candidate.exists():
         load_dotenv(_candidate, override=False)
 
+from app.api.internal import router as internal_router
 from app.api.routes import router as api_router
-from app.services.copilot_service import get_copilot_runtime_status
+from app.services.alert_advisor import alert_advisor
+from app.services.alerts_stream import RESYNC, AlertFilter, alerts_hub
+from app.services.metrics_broadcast import Tick, metrics_broadcaster
+from app.services.wire_format import negotiate_accept, negotiate_subprotocol
+from app.services.copilot_service import get_copilot_runtime_status, warm_up_copilot
 from ingestion.rag_server import get_rag_status
+from observability.diagnostics import diagnostics_enabled, diagnostics_token
+from observability.metrics import WEBSOCKET_CLIENTS, WEBSOCKET_SEND_SECONDS
+from transforms.freshness import freshness_tracker
+from transforms.rules import rules_engine
 from transforms.state import metrics_state
-from ingestion.runner import main as run_stream_engine
 
 
 logger = logging.getLogger(__name__)
@@ -37,9 +45,18 @@ def _parse_allowed_origins(raw_value: Optional[str]) -> list[str]:
     return origins or ["*"]
 
 
+def _lazy_startup_enabled() -> bool:
+    raw_value = os.getenv("GREENHEALTH_STARTUP_MODE", "lazy").strip().lower()
+    return raw_value != "eager"
+
+
 def _run_stream_engine_with_guard() -> None:
     global _stream_error
     try:
+        # Imported here so Pathway and the RAG/embedding stack load on the
+        # stream-engine thread instead of delaying API startup.
+        from ingestion.runner import main as run_stream_engine
+
         run_stream_engine()
     except Exception as exc:  # pragma: no cover - process-level guard
         _stream_error = str(exc)
@@ -96,10 +113,30 @@ def create_app() -> FastAPI:
     )
 
     app.include_router(api_router)
+    app.include_router(internal_router)
 
     @app.on_event("startup")
     async def start_stream_engine():
+        alerts_hub.bind(asyncio.get_running_loop())
+        alert_advisor.bind(asyncio.get_running_loop())
+        metrics_broadcaster.start()
+        if diagnostics_enabled() and diagnostics_token() is None:
+            logger.warning(
+                "GREENHEALTH_ENABLE_DIAGNOSTICS is on but GREENHEALTH_DIAGNOSTICS_TOKEN "
+                "is unset; /internal/diagnostics/* will answer 503."
+            )
         _ensure_stream_engine_running()
+        if _lazy_startup_enabled():
+            threading.Thread(
+                target=warm_up_copilot, name="copilot-warmup", daemon=True
+            ).start()
+        else:
+            warm_up_copilot()
+
+    @app.on_event("shutdown")
+    async def stop_broadcasters():
+        await metrics_broadcaster.stop()
+        await alert_advisor.stop()
 
     @app.get("/livez")
     async def liveness_check():
@@ -116,6 +153,7 @@ def create_app() -> FastAPI:
 
         rag_status = get_rag_status()
         copilot_status = get_copilot_runtime_status()
+        freshness = freshness_tracker.status()
         rag_required = bool(copilot_status.get("rag_required"))
 
         issues = []
@@ -151,8 +189,24 @@ def create_app() -> FastAPI:
             copilot_error = copilot_status.get("startup_error") or "rag_client_init_failed"
             issues.append(f"copilot_rag_client_not_ready: {copilot_error}")
 
+        components = {
+            "api": {"ready": True},
+            "stream": {
+                "ready": stream_thread_alive and metrics_count > 0,
+                "stale_departments": freshness["stale_departments"],
+            },
+            "rag": {"ready": bool(rag_status.get("ready"))},
+            "copilot": {
+                "ready": bool(copilot_status.get("loaded"))
+                and (not rag_required or bool(copilot_status.get("rag_client_ready"))),
+                "loaded": bool(copilot_status.get("loaded")),
+            },
+        }
+
         payload = {
             "status": "ok" if not issues else "degraded",
+            "startup_mode": "lazy" if _lazy_startup_enabled() else "eager",
+            "components": components,
             "stream": {
                 "alive": stream_thread_alive,
                 "metrics_count": metrics_count,
@@ -160,6 +214,10 @@ def create_app() -> FastAPI:
             },
             "rag": rag_status,
             "copilot": copilot_status,
+            "broadcast": metrics_broadcaster.stats(),
+            "alert_advisor": alert_advisor.stats(),
+            "rules": rules_engine.status(),
+            "freshness": freshness,
             "startup_grace_seconds": startup_grace_seconds,
             "issues": issues,
         }
@@ -174,12 +232,75 @@ app = create_app()
 
 @app.websocket("/ws/metrics")
 async def metrics_ws(websocket: WebSocket):
+    # Binary encodings are negotiated by subprotocol (browsers) or Accept header.
+    encoding, subprotocol = negotiate_subprotocol(websocket.scope.get("subprotocols") or [])
+    if subprotocol is None:
+        encoding = negotiate_accept(websocket.headers.get("accept"))
+    await websocket.accept(subprotocol=subprotocol)
+    subscriber = metrics_broadcaster.subscribe(encoding)
+    WEBSOCKET_CLIENTS.inc(channel="metrics")
+    try:
+        tick: Optional[Tick] = metrics_broadcaster.latest_tick()
+        while tick is not None:
+            frame = subscriber.render(tick)
+            with WEBSOCKET_SEND_SECONDS.time(channel="metrics"):
+                await asyncio.wait_for(
+                    websocket.send_text(frame)
+                    if isinstance(frame, str)
+                    else websocket.send_bytes(frame),
+                    timeout=metrics_broadcaster.send_timeout_seconds,
+                )
+            tick = await subscriber.next_frame()
+        # Evicted for falling too far behind.
+        await websocket.close(code=1013, reason="Client too slow.")
+    except WebSocketDisconnect:
+        pass
+    except asyncio.TimeoutError:
+        # A send outlived GREENHEALTH_WS_SEND_TIMEOUT_SECONDS: as slow as an eviction.
+        metrics_broadcaster.record_slow_disconnect()
+        try:
+            # Bounded as well: the close frame queues behind the stalled send.
+            await asyncio.wait_for(
+                websocket.close(code=1013, reason="Client too slow."),
+                timeout=metrics_broadcaster.send_timeout_seconds,
+            )
+        except (asyncio.TimeoutError, RuntimeError, WebSocketDisconnect):
+            pass
+    finally:
+        metrics_broadcaster.unsubscribe(subscriber)
+        WEBSOCKET_CLIENTS.dec(channel="metrics")
+
+
+@app.websocket("/ws/alerts")
+async def alerts_ws(
+    websocket: WebSocket,
+    departments: Optional[str] = None,
+    types: Optional[str] = None,
+    min_severity: Optional[str] = None,
+):
+    try:
+        alert_filter = AlertFilter.from_query(departments, types, min_severity)
+    except ValueError as exc:
+        await websocket.close(code=1008, reason=str(exc))
+        return
+
     await websocket.accept()
+    queue = alerts_hub.subscribe(alert_filter)
+    WEBSOCKET_CLIENTS.inc(channel="alerts")
     try:
+        await websocket.send_json(alerts_hub.snapshot(alert_filter))
         while True:
-            snapshot = metrics_state.get_latest_snapshot()
-            await websocket.send_json({"metrics": snapshot})
-            await asyncio.sleep(3)
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=30)
+            except asyncio.TimeoutError:
+                # Heartbeat doubles as dead-connection detection.
+                message = {"type": "heartbeat"}
+            if message is RESYNC:
+                message = alerts_hub.snapshot(alert_filter)
+            with WEBSOCKET_SEND_SECONDS.time(channel="alerts"):
+                await websocket.send_json(message)
     except WebSocketDisconnect:
         pass
-
+    finally:
+        alerts_hub.unsubscribe(alert_filter, queue)
+        WEBSOCKET_CLIENTS.dec(channel="alerts")
@@ -0,0 +1,3 @@
+"""
+Low-overhead, in-process observability (metrics registry and diagnostics).
+"""
@@ -0,0 +1,161 @@
+"""
+On-demand diagnostics: a wall-clock stack sampler and tracemalloc snapshots.
+
+Both are blocking by nature, so callers on the event loop must run them through
+`asyncio.to_thread`; nothing here touches asyncio. A tracemalloc snapshot still
+holds the GIL while it walks the heap, pausing every thread (event loop and
+stream engine included) for its duration, so only one runs at a time and
+overlapping requests are rejected instead of queued.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+MAX_PROFILE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL_SECONDS = 0.001
+
+_profile_lock = threading.Lock()
+_tracemalloc_lock = threading.Lock()
+_baseline_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+class DiagnosticsBusyError(RuntimeError):
+    """Raised when a profile or snapshot is requested while another one is still running."""
+
+
+def diagnostics_enabled() -> bool:
+    raw_value = os.getenv("GREENHEALTH_ENABLE_DIAGNOSTICS", "false").strip().lower()
+    return raw_value in {"1", "true", "yes", "on"}
+
+
+def diagnostics_token() -> Optional[str]:
+    """Token callers must send; the endpoints stay closed while it is unset."""
+    return os.getenv("GREENHEALTH_DIAGNOSTICS_TOKEN", "").strip() or None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{frame.f_lineno})"
+
+
+def sample_stacks(seconds: float, interval_seconds: float = 0.01) -> str:
+    """
+    Sample every Python thread's stack for `seconds` and return collapsed stacks
+    (`thread;outer;...;inner count` per line), ready for flamegraph.pl/speedscope.
+    """
+    seconds = min(max(seconds, interval_seconds), MAX_PROFILE_SECONDS)
+    interval_seconds = max(interval_seconds, MIN_SAMPLE_INTERVAL_SECONDS)
+
+    if not _profile_lock.acquire(blocking=False):
+        raise DiagnosticsBusyError("A stack profile is already being collected.")
+
+    try:
+        own_ident = threading.get_ident()
+        counts: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels: List[str] = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(thread_names.get(ident, f"thread-{ident}"))
+                counts[";".join(reversed(labels))] += 1
+            time.sleep(interval_seconds)
+    finally:
+        _profile_lock.release()
+
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def _acquire_tracemalloc() -> None:
+    if not _tracemalloc_lock.acquire(blocking=False):
+        raise DiagnosticsBusyError("A memory snapshot is already being taken.")
+
+
+def start_tracemalloc(frames: int = 10) -> Dict:
+    global _baseline_snapshot
+    _acquire_tracemalloc()
+    try:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _baseline_snapshot = tracemalloc.take_snapshot()
+        return tracemalloc_status()
+    finally:
+        _tracemalloc_lock.release()
+
+
+def stop_tracemalloc() -> Dict:
+    global _baseline_snapshot
+    _acquire_tracemalloc()
+    try:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        _baseline_snapshot = None
+        return tracemalloc_status()
+    finally:
+        _tracemalloc_lock.release()
+
+
+def tracemalloc_status() -> Dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {"tracing": tracing, "current_bytes": current, "peak_bytes": peak}
+
+
+def _format_stat(stat) -> Dict:
+    frame = stat.traceback[0]
+    return {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+
+
+def _format_diff(stat) -> Dict:
+    frame = stat.traceback[0]
+    return {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "size_diff_bytes": stat.size_diff,
+        "count_diff": stat.count_diff,
+    }
+
+
+def memory_snapshot(limit: int = 25, reset_baseline: bool = False) -> Dict:
+    """
+    Return the top allocation sites and the growth since the baseline snapshot
+    taken by `start_tracemalloc` (or the previous call with `reset_baseline`).
+    """
+    global _baseline_snapshot
+    _acquire_tracemalloc()
+    try:
+        if not tracemalloc.is_tracing():
+            return {**tracemalloc_status(), "top": [], "growth": []}
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        top = [_format_stat(stat) for stat in snapshot.statistics("lineno")[:limit]]
+        growth: List[Dict] = []
+        if _baseline_snapshot is not None:
+            diffs = snapshot.compare_to(_baseline_snapshot, "lineno")
+            growth = [_format_diff(stat) for stat in diffs[:limit]]
+        if reset_baseline or _baseline_snapshot is None:
+            _baseline_snapshot = snapshot
+
+        return {**tracemalloc_status(), "top": top, "growth": growth}
+    finally:
+        _tracemalloc_lock.release()
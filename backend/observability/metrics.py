@@ -0,0 +1,327 @@
+"""
+Minimal Prometheus-compatible metrics registry.
+
+Counters, gauges and fixed-bucket histograms are kept in plain dicts guarded by
+one lock per metric, so recording a sample costs a dict lookup, a bisect and a
+few additions. That keeps it cheap enough to leave enabled in production.
+"""
+
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans sub-millisecond sink callbacks up to slow LLM round trips.
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Seconds between an event timestamp and the moment it reaches state.
+LAG_BUCKETS: Tuple[float, ...] = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# Prompt sizes, in tokens.
+TOKEN_BUCKETS: Tuple[float, ...] = (64, 128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label_value(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if not self.labelnames:
+            return ()
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:  # pragma: no cover - abstract
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum.
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+                self._counts[key] = counts
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels: str) -> Tuple[List[int], float]:
+        key = self._label_values(labels)
+        with self._lock:
+            return list(self._counts.get(key, [])), self._sums.get(key, 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+        lines: List[str] = []
+        bucket_labelnames = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(bucket_labelnames, key + (_format_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            plain_labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain_labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{plain_labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(  # type: ignore[return-value]
+            Histogram(name, help_text, labelnames, buckets)
+        )
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+SINK_CALLBACK_SECONDS = registry.histogram(
+    "greenhealth_sink_callback_seconds",
+    "Duration of Pathway subscribe callbacks.",
+    ("sink",),
+)
+RECOMPUTE_SECONDS = registry.histogram(
+    "greenhealth_recompute_seconds",
+    "Duration of score and alert recomputation.",
+    ("stage",),
+)
+STATE_PUBLISH_TOTAL = registry.counter(
+    "greenhealth_state_publish_total",
+    "Number of snapshots published into in-memory state.",
+    ("store",),
+)
+STATE_EVENT_LAG_SECONDS = registry.histogram(
+    "greenhealth_state_event_lag_seconds",
+    "Delay between an event timestamp and its publication into state.",
+    ("sink",),
+    buckets=LAG_BUCKETS,
+)
+WEBSOCKET_SEND_SECONDS = registry.histogram(
+    "greenhealth_websocket_send_seconds",
+    "Time spent sending one websocket frame.",
+    ("channel",),
+)
+WEBSOCKET_CLIENTS = registry.gauge(
+    "greenhealth_websocket_clients",
+    "Currently connected websocket clients.",
+    ("channel",),
+)
+LATE_EVENTS_DROPPED_TOTAL = registry.counter(
+    "greenhealth_late_events_dropped_total",
+    "Events that arrived after all their windows closed (allowed lateness exceeded).",
+    ("window",),
+)
+COPILOT_SPAN_SECONDS = registry.histogram(
+    "greenhealth_copilot_span_seconds",
+    "Copilot request time split by span.",
+    ("span",),
+)
+COPILOT_PROMPT_TOKENS = registry.histogram(
+    "greenhealth_copilot_prompt_tokens",
+    "Tokens in the assembled copilot prompt, split by part.",
+    ("part",),
+    buckets=TOKEN_BUCKETS,
+)
+COPILOT_CONTEXT_DROPPED_TOTAL = registry.counter(
+    "greenhealth_copilot_context_dropped_total",
+    "Telemetry lines and document chunks left out of copilot prompts.",
+    ("reason",),
+)
+COPILOT_PATH_TOTAL = registry.counter(
+    "greenhealth_copilot_path_total",
+    "Copilot answer paths (rag, llm) by outcome.",
+    ("path", "outcome"),
+)
+COPILOT_HEDGES_TOTAL = registry.counter(
+    "greenhealth_copilot_hedges_total",
+    "Direct LLM calls started while the RAG path was slow or after it failed.",
+    ("reason",),
+)
+ALERT_RECOMMENDATIONS_TOTAL = registry.counter(
+    "greenhealth_alert_recommendations_total",
+    "Background copilot recommendations for new alerts by outcome.",
+    ("outcome",),
+)
+EXPORT_ROWS_TOTAL = registry.counter(
+    "greenhealth_export_rows_total",
+    "Rows streamed by GET /export by kind and format.",
+    ("kind", "format"),
+)
+EXPORTS_ACTIVE = registry.gauge(
+    "greenhealth_exports_active",
+    "Bulk exports currently streaming.",
+)
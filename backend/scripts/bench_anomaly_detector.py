@@ -0,0 +1,56 @@
+"""
+Benchmark StreamingAnomalyDetector update cost against event volume.
+
+Run from the backend directory:
+
+    python scripts/bench_anomaly_detector.py [--departments 200]
+
+Per-event cost should stay flat as the event count grows (linear total time).
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from transforms.anomaly import DetectorConfig, StreamingAnomalyDetector  # noqa: E402
+
+
+def run(events: int, departments: int) -> float:
+    detector = StreamingAnomalyDetector(DetectorConfig())
+    names = [f"dept-{index}" for index in range(departments)]
+    samples = [
+        (random.gauss(120, 18), random.gauss(25, 5), random.gauss(15, 4))
+        for _ in range(1024)
+    ]
+    started = time.perf_counter()
+    for index in range(events):
+        detector.update(names[index % departments], samples[index & 1023])
+    detector.active_anomalies()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--departments", type=int, default=200)
+    parser.add_argument(
+        "--events", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'events':>10} {'seconds':>9} {'us/event':>9} {'events/s':>11}")
+    for events in args.events:
+        elapsed = run(events, args.departments)
+        print(
+            f"{events:>10} {elapsed:>9.3f} {elapsed / events * 1e6:>9.2f} "
+            f"{events / elapsed:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
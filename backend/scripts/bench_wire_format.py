@@ -0,0 +1,114 @@
+"""
+Benchmark /ws/metrics frame size and encode cost: JSON vs msgpack vs columnar.
+
+Run from the backend directory:
+
+    python scripts/bench_wire_format.py [--departments 60] [--ticks 500] [--changed 0.3]
+
+Each tick updates a fraction of departments (`--changed`) and encodes the
+snapshot the way the broadcaster does: JSON as a full snapshot, binary formats
+as a delta against the previous tick (keyframes are reported separately). The
+`zlib` column shows what per-message deflate would leave of each.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.wire_format import (  # noqa: E402
+    COLUMNAR,
+    MSGPACK,
+    DeltaEncoder,
+    available_encodings,
+    encode_frame,
+)
+
+
+def snapshots(departments: int, ticks: int, changed: float):
+    started = datetime.now(timezone.utc)
+    rows = {
+        f"dept-{index}": {
+            "department": f"dept-{index}",
+            "energy_kwh": random.gauss(120, 18),
+            "medical_waste_kg": random.gauss(25, 5),
+            "paper_kg": random.gauss(15, 4),
+            "timestamp": started,
+        }
+        for index in range(departments)
+    }
+    for tick in range(ticks):
+        now = started + timedelta(seconds=10 * tick)
+        for name in random.sample(list(rows), int(departments * changed)):
+            rows[name] = {
+                "department": name,
+                "energy_kwh": random.gauss(120, 18),
+                "medical_waste_kg": random.gauss(25, 5),
+                "paper_kg": random.gauss(15, 4),
+                "timestamp": now,
+            }
+        yield list(rows.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--departments", type=int, default=60)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--changed", type=float, default=0.3)
+    args = parser.parse_args()
+
+    binary = [encoding for encoding in (MSGPACK, COLUMNAR) if encoding in available_encodings()]
+    if MSGPACK not in binary:
+        print("msgpack is not installed; skipping it.\n")
+    labels = ["json"] + [f"{encoding} key" for encoding in binary] + [
+        f"{encoding} delta" for encoding in binary
+    ]
+    totals = {label: [0, 0, 0.0] for label in labels}  # bytes, zlib bytes, seconds
+
+    def record(label: str, payload: bytes, seconds: float) -> None:
+        totals[label][0] += len(payload)
+        totals[label][1] += len(zlib.compress(payload))
+        totals[label][2] += seconds
+
+    encoder = DeltaEncoder()
+    for rows in snapshots(args.departments, args.ticks, args.changed):
+        started = time.perf_counter()
+        payload = json.dumps({"metrics": rows}, default=str).encode("utf-8")
+        record("json", payload, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        keyframe, delta = encoder.advance(rows)
+        columns_seconds = time.perf_counter() - started
+        for encoding in binary:
+            for kind, frame in (("key", keyframe), ("delta", delta)):
+                started = time.perf_counter()
+                payload = encode_frame(frame, encoding)
+                record(f"{encoding} {kind}", payload, columns_seconds + time.perf_counter() - started)
+
+    json_bytes, json_zlib, json_seconds = totals["json"]
+    print(
+        f"{args.departments} departments, {args.ticks} ticks, "
+        f"{args.changed:.0%} of departments changed per tick\n"
+    )
+    print(
+        f"{'format':>16} {'bytes/tick':>11} {'zlib/tick':>10} {'vs json':>8} "
+        f"{'us/tick':>8} {'cpu vs json':>11}"
+    )
+    for label, (size, compressed, seconds) in totals.items():
+        print(
+            f"{label:>16} {size / args.ticks:>11.0f} {compressed / args.ticks:>10.0f} "
+            f"{size / json_bytes:>8.1%} {seconds / args.ticks * 1e6:>8.1f} "
+            f"{seconds / json_seconds:>11.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Fail if importing the API entry point pulls heavy modules or exceeds a budget.
+
+Run from the backend directory:
+
+    python scripts/check_import_budget.py
+
+The API must bind and answer `/livez` before Pathway, the LLM xPack, torch or
+litellm are loaded; those belong to the background stream/copilot warm-up.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = (
+    "pathway",
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "litellm",
+    "docling",
+    "unstructured",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main  # noqa: F401
+elapsed = time.perf_counter() - started
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(json.loads(sys.argv[1])))
+print(json.dumps({"seconds": elapsed, "heavy": heavy}))
+"""
+
+
+def main() -> int:
+    budget_seconds = float(os.getenv("GREENHEALTH_IMPORT_BUDGET_SECONDS", "3.0"))
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE, json.dumps(HEAVY_MODULES)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(BACKEND_DIR)},
+    )
+    if completed.returncode != 0:
+        print(completed.stderr, file=sys.stderr)
+        print("FAIL: importing main raised an error.", file=sys.stderr)
+        return 1
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(f"import main: {result['seconds']:.3f}s (budget {budget_seconds:.1f}s)")
+
+    failed = False
+    if result["heavy"]:
+        print(f"FAIL: heavy modules on the fast path: {', '.join(result['heavy'])}")
+        failed = True
+    if result["seconds"] > budget_seconds:
+        print("FAIL: import time budget exceeded.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Asyncio load generator for the GreenHealth API.
+
+Run from the backend directory against a running API (ideally wired to
+scripts/stub_llm_rag_servers.py so no Groq quota is spent):
+
+    python scripts/load_test.py --base-url http://127.0.0.1:8000 \
+        --ws-clients 50 --pollers 20 --copilot-users 5 --duration 60
+
+Simulates dashboard websocket clients on /ws/metrics (optionally /ws/alerts),
+REST pollers cycling through the dashboard endpoints, and copilot users asking
+questions with think time between them. Reports per endpoint: requests,
+throughput, error rate and latency percentiles; for sockets, frames, bytes and
+the gap between frames. `--json-report` also writes the numbers to a file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - aiohttp ships with pathway
+    sys.exit("aiohttp is required: pip install aiohttp")
+
+
+DEFAULT_POLL_PATHS = ("/metrics", "/alerts", "/sustainability-score", "/metrics?window=1h")
+DEPARTMENTS = ("ER", "ICU", "Oncology", "Pediatrics", "Radiology", "Admin")
+QUESTIONS = (
+    "How can we reduce medical waste this week?",
+    "Which department should cut energy usage first?",
+    "Summarize current sustainability alerts and next steps.",
+    "How do we lower paper consumption in admissions?",
+    "What does our policy say about sharps disposal?",
+)
+SUBPROTOCOLS = {"columnar": "greenhealth.columnar.v1", "msgpack": "greenhealth.msgpack.v1"}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+    bytes: int = 0
+
+    def record(self, seconds: float, size: int = 0, error: Optional[str] = None) -> None:
+        if error is None:
+            self.latencies.append(seconds)
+            self.bytes += size
+        else:
+            self.errors[error] += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        ok = len(self.latencies)
+        failed = sum(self.errors.values())
+        total = ok + failed
+        return {
+            "requests": total,
+            "per_second": total / elapsed if elapsed else 0.0,
+            "error_rate": failed / total if total else 0.0,
+            "errors": dict(self.errors),
+            "p50_ms": percentile(self.latencies, 0.50) * 1000,
+            "p95_ms": percentile(self.latencies, 0.95) * 1000,
+            "p99_ms": percentile(self.latencies, 0.99) * 1000,
+            "max_ms": max(self.latencies, default=float("nan")) * 1000,
+            "bytes": self.bytes,
+        }
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.endpoints: Dict[str, EndpointStats] = {}
+
+    def __getitem__(self, name: str) -> EndpointStats:
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats()
+        return stats
+
+
+async def poller(session: aiohttp.ClientSession, args, recorder: Recorder, stop: float) -> None:
+    # Spread pollers over the interval instead of firing in lockstep.
+    await asyncio.sleep(random.uniform(0, args.poll_interval))
+    while time.monotonic() < stop:
+        for path in args.poll_paths:
+            started = time.perf_counter()
+            try:
+                async with session.get(args.base_url + path) as response:
+                    body = await response.read()
+                    error = None if response.status < 400 else f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                body, error = b"", type(exc).__name__
+            recorder[f"GET {path}"].record(time.perf_counter() - started, len(body), error)
+        await asyncio.sleep(args.poll_interval)
+
+
+async def copilot_user(session: aiohttp.ClientSession, args, recorder: Recorder, stop: float) -> None:
+    await asyncio.sleep(random.uniform(0, args.think_seconds))
+    while time.monotonic() < stop:
+        payload = {"question": random.choice(QUESTIONS)}
+        if random.random() < 0.7:
+            payload["department"] = random.choice(DEPARTMENTS)
+        started = time.perf_counter()
+        try:
+            async with session.post(args.base_url + "/copilot-query", json=payload) as response:
+                body = await response.read()
+                error = None if response.status < 400 else f"HTTP {response.status}"
+                if error is None and b"temporarily unavailable" in body:
+                    # The copilot degrades to a 200 with an apology; count it.
+                    error = "unavailable answer"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            body, error = b"", type(exc).__name__
+        recorder["POST /copilot-query"].record(time.perf_counter() - started, len(body), error)
+        await asyncio.sleep(random.expovariate(1.0 / args.think_seconds) if args.think_seconds else 0)
+
+
+async def socket_client(
+    session: aiohttp.ClientSession, args, recorder: Recorder, stop: float, path: str
+) -> None:
+    url = args.base_url.replace("http", "ws", 1) + path
+    protocols = (SUBPROTOCOLS[args.ws_encoding],) if args.ws_encoding in SUBPROTOCOLS else ()
+    connect = recorder[f"WS {path} connect"]
+    frames = recorder[f"WS {path} frame gap"]
+    await asyncio.sleep(random.uniform(0, 1.0))
+    while time.monotonic() < stop:
+        started = time.perf_counter()
+        connected = False
+        try:
+            async with session.ws_connect(url, protocols=protocols, heartbeat=None) as ws:
+                connected = True
+                connect.record(time.perf_counter() - started)
+                last = time.perf_counter()
+                while time.monotonic() < stop:
+                    remaining = max(0.1, stop - time.monotonic())
+                    message = await ws.receive(timeout=remaining)
+                    if message.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                        now = time.perf_counter()
+                        size = len(message.data) if message.data is not None else 0
+                        frames.record(now - last, size)
+                        last = now
+                    elif message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED):
+                        frames.record(0.0, error=f"closed {ws.close_code}")
+                        break
+                    elif message.type == aiohttp.WSMsgType.ERROR:
+                        frames.record(0.0, error="socket error")
+                        break
+        except asyncio.TimeoutError:
+            if time.monotonic() >= stop:
+                # Receive timed out because the run ended.
+                break
+            # A handshake (or a receive) that timed out mid-run is a failure; retry.
+            if connected:
+                frames.record(0.0, error="TimeoutError")
+            else:
+                connect.record(time.perf_counter() - started, error="TimeoutError")
+            await asyncio.sleep(1.0)
+        except aiohttp.ClientError as exc:
+            connect.record(time.perf_counter() - started, error=type(exc).__name__)
+            await asyncio.sleep(1.0)
+
+
+def print_report(summary: Dict[str, Dict], elapsed: float) -> None:
+    print(f"\nRan for {elapsed:.1f}s\n")
+    header = (
+        f"{'endpoint':<34} {'count':>7} {'/s':>7} {'err%':>6} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'KiB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, stats in sorted(summary.items()):
+        print(
+            f"{name:<34} {stats['requests']:>7} {stats['per_second']:>7.1f} "
+            f"{stats['error_rate'] * 100:>6.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+            f"{stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f} {stats['bytes'] / 1024:>9.1f}"
+        )
+        if stats["errors"]:
+            print(f"{'':<34} errors: {stats['errors']}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict]:
+    recorder = Recorder()
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+    started = time.monotonic()
+    stop = started + args.duration
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        tasks = [poller(session, args, recorder, stop) for _ in range(args.pollers)]
+        tasks += [copilot_user(session, args, recorder, stop) for _ in range(args.copilot_users)]
+        tasks += [
+            socket_client(session, args, recorder, stop, "/ws/metrics")
+            for _ in range(args.ws_clients)
+        ]
+        tasks += [
+            socket_client(session, args, recorder, stop, "/ws/alerts")
+            for _ in range(args.alert_clients)
+        ]
+        await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    summary = {name: stats.summary(elapsed) for name, stats in recorder.endpoints.items()}
+    print_report(summary, elapsed)
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--ws-clients", type=int, default=20, help="/ws/metrics dashboards")
+    parser.add_argument("--alert-clients", type=int, default=0, help="/ws/alerts subscribers")
+    parser.add_argument("--ws-encoding", choices=("json", "columnar", "msgpack"), default="json")
+    parser.add_argument("--pollers", type=int, default=10, help="REST pollers")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="seconds between poll rounds")
+    parser.add_argument("--poll-paths", nargs="+", default=list(DEFAULT_POLL_PATHS))
+    parser.add_argument("--copilot-users", type=int, default=2)
+    parser.add_argument("--think-seconds", type=float, default=5.0, help="mean pause between questions")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--json-report", help="also write the summary to this file")
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip("/")
+
+    summary = asyncio.run(run(args))
+    if args.json_report:
+        with open(args.json_report, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
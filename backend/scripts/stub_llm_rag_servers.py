@@ -0,0 +1,270 @@
+"""
+Offline stand-ins for the Groq chat API and the Pathway RAG server.
+
+Run from the backend directory:
+
+    python scripts/stub_llm_rag_servers.py [--llm-port 9101] [--rag-port 9102]
+        [--latency-ms 400] [--tokens-per-second 250] [--error-rate 0.02]
+
+then start the API against them (see docs/RUNBOOK.md, "Offline load testing"):
+
+    GROQ_BASE_URL=http://127.0.0.1:9101/v1 GROQ_API_KEY=stub \
+    GREENHEALTH_ENABLE_RAG=false GREENHEALTH_RAG_URL=http://127.0.0.1:9102 \
+    uvicorn main:app
+
+The chat server speaks the OpenAI `/v1/chat/completions` protocol (including
+`stream: true`) and accepts any model name and key. The RAG server answers
+`/v1/retrieve`, `/v2/answer` and `/v1/statistics` like Pathway's
+`BaseRAGQuestionAnswerer`, from chunks of the documents in `--docs-dir`.
+Latency is time to first token plus answer tokens at `--tokens-per-second`;
+`--error-rate` of requests fail with HTTP 503 (or 429, see `--rate-limit-share`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from aiohttp import web
+except ImportError:  # pragma: no cover - aiohttp ships with pathway
+    sys.exit("aiohttp is required: pip install aiohttp")
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+_WORD_RE = re.compile(r"\w+")
+_FILLER = (
+    "Reduce standby energy in imaging suites, segregate sharps and pharmaceutical "
+    "waste at source, switch admissions paperwork to electronic forms and review "
+    "HVAC set-points outside clinical hours."
+).split()
+
+
+@dataclass(frozen=True)
+class Behaviour:
+    latency_ms: float
+    jitter_ms: float
+    tokens_per_second: float
+    answer_tokens: int
+    error_rate: float
+    rate_limit_share: float
+
+    def first_token_delay(self) -> float:
+        return max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+
+    def should_fail(self) -> Optional[web.Response]:
+        if random.random() >= self.error_rate:
+            return None
+        if random.random() < self.rate_limit_share:
+            return web.json_response(
+                {"error": {"message": "Rate limit reached (stub).", "type": "rate_limit"}},
+                status=429,
+                headers={"Retry-After": "1"},
+            )
+        return web.json_response(
+            {"error": {"message": "Upstream unavailable (stub).", "type": "server_error"}},
+            status=503,
+        )
+
+
+def _answer_words(count: int) -> List[str]:
+    return [_FILLER[index % len(_FILLER)] for index in range(count)]
+
+
+def _prompt_tokens(messages: List[Dict]) -> int:
+    # Rough, like the copilot's fallback estimate: four characters per token.
+    text = " ".join(str(message.get("content", "")) for message in messages)
+    return max(1, len(text) // 4)
+
+
+def build_llm_app(behaviour: Behaviour) -> web.Application:
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        await asyncio.sleep(behaviour.first_token_delay())
+        failure = behaviour.should_fail()
+        if failure is not None:
+            return failure
+
+        model = body.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        words = _answer_words(int(body.get("max_tokens") or behaviour.answer_tokens))
+        per_token = 1.0 / behaviour.tokens_per_second if behaviour.tokens_per_second > 0 else 0.0
+
+        if body.get("stream"):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for word in words:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(per_token)
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+
+        await asyncio.sleep(per_token * len(words))
+        prompt_tokens = _prompt_tokens(body.get("messages") or [])
+        return web.json_response(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(words) + "."},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_tokens + len(words),
+                },
+            }
+        )
+
+    async def models(_: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "stub", "object": "model"}]})
+
+    app = web.Application()
+    for prefix in ("", "/v1", "/openai/v1"):
+        app.router.add_post(f"{prefix}/chat/completions", chat_completions)
+        app.router.add_get(f"{prefix}/models", models)
+    return app
+
+
+def load_chunks(docs_dir: Path, chunk_words: int = 120) -> List[Dict]:
+    chunks: List[Dict] = []
+    for path in sorted(docs_dir.glob("*.txt")):
+        words = path.read_text(encoding="utf-8", errors="ignore").split()
+        for start in range(0, len(words), chunk_words):
+            chunks.append(
+                {"text": " ".join(words[start : start + chunk_words]), "metadata": {"path": str(path)}}
+            )
+    if not chunks:
+        chunks.append({"text": " ".join(_FILLER), "metadata": {"path": "stub://guidelines.txt"}})
+    return chunks
+
+
+def _rank(chunks: List[Dict], query: str, k: int) -> List[Dict]:
+    terms = set(_WORD_RE.findall(query.lower()))
+    scored = []
+    for chunk in chunks:
+        overlap = len(terms & set(_WORD_RE.findall(chunk["text"].lower())))
+        scored.append((-overlap, random.random(), chunk))
+    scored.sort(key=lambda item: item[:2])
+    return [
+        {**chunk, "dist": 1.0 / (1.0 - negative_overlap)}
+        for negative_overlap, _, chunk in scored[: max(1, k)]
+    ]
+
+
+def build_rag_app(behaviour: Behaviour, chunks: List[Dict], search_topk: int) -> web.Application:
+    async def retrieve(request: web.Request) -> web.Response:
+        body = await request.json()
+        await asyncio.sleep(behaviour.first_token_delay())
+        failure = behaviour.should_fail()
+        if failure is not None:
+            return failure
+        return web.json_response(_rank(chunks, str(body.get("query", "")), int(body.get("k", 3))))
+
+    async def answer(request: web.Request) -> web.Response:
+        body = await request.json()
+        await asyncio.sleep(behaviour.first_token_delay())
+        failure = behaviour.should_fail()
+        if failure is not None:
+            return failure
+        if behaviour.tokens_per_second > 0:
+            await asyncio.sleep(behaviour.answer_tokens / behaviour.tokens_per_second)
+        payload: Dict = {"response": " ".join(_answer_words(behaviour.answer_tokens)) + "."}
+        if body.get("return_context_docs"):
+            payload["context_docs"] = _rank(chunks, str(body.get("prompt", "")), search_topk)
+        return web.json_response(payload)
+
+    async def statistics(_: web.Request) -> web.Response:
+        return web.json_response(
+            {"file_count": len({chunk["metadata"]["path"] for chunk in chunks}), "last_modified": None}
+        )
+
+    app = web.Application()
+    app.router.add_post("/v1/retrieve", retrieve)
+    app.router.add_post("/v2/answer", answer)
+    app.router.add_post("/v1/statistics", statistics)
+    return app
+
+
+async def serve(args: argparse.Namespace) -> None:
+    llm = Behaviour(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        error_rate=args.error_rate,
+        rate_limit_share=args.rate_limit_share,
+    )
+    rag = Behaviour(
+        latency_ms=args.rag_latency_ms,
+        jitter_ms=args.rag_latency_ms / 4,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        error_rate=args.rag_error_rate,
+        rate_limit_share=0.0,
+    )
+    runners = []
+    for app, port in (
+        (build_llm_app(llm), args.llm_port),
+        (build_rag_app(rag, load_chunks(Path(args.docs_dir)), args.search_topk), args.rag_port),
+    ):
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, args.host, port).start()
+        runners.append(runner)
+    print(f"Stub chat API: http://{args.host}:{args.llm_port}/v1  (GROQ_BASE_URL)")
+    print(f"Stub RAG API:  http://{args.host}:{args.rag_port}     (GREENHEALTH_RAG_URL)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=9101)
+    parser.add_argument("--rag-port", type=int, default=9102)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="LLM time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-share", type=float, default=0.5, help="share of errors sent as 429")
+    parser.add_argument("--rag-latency-ms", type=float, default=60.0)
+    parser.add_argument("--rag-error-rate", type=float, default=0.0)
+    parser.add_argument("--search-topk", type=int, default=4)
+    parser.add_argument("--docs-dir", default=str(BACKEND_DIR / "data" / "documents"))
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+from transforms.alert_log import AlertLog
+from transforms.state import AlertsState
+
+
+def _alert(alert_id, department="ICU", created_at=None):
+    created_at = created_at or datetime.now(timezone.utc) - timedelta(minutes=5)
+    return {
+        "id": alert_id,
+        "department": department,
+        "type": "energy_anomaly",
+        "severity": "high",
+        "message": f"{department} energy",
+        "created_at": created_at.isoformat(),
+    }
+
+
+def _closed(log, **kwargs):
+    now = datetime.now(timezone.utc).timestamp()
+    return [entry for chunk in log.iter_closed(now - 3600, now + 60, **kwargs) for entry in chunk]
+
+
+def test_only_alerts_that_leave_the_active_set_are_logged(tmp_path):
+    log = AlertLog(tmp_path, retention_days=400)
+    alerts = AlertsState()
+    alerts.add_listener(log.record)
+    icu, er = _alert("a"), _alert("b", department="ER")
+
+    alerts.replace_alerts([icu, er])
+    alerts.replace_alerts([icu, er])
+    alerts.replace_alerts([er])
+    alerts.replace_alerts([er])
+
+    (entry,) = _closed(log)
+    assert entry["id"] == "a"
+    assert entry["opened_at"] == icu["created_at"]
+    assert len(list(tmp_path.glob("*.jsonl"))) == 1
+
+
+def test_range_and_department_filters(tmp_path):
+    log = AlertLog(tmp_path, retention_days=400)
+    old = datetime.now(timezone.utc) - timedelta(days=2)
+    log.record([], [_alert("old", created_at=old), _alert("er", department="ER")])
+
+    assert [entry["id"] for entry in _closed(log)] == ["old", "er"]
+    assert [entry["id"] for entry in _closed(log, departments=["ER"])] == ["er"]
+    # An alert is included if it was open at any time in the range.
+    assert [entry["id"] for entry in _closed(AlertLog(tmp_path, 400), chunk_size=1)] == [
+        "old",
+        "er",
+    ]
+    assert list(log.iter_closed(0, old.timestamp() - 1)) == []
+
+
+def test_memory_log_without_a_directory():
+    log = AlertLog(None, retention_days=400)
+    log.record([], [_alert("a")])
+    assert [entry["id"] for entry in _closed(log)] == ["a"]
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from transforms.anomaly import DetectorConfig, StreamingAnomalyDetector
+
+
+def _feed(detector, department, readings):
+    for reading in readings:
+        detector.update(department, reading)
+
+
+def _baseline(rng, count, level=(100.0, 20.0, 10.0), noise=0.03):
+    return [tuple(value * (1.0 + rng.gauss(0.0, noise)) for value in level) for _ in range(count)]
+
+
+def test_stable_series_raises_nothing():
+    detector = StreamingAnomalyDetector(DetectorConfig())
+    _feed(detector, "ICU", _baseline(random.Random(1), 500))
+    assert detector.active_anomalies() == []
+
+
+def test_step_change_alarms_on_the_shifted_metric_only():
+    rng = random.Random(2)
+    detector = StreamingAnomalyDetector(DetectorConfig())
+    _feed(detector, "ICU", _baseline(rng, 200))
+    _feed(detector, "Radiology", _baseline(rng, 200))
+
+    detector.update("ICU", (200.0, 20.0, 10.0))
+
+    anomalies = detector.active_anomalies()
+    assert [(item.department, item.metric) for item in anomalies] == [("ICU", "energy_kwh")]
+    anomaly = anomalies[0]
+    assert anomaly.severity == "high"
+    assert anomaly.value == 200.0
+    assert anomaly.baseline == pytest.approx(100.0, rel=0.1)
+    assert anomaly.z_score >= DetectorConfig().z_high
+
+
+def test_sustained_small_shift_is_caught_by_cusum():
+    config = DetectorConfig()
+    detector = StreamingAnomalyDetector(config)
+    # Energy alternates around 100 (std 3); the other metrics are flat.
+    _feed(detector, "ICU", [(97.0 if index % 2 else 103.0, 20.0, 10.0) for index in range(300)])
+
+    # A shift under 3 sigma: no single reading crosses the z threshold.
+    flagged_at = None
+    for step in range(12):
+        detector.update("ICU", (108.0, 20.0, 10.0))
+        anomalies = detector.active_anomalies()
+        if anomalies:
+            flagged_at = step
+            break
+    assert flagged_at is not None and flagged_at >= 3
+    assert [(item.metric, item.severity) for item in anomalies] == [("energy_kwh", "low")]
+    assert anomalies[0].z_score < config.z_threshold
+
+
+def test_nothing_is_flagged_during_warmup():
+    detector = StreamingAnomalyDetector(DetectorConfig(warmup=30))
+    _feed(detector, "ICU", _baseline(random.Random(4), 10))
+    detector.update("ICU", (1000.0, 20.0, 10.0))
+    assert detector.active_anomalies() == []
+
+
+def test_departments_beyond_initial_capacity_keep_their_state():
+    rng = random.Random(5)
+    detector = StreamingAnomalyDetector(DetectorConfig(), capacity=2)
+    for index in range(10):
+        _feed(detector, f"D{index}", _baseline(rng, 50))
+    detector.update("D0", (300.0, 20.0, 10.0))
+    assert [item.department for item in detector.active_anomalies()] == ["D0"]
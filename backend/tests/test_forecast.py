@@ -0,0 +1,84 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from transforms.forecast import ForecasterConfig, HoltWintersForecaster
+
+HOUR = 3600
+SEASON = 24
+
+
+def _seasonal(step):
+    energy = 100.0 + 30.0 * math.sin(2 * math.pi * step / SEASON) + 0.2 * step
+    return (energy, 20.0 + 5.0 * math.cos(2 * math.pi * step / SEASON), 10.0)
+
+
+def _hourly(**overrides):
+    config = ForecasterConfig(step=timedelta(hours=1), **overrides)
+    return HoltWintersForecaster(config, budgets=(1e9, 1e9, 1e9))
+
+
+def _feed(forecaster, steps, series=_seasonal, department="ICU"):
+    for step in steps:
+        end = (step + 1) * HOUR
+        forecaster.observe(department, end, series(step + 1), watermark=end)
+
+
+def test_recovers_seasonal_series_with_trend():
+    # A slow level and a fast season, so two weeks of hourly data suffice.
+    forecaster = _hourly(alpha=0.1, beta=0.05, gamma=0.5)
+    _feed(forecaster, range(24 * 14))
+
+    points = forecaster.forecast("ICU", timedelta(hours=24))
+    assert len(points) == 24
+    last = 24 * 14
+    predicted = np.array([[point["energy_kwh"], point["medical_waste_kg"]] for point in points])
+    expected = np.array([_seasonal(last + offset)[:2] for offset in range(1, 25)])
+    assert np.abs(predicted - expected).max() < 0.5
+    assert forecaster._trend[0, 0] == pytest.approx(0.2, abs=0.01)
+
+
+def test_windows_are_learned_only_once_complete():
+    forecaster = _hourly()
+    # Overlapping windows of one event, ending now and in the next two hours.
+    for offset in range(3):
+        forecaster.observe("ICU", (10 + offset) * HOUR, (50.0, 5.0, 1.0), watermark=10 * HOUR)
+    assert forecaster.forecast("ICU", timedelta(hours=1))[0]["timestamp"].startswith(
+        "1970-01-01T11:00"
+    )
+    # A later update of an open window replaces its pending value.
+    forecaster.observe("ICU", 11 * HOUR, (80.0, 5.0, 1.0), watermark=11 * HOUR)
+    level = 0.7 * 50.0 + 0.3 * 80.0
+    trend = 0.05 * (level - 50.0)
+    assert forecaster.forecast("ICU", timedelta(hours=1))[0]["energy_kwh"] == pytest.approx(
+        level + trend
+    )
+    # Rows for already learned windows are ignored.
+    forecaster.observe("ICU", 10 * HOUR, (1000.0, 5.0, 1.0), watermark=11 * HOUR)
+    assert forecaster.forecast("ICU", timedelta(hours=1))[0]["energy_kwh"] < 100.0
+
+
+def test_predicts_breach_of_a_rising_metric():
+    forecaster = HoltWintersForecaster(
+        ForecasterConfig(
+            step=timedelta(hours=1),
+            season=timedelta(hours=1),
+            warmup=5,
+            breach_horizon=timedelta(hours=6),
+        ),
+        budgets=(200.0, 1e9, 1e9),
+    )
+
+    def rising(step):
+        return (100.0 + 2.0 * step, 1.0, 1.0)
+
+    _feed(forecaster, range(40), series=rising)
+    assert forecaster.predicted_breaches() == []
+
+    _feed(forecaster, range(40, 50), series=rising)
+    breaches = forecaster.predicted_breaches()
+    assert [(item.department, item.metric) for item in breaches] == [("ICU", "energy_kwh")]
+    assert breaches[0].predicted_value > 200.0
+    assert 0 < breaches[0].eta.timestamp() - 50 * HOUR <= 6 * HOUR
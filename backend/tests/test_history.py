@@ -0,0 +1,114 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from transforms.anomaly import METRICS
+from transforms.history import WEEK_ORIGIN_SECONDS, HistoryStore, _default_levels
+
+DAY = 86400
+START = 1_750_000_000 - 1_750_000_000 % DAY
+DEPARTMENTS = ["ICU", "Radiology", "Surgery", "Pharmacy"]
+
+
+@pytest.fixture(scope="module")
+def events():
+    rng = random.Random(42)
+    rows = []
+    for _ in range(30_000):
+        timestamp = START + rng.randrange(21 * DAY)
+        department = rng.choice(DEPARTMENTS)
+        values = tuple(round(rng.uniform(0.0, 250.0), 3) for _ in METRICS)
+        rows.append((department, timestamp, values))
+    rows.sort(key=lambda row: row[1])
+    return rows
+
+
+@pytest.fixture(scope="module")
+def store(events):
+    store = HistoryStore(_default_levels())
+    for department, timestamp, values in events:
+        store.record(department, timestamp, values)
+    return store
+
+
+def _naive(events, metric, bucket_seconds, start, end, agg, by_department, departments=None):
+    index = METRICS.index(metric)
+    origin = WEEK_ORIGIN_SECONDS if bucket_seconds % (7 * DAY) == 0 else 0
+    groups = defaultdict(list)
+    for department, timestamp, values in events:
+        if not start <= timestamp < end or (departments and department not in departments):
+            continue
+        bucket = (timestamp - origin) // bucket_seconds * bucket_seconds + origin
+        groups[(bucket, department if by_department else "*")].append(values[index])
+    results = {}
+    for key, values in groups.items():
+        results[key] = {
+            "avg": sum(values) / len(values),
+            "sum": sum(values),
+            "max": max(values),
+            "count": len(values),
+        }[agg], len(values)
+    return results
+
+
+def _as_dict(rows):
+    return {
+        (row["bucket_start"], row.get("department", "*")): (row["value"], row["samples"])
+        for row in rows
+    }
+
+
+@pytest.mark.parametrize("agg", ["avg", "sum", "max", "count"])
+@pytest.mark.parametrize("bucket_seconds", [3600, 6 * 3600, DAY, 7 * DAY])
+def test_rollups_match_naive_aggregation(events, store, agg, bucket_seconds):
+    start, end = START + 3 * DAY + 1800, START + 19 * DAY
+    # The range selects rollup rows by their start, so a partial first row of
+    # the level read (1h below a day, else 1d) is left out.
+    level_seconds = 3600 if bucket_seconds < DAY else DAY
+    aligned = -(-start // level_seconds) * level_seconds
+    for by_department in (True, False):
+        got = _as_dict(
+            store.aggregate("energy_kwh", bucket_seconds, start, end, agg, by_department)
+        )
+        expected = _naive(events, "energy_kwh", bucket_seconds, aligned, end, agg, by_department)
+        assert got.keys() == expected.keys()
+        for key, (value, samples) in expected.items():
+            assert got[key][1] == samples
+            # Maxima are stored as float32.
+            assert got[key][0] == pytest.approx(value, rel=1e-6)
+
+
+def test_fine_buckets_and_department_filter(events, store):
+    start, end = START + 20 * DAY, START + 21 * DAY
+    got = _as_dict(
+        store.aggregate("paper_kg", 900, start, end, "avg", departments=["ICU", "Pharmacy"])
+    )
+    expected = _naive(events, "paper_kg", 900, start, end, "avg", True, {"ICU", "Pharmacy"})
+    assert got.keys() == expected.keys()
+    for key, (value, samples) in expected.items():
+        assert got[key] == (pytest.approx(value), samples)
+
+
+def test_invalid_queries_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.aggregate("steam_kg", 3600, START, START + DAY)
+    with pytest.raises(ValueError):
+        store.aggregate("energy_kwh", 3600, START, START + DAY, agg="median")
+    with pytest.raises(ValueError):
+        store.aggregate("energy_kwh", 90, START, START + DAY)
+
+
+def test_segments_persist_across_restarts(events, tmp_path):
+    store = HistoryStore(_default_levels(), tmp_path)
+    for department, timestamp, values in events[:5_000]:
+        store.record(department, timestamp, values)
+    store.flush()
+
+    reloaded = HistoryStore(_default_levels(), tmp_path)
+    assert sorted(reloaded.departments()) == sorted(store.departments())
+    end = events[4_999][1] + 1
+    for bucket_seconds in (3600, DAY):
+        assert reloaded.aggregate("medical_waste_kg", bucket_seconds, START, end, "sum") == (
+            store.aggregate("medical_waste_kg", bucket_seconds, START, end, "sum")
+        )
@@ -0,0 +1,167 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from transforms import pipeline
+from transforms.alert_log import AlertLog
+from transforms.forecast import ForecasterConfig, HoltWintersForecaster
+from transforms.freshness import FreshnessTracker
+from transforms.history import HistoryStore, _default_levels
+from transforms.state import AlertsState, MetricsState, WindowedMetricsState
+from transforms.windows import parse_window_specs
+
+HOP = 300
+BASE = 1_800_000_000 - 1_800_000_000 % HOP
+SPEC = parse_window_specs("15m/5m")[0]
+
+
+def _at(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _raw(epoch, energy=150.0):
+    return {
+        "department": "ICU",
+        "timestamp": _at(epoch),
+        "energy_kwh": energy,
+        "medical_waste_kg": 5.0,
+        "paper_kg": 2.0,
+    }
+
+
+def _window(start, energy=250.0):
+    return {
+        "department": "ICU",
+        "energy_kwh_avg": energy,
+        "energy_kwh_sum": energy,
+        "medical_waste_kg_avg": 5.0,
+        "medical_waste_kg_sum": 5.0,
+        "paper_kg_avg": 2.0,
+        "paper_kg_sum": 2.0,
+        "energy_kwh_p50": energy,
+        "energy_kwh_p95": energy,
+        "energy_kwh_max": energy,
+        "window_start": _at(start),
+        "window_end": _at(start + SPEC.duration.total_seconds()),
+    }
+
+
+@pytest.fixture
+def sinks(monkeypatch):
+    """The real sink callbacks of `_wire_python_sinks`, on fresh state."""
+    subscriptions = {}
+
+    def subscribe(table, on_change, on_end, on_time_end=lambda time: None):
+        subscriptions[table] = (on_change, on_time_end)
+
+    alerts = AlertsState()
+    log = AlertLog(None, retention_days=400)
+    alerts.add_listener(log.record)
+    monkeypatch.setattr(pipeline.pw.io, "subscribe", subscribe)
+    monkeypatch.setattr(pipeline, "alerts_state", alerts)
+    monkeypatch.setattr(pipeline, "metrics_state", MetricsState())
+    monkeypatch.setattr(pipeline, "windowed_metrics_state", WindowedMetricsState())
+    monkeypatch.setattr(pipeline, "freshness_tracker", FreshnessTracker())
+    monkeypatch.setattr(pipeline, "history_store", HistoryStore(_default_levels()))
+    monkeypatch.setattr(
+        pipeline, "forecaster", HoltWintersForecaster(ForecasterConfig.from_env())
+    )
+    monkeypatch.setattr(pipeline, "_detector", None)
+    monkeypatch.setattr(pipeline, "_static_rules_enabled", True)
+    monkeypatch.setattr(pipeline, "_static_alerts_open", {})
+    monkeypatch.setattr(pipeline, "_forecast_alerts", {})
+    pipeline._wire_python_sinks(
+        windows={SPEC.name: "windowed"},
+        specs={SPEC.name: SPEC},
+        raw_metrics="raw",
+        primary_window=SPEC.name,
+    )
+    return subscriptions["raw"], subscriptions["windowed"], alerts, log
+
+
+def test_window_update_keeps_the_alert_open(sinks):
+    (raw_change, raw_end), (window_change, window_end), alerts, log = sinks
+    transitions = []
+    alerts.add_listener(lambda opened, closed: transitions.append((len(opened), len(closed))))
+    ids = set()
+
+    def batch(time, raw_rows, window_changes):
+        for epoch in raw_rows:
+            raw_change(key=f"raw-{epoch}", row=_raw(epoch), time=time, is_addition=True)
+        for key, row, is_addition in window_changes:
+            window_change(key=key, row=row, time=time, is_addition=is_addition)
+        raw_end(time)
+        window_end(time)
+        ids.update(alert["id"] for alert in alerts.get_active_alerts())
+
+    # Single readings stay under the 200 kWh threshold; the window averages
+    # (and so the alert) are above it.
+    starts = [BASE - 2 * HOP, BASE - HOP, BASE]
+    batch(1, [BASE + 10], [(f"w{start}", _window(start), True) for start in starts])
+    # Every later batch updates the open windows and the one served (a late
+    # event) in place, as a retraction and an addition of the same key, and the
+    # watermark closes the next window.
+    current = {start: _window(start) for start in starts}
+    for time in range(2, 8):
+        watermark = BASE + HOP * (time - 1) + 10
+        changes = []
+        for start in list(current):
+            if start + SPEC.duration.total_seconds() > watermark - 2 * HOP:
+                updated = _window(start, energy=240.0 + time)
+                changes += [(f"w{start}", current[start], False), (f"w{start}", updated, True)]
+                current[start] = updated
+        new_start = watermark - watermark % HOP
+        current[new_start] = _window(new_start)
+        changes.append((f"w{new_start}", current[new_start], True))
+        batch(time, [watermark], changes)
+
+    served = pipeline.windowed_metrics_state.get_latest_snapshot(SPEC.name)
+    assert served and served[0]["window_end"] <= _at(BASE + HOP * 6 + 10)
+    assert len(ids) == 1
+    assert transitions == [(1, 0)]
+    assert list(log.iter_closed(0, BASE + 10 * HOP)) == []
+
+
+def test_out_of_order_events_reach_history(sinks):
+    (raw_change, raw_end), _, _, _ = sinks
+    raw_change(key="newer", row=_raw(BASE + 60), time=1, is_addition=True)
+    # Older than the department's latest row, but well within the lateness.
+    raw_change(key="older", row=_raw(BASE + 30, energy=90.0), time=1, is_addition=True)
+    raw_end(1)
+
+    published = pipeline.metrics_state.get_latest_snapshot()
+    assert [row["timestamp"] for row in published] == [_at(BASE + 60)]
+    level = pipeline.history_store.level_for_export(None, BASE, BASE + 60)
+    rows = next(pipeline.history_store.iter_segments(level.name, BASE, BASE + HOP, None))
+    assert rows.count.sum() == 2
+
+
+def test_alert_log_records_one_closure_per_alert(sinks):
+    (raw_change, raw_end), (window_change, window_end), alerts, log = sinks
+    start = BASE - 2 * HOP
+    served = _window(start)
+    window_change(key="w", row=served, time=1, is_addition=True)
+    raw_change(key="r1", row=_raw(BASE + 310), time=1, is_addition=True)
+    raw_end(1)
+    window_end(1)
+    (alert,) = alerts.get_active_alerts()
+
+    # Late events keep updating the served window in place; the alert stays open.
+    for time in range(2, 6):
+        updated = _window(start, energy=250.0 + time)
+        window_change(key="w", row=served, time=time, is_addition=False)
+        window_change(key="w", row=updated, time=time, is_addition=True)
+        served = updated
+        window_end(time)
+        raw_end(time)
+    assert list(log.iter_closed(0, BASE + 10 * HOP)) == []
+
+    # Then the average drops under the threshold and the alert really closes.
+    window_change(key="w", row=served, time=6, is_addition=False)
+    window_change(key="w", row=_window(start, energy=120.0), time=6, is_addition=True)
+    window_end(6)
+
+    (entries,) = list(log.iter_closed(0, BASE + 10 * HOP))
+    assert [(entry["id"], entry["opened_at"]) for entry in entries] == [
+        (alert["id"], alert["created_at"])
+    ]
@@ -0,0 +1,61 @@
+import math
+import random
+
+import pytest
+
+from transforms.sketches import DDSketch
+
+
+def _sketch(values, relative_accuracy=0.01):
+    sketch = DDSketch(relative_accuracy)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[math.floor(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.05])
+def test_quantiles_within_relative_accuracy(relative_accuracy):
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3.0, 1.5) for _ in range(20_000)]
+    sketch = _sketch(values, relative_accuracy)
+
+    for q in (0.0, 0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 1.0):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= relative_accuracy * exact + 1e-12
+
+
+def test_zeros_and_empty_sketch():
+    assert DDSketch().quantile(0.5) is None
+    sketch = _sketch([0.0] * 60 + [10.0] * 40)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(0.99) == pytest.approx(10.0, rel=0.01)
+
+
+def test_subtract_matches_sketch_of_remaining_values():
+    rng = random.Random(11)
+    kept = [rng.uniform(1.0, 500.0) for _ in range(5_000)]
+    retracted = [rng.uniform(1.0, 500.0) for _ in range(2_000)]
+    sketch = _sketch(kept + retracted)
+    sketch.subtract(_sketch(retracted))
+
+    expected = _sketch(kept)
+    assert sketch.count == expected.count
+    assert sketch.bins == expected.bins
+    for q in (0.1, 0.5, 0.95):
+        assert sketch.quantile(q) == pytest.approx(_exact(kept, q), rel=0.01)
+
+
+def test_subtracting_the_max_keeps_an_upper_bound():
+    sketch = _sketch([1.0, 2.0, 100.0])
+    sketch.subtract(_sketch([100.0]))
+    assert sketch.count == 2
+    assert 2.0 <= sketch.max <= 2.0 * (1.0 + 0.01) / (1.0 - 0.01)
+    assert sketch.quantile(1.0) == pytest.approx(2.0, rel=0.01)
+
+    sketch.subtract(_sketch([1.0, 2.0]))
+    assert sketch.count == 0 and sketch.max is None
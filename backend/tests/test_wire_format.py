@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.services.wire_format import (
+    COLUMNAR,
+    JSON,
+    MSGPACK,
+    METRIC_COLUMNS,
+    DeltaEncoder,
+    decode_columnar,
+    encode_columnar,
+    negotiate_accept,
+    negotiate_subprotocol,
+    table_frame,
+)
+
+
+def _row(department, timestamp, energy, waste=2.5, paper=None):
+    return {
+        "department": department,
+        "timestamp": timestamp,
+        "energy_kwh": energy,
+        "medical_waste_kg": waste,
+        "paper_kg": paper,
+    }
+
+
+def _decoded_rows(frame, names):
+    """department name -> row tuple, as a client would rebuild it."""
+    rows = {}
+    for index in range(frame.rows):
+        department_id = int(frame.columns["department"][index])
+        rows[department_id] = tuple(
+            frame.columns[name][index].item() for name in METRIC_COLUMNS if name != "department"
+        )
+    return {names[department_id]: values for department_id, values in rows.items()}
+
+
+def _same(left, right):
+    assert left.keys() == right.keys()
+    for key in left:
+        for a, b in zip(left[key], right[key]):
+            assert (math.isnan(a) and math.isnan(b)) or a == b
+
+
+def test_keyframe_round_trip():
+    rows = [
+        _row("ICU", "2026-03-01T10:00:00Z", 120.25),
+        _row("Radiologie ünd Nuklear", 1772359200, 88.5, paper=3.0),
+    ]
+    frame = table_frame(rows, METRIC_COLUMNS)
+    decoded = decode_columnar(encode_columnar(frame))
+
+    assert decoded.seq == frame.seq and decoded.base is None
+    assert decoded.names == frame.names
+    assert decoded.removed.size == 0
+    for name in METRIC_COLUMNS:
+        np.testing.assert_array_equal(decoded.columns[name], frame.columns[name])
+    values = _decoded_rows(decoded, decoded.names)
+    assert values["ICU"][:3] == (1772359200, 120.25, 2.5)
+    assert math.isnan(values["ICU"][3])
+    assert values["Radiologie ünd Nuklear"][3] == 3.0
+
+
+def test_deltas_rebuild_every_keyframe():
+    encoder = DeltaEncoder()
+    ticks = [
+        [_row("ICU", 100, 1.0), _row("ER", 100, 2.0)],
+        [_row("ICU", 100, 1.0), _row("ER", 160, 2.5)],
+        [_row("ICU", 100, 1.0), _row("ER", 160, 2.5), _row("OR", 160, 9.0)],
+        [_row("OR", 220, 9.0), _row("ICU", 220, 1.0000001)],
+        [_row("OR", 220, 9.0), _row("ICU", 220, 1.0000001)],
+    ]
+    names = {}
+    state = {}
+    for tick in ticks:
+        keyframe, delta = encoder.advance(tick)
+        delta = decode_columnar(encode_columnar(delta))
+        keyframe = decode_columnar(encode_columnar(keyframe))
+        assert delta.base == delta.seq - 1 == keyframe.seq - 1
+
+        names.update(delta.names)
+        for department_id in delta.removed.tolist():
+            state.pop(names[department_id], None)
+        state.update(_decoded_rows(delta, names))
+        _same(state, _decoded_rows(keyframe, keyframe.names))
+
+    # The last tick repeats the previous one: the delta is empty.
+    assert delta.rows == 0 and delta.removed.size == 0 and delta.names == {}
+
+
+def test_delta_only_carries_changes():
+    encoder = DeltaEncoder()
+    encoder.advance([_row("ICU", 100, 1.0), _row("ER", 100, 2.0)])
+    _, delta = encoder.advance([_row("ICU", 100, 1.0), _row("ER", 100, 3.0)])
+    assert delta.rows == 1
+    assert delta.names == {}
+    assert _decoded_rows(delta, {0: "ICU", 1: "ER"}) == {"ER": (100, 3.0, 2.5, pytest.approx(math.nan, nan_ok=True))}
+
+    _, delta = encoder.advance([_row("ICU", 100, 1.0)])
+    assert delta.rows == 0
+    assert delta.removed.tolist() == [1]
+
+
+def test_msgpack_frame_matches_columnar():
+    msgpack = pytest.importorskip("msgpack")
+    from app.services.wire_format import encode_msgpack
+
+    encoder = DeltaEncoder()
+    encoder.advance([_row("ICU", 100, 1.0)])
+    _, delta = encoder.advance([_row("ICU", 100, 1.5), _row("ER", 100, 2.0)])
+    payload = msgpack.unpackb(encode_msgpack(delta))
+    assert payload["seq"] == delta.seq and payload["base"] == delta.base
+    assert payload["departments"] == [[1, "ER"]]
+    for name, column in delta.columns.items():
+        assert payload["columns"][name] == pytest.approx(column.tolist(), nan_ok=True)
+
+
+def test_negotiation_prefers_quality_then_order():
+    assert negotiate_accept(None) == JSON
+    assert negotiate_accept("application/vnd.greenhealth.columnar") == COLUMNAR
+    assert negotiate_accept("application/json;q=0.9, application/vnd.greenhealth.columnar") == COLUMNAR
+    assert negotiate_accept("application/vnd.greenhealth.columnar;q=0, text/html") == JSON
+    assert negotiate_subprotocol(["bogus", "greenhealth.columnar.v1"]) == (
+        COLUMNAR,
+        "greenhealth.columnar.v1",
+    )
+    assert negotiate_subprotocol([]) == (JSON, None)
+    if pytest.importorskip("msgpack"):
+        assert negotiate_accept("application/msgpack") == MSGPACK
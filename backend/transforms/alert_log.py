@@ -0,0 +1,145 @@
+"""
+Retained log of closed alerts, the alert side of the telemetry history.
+
+Alerts are recorded once they close, with the time they opened and closed.
+With GREENHEALTH_HISTORY_DIR set they are appended to one JSON-lines file per
+month of closing, next to the telemetry rollups, so a range query only reads
+the months from its start onwards; without it a bounded in-memory log is kept.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Deque, Dict, Iterator, List, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("id", "department", "type", "severity", "message", "opened_at", "closed_at")
+# Closed alerts kept when there is no history directory.
+MEMORY_ENTRIES = 100_000
+
+
+def _epoch(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _month(epoch_seconds: float) -> str:
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime("%Y-%m")
+
+
+class AlertLog:
+    def __init__(self, directory: Optional[Path], retention_days: int):
+        self._directory = directory
+        self._retention_seconds = retention_days * 86400
+        self._memory: Deque[Dict] = deque(maxlen=MEMORY_ENTRIES)
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls) -> "AlertLog":
+        raw_directory = os.getenv("GREENHEALTH_HISTORY_DIR", "").strip()
+        return cls(
+            Path(raw_directory) / "alerts" if raw_directory else None,
+            int(os.getenv("GREENHEALTH_HISTORY_ALERTS_RETENTION_DAYS", "400")),
+        )
+
+    def record(self, opened: List[Dict], closed: List[Dict]) -> None:
+        """`alerts_state` listener; runs on the stream-engine thread."""
+        if not closed:
+            return
+        closed_at = datetime.now(timezone.utc)
+        entries = [
+            {
+                "id": alert["id"],
+                "department": alert["department"],
+                "type": alert["type"],
+                "severity": alert["severity"],
+                "message": alert["message"],
+                "opened_at": alert["created_at"],
+                "closed_at": closed_at.isoformat(),
+            }
+            for alert in closed
+        ]
+        with self._lock:
+            if self._directory is None:
+                self._memory.extend(entries)
+                return
+            try:
+                self._directory.mkdir(parents=True, exist_ok=True)
+                path = self._directory / f"{closed_at:%Y-%m}.jsonl"
+                is_new = not path.exists()
+                with path.open("a", encoding="utf-8") as handle:
+                    for entry in entries:
+                        handle.write(json.dumps(entry) + "\n")
+                if is_new:
+                    self._expire(closed_at.timestamp())
+            except OSError:
+                logger.exception("Could not append %d closed alert(s) to the alert log.", len(entries))
+
+    def _expire(self, now: float) -> None:
+        assert self._directory is not None
+        cutoff = _month(now - self._retention_seconds)
+        for path in self._directory.glob("*.jsonl"):
+            if path.stem < cutoff:
+                path.unlink(missing_ok=True)
+
+    def iter_closed(
+        self,
+        start: float,
+        end: float,
+        departments: Optional[Sequence[str]] = None,
+        chunk_size: int = 5000,
+    ) -> Iterator[List[Dict]]:
+        """
+        Closed alerts that were open at some point in [start, end), in the
+        order they closed, as lists of at most `chunk_size` entries.
+        """
+        wanted = set(departments) if departments else None
+
+        def keep(entry: Dict) -> bool:
+            return (
+                (wanted is None or entry["department"] in wanted)
+                and _epoch(entry["opened_at"]) < end
+                and _epoch(entry["closed_at"]) >= start
+            )
+
+        chunk: List[Dict] = []
+        for entry in self._entries(start):
+            if keep(entry):
+                chunk.append(entry)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def _entries(self, start: float) -> Iterator[Dict]:
+        if self._directory is None:
+            with self._lock:
+                entries = list(self._memory)
+            yield from entries
+            return
+        if not self._directory.is_dir():
+            return
+        first = _month(start)
+        for path in sorted(self._directory.glob("*.jsonl")):
+            if path.stem < first:
+                continue
+            # Read line by line; a line still being appended has no newline yet.
+            with path.open(encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        logger.warning("Skipping unreadable alert log line in %s", path)
+
+
+alert_log = AlertLog.from_env()
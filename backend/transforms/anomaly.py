@@ -0,0 +1,161 @@
+"""
+Online per-department anomaly detection (EWMA z-score + one-sided CUSUM).
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+METRICS: Tuple[str, ...] = ("energy_kwh", "medical_waste_kg", "paper_kg")
+ALERT_TYPES: Tuple[str, ...] = ("energy_anomaly", "waste_anomaly", "paper_anomaly")
+# Static per-metric alert thresholds, also used as forecast budgets.
+STATIC_THRESHOLDS: Tuple[float, ...] = (200.0, 40.0, 30.0)
+
+
+@dataclass(frozen=True)
+class DetectorConfig:
+    alpha: float = 0.05
+    z_threshold: float = 3.0
+    z_high: float = 4.5
+    cusum_k: float = 0.75
+    cusum_h: float = 8.0
+    warmup: int = 30
+    # Floor for the standard deviation, relative to the mean, so a perfectly
+    # flat series does not turn tiny jitter into huge z-scores.
+    min_relative_std: float = 0.02
+
+    @classmethod
+    def from_env(cls) -> "DetectorConfig":
+        return cls(
+            alpha=float(os.getenv("GREENHEALTH_ANOMALY_ALPHA", cls.alpha)),
+            z_threshold=float(os.getenv("GREENHEALTH_ANOMALY_Z", cls.z_threshold)),
+            z_high=float(os.getenv("GREENHEALTH_ANOMALY_Z_HIGH", cls.z_high)),
+            cusum_k=float(os.getenv("GREENHEALTH_ANOMALY_CUSUM_K", cls.cusum_k)),
+            cusum_h=float(os.getenv("GREENHEALTH_ANOMALY_CUSUM_H", cls.cusum_h)),
+            warmup=int(os.getenv("GREENHEALTH_ANOMALY_WARMUP", cls.warmup)),
+        )
+
+
+@dataclass(frozen=True)
+class Anomaly:
+    department: str
+    metric: str
+    alert_type: str
+    severity: str
+    value: float
+    baseline: float
+    z_score: float
+
+
+def anomaly_mode() -> str:
+    """`static`, `statistical` or `both` (default)."""
+    mode = os.getenv("GREENHEALTH_ANOMALY_MODE", "both").strip().lower()
+    return mode if mode in {"static", "statistical", "both"} else "both"
+
+
+class StreamingAnomalyDetector:
+    """
+    Keeps EWMA mean/variance and an upward CUSUM statistic for every
+    (department, metric) pair in preallocated NumPy arrays.
+
+    Each event costs a fixed number of vector operations over the metric axis,
+    independent of history length and department count. A metric is flagged
+    when its z-score against the baseline (computed before the baseline absorbs
+    the event) crosses `z_threshold`, or when CUSUM accumulates a sustained
+    upward shift past `cusum_h`; nothing is flagged during warm-up.
+    """
+
+    def __init__(self, config: DetectorConfig, capacity: int = 16):
+        self.config = config
+        self._index: Dict[str, int] = {}
+        self._departments: List[str] = []
+        metric_count = len(METRICS)
+        self._mean = np.zeros((capacity, metric_count))
+        self._var = np.zeros((capacity, metric_count))
+        self._cusum = np.zeros((capacity, metric_count))
+        self._z = np.zeros((capacity, metric_count))
+        self._last = np.zeros((capacity, metric_count))
+        self._count = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self) -> None:
+        capacity = self._mean.shape[0] * 2
+        for name in ("_mean", "_var", "_cusum", "_z", "_last"):
+            current = getattr(self, name)
+            grown = np.zeros((capacity, current.shape[1]))
+            grown[: current.shape[0]] = current
+            setattr(self, name, grown)
+        count = np.zeros(capacity, dtype=np.int64)
+        count[: self._count.shape[0]] = self._count
+        self._count = count
+
+    def _slot(self, department: str) -> int:
+        slot = self._index.get(department)
+        if slot is None:
+            slot = len(self._departments)
+            if slot >= self._mean.shape[0]:
+                self._grow()
+            self._index[department] = slot
+            self._departments.append(department)
+        return slot
+
+    def update(self, department: str, values: Sequence[float]) -> None:
+        slot = self._slot(department)
+        x = np.asarray(values, dtype=np.float64)
+        cfg = self.config
+
+        if self._count[slot] == 0:
+            self._mean[slot] = x
+            self._var[slot] = 0.0
+        else:
+            mean = self._mean[slot]
+            std = np.maximum(
+                np.sqrt(self._var[slot]), cfg.min_relative_std * np.abs(mean) + 1e-9
+            )
+            z = (x - mean) / std
+            self._z[slot] = z
+            self._cusum[slot] = np.maximum(0.0, self._cusum[slot] + z - cfg.cusum_k)
+
+            diff = x - mean
+            increment = cfg.alpha * diff
+            self._mean[slot] = mean + increment
+            self._var[slot] = (1.0 - cfg.alpha) * (self._var[slot] + diff * increment)
+
+        self._last[slot] = x
+        self._count[slot] += 1
+
+    def active_anomalies(self) -> List[Anomaly]:
+        used = len(self._departments)
+        if used == 0:
+            return []
+        cfg = self.config
+        warmed = (self._count[:used] >= cfg.warmup)[:, None]
+        z = self._z[:used]
+        flagged = warmed & ((z >= cfg.z_threshold) | (self._cusum[:used] > cfg.cusum_h))
+
+        anomalies: List[Anomaly] = []
+        for slot, metric_index in zip(*np.nonzero(flagged)):
+            z_score = float(z[slot, metric_index])
+            if z_score >= cfg.z_high:
+                severity = "high"
+            elif z_score >= cfg.z_threshold:
+                severity = "medium"
+            else:
+                # Sustained CUSUM drift without a single extreme reading.
+                severity = "low"
+            anomalies.append(
+                Anomaly(
+                    department=self._departments[slot],
+                    metric=METRICS[metric_index],
+                    alert_type=ALERT_TYPES[metric_index],
+                    severity=severity,
+                    value=float(self._last[slot, metric_index]),
+                    baseline=float(self._mean[slot, metric_index]),
+                    z_score=z_score,
+                )
+            )
+        return anomalies
@@ -0,0 +1,270 @@
+"""
+Incremental per-department Holt-Winters forecasting with daily seasonality.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from transforms.anomaly import METRICS, STATIC_THRESHOLDS
+from transforms.windows import configured_window_specs, parse_duration, primary_window_name
+
+
+BREACH_ALERT_TYPES: Tuple[str, ...] = (
+    "energy_forecast_breach",
+    "waste_forecast_breach",
+    "paper_forecast_breach",
+)
+
+
+@dataclass(frozen=True)
+class ForecasterConfig:
+    step: timedelta = timedelta(minutes=5)
+    season: timedelta = timedelta(days=1)
+    alpha: float = 0.3
+    beta: float = 0.05
+    gamma: float = 0.1
+    breach_horizon: timedelta = timedelta(hours=1)
+    # Observations required before breach predictions are trusted.
+    warmup: int = 12
+
+    @property
+    def season_length(self) -> int:
+        return max(1, int(self.season / self.step))
+
+    @classmethod
+    def from_env(cls) -> "ForecasterConfig":
+        step = cls.step
+        primary = primary_window_name()
+        for spec in configured_window_specs():
+            if spec.name == primary:
+                step = spec.hop
+        return cls(
+            step=step,
+            alpha=float(os.getenv("GREENHEALTH_FORECAST_ALPHA", cls.alpha)),
+            beta=float(os.getenv("GREENHEALTH_FORECAST_BETA", cls.beta)),
+            gamma=float(os.getenv("GREENHEALTH_FORECAST_GAMMA", cls.gamma)),
+            breach_horizon=parse_duration(
+                os.getenv("GREENHEALTH_FORECAST_BREACH_HORIZON", "1h")
+            ),
+            warmup=int(os.getenv("GREENHEALTH_FORECAST_WARMUP", cls.warmup)),
+        )
+
+
+@dataclass(frozen=True)
+class PredictedBreach:
+    department: str
+    metric: str
+    alert_type: str
+    predicted_value: float
+    budget: float
+    eta: datetime
+
+
+class HoltWintersForecaster:
+    """
+    Additive Holt-Winters (level, trend, daily season) per department and metric.
+
+    State lives in preallocated arrays whose size depends on the department
+    count and season length only: one observation per window hop is folded in
+    with a constant-time update, with no refits. Sliding windows overlap and
+    keep changing while events arrive, so a window is only committed once it
+    is complete: when the watermark (latest event time seen) has passed its end.
+    """
+
+    def __init__(
+        self,
+        config: ForecasterConfig,
+        budgets: Sequence[float] = STATIC_THRESHOLDS,
+        capacity: int = 16,
+    ):
+        self.config = config
+        self.budgets = np.asarray(budgets, dtype=np.float64)
+        self._budget_resolver: Optional[Callable[[str], Sequence[float]]] = None
+        self._lock = Lock()
+        self._index: Dict[str, int] = {}
+        self._departments: List[str] = []
+        metric_count = len(METRICS)
+        self._level = np.zeros((capacity, metric_count))
+        self._trend = np.zeros((capacity, metric_count))
+        self._season = np.zeros((capacity, config.season_length, metric_count))
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._last_step = np.zeros(capacity, dtype=np.int64)
+        self._breach_step = np.full((capacity, metric_count), -1, dtype=np.int64)
+        self._budgets = np.tile(self.budgets, (capacity, 1))
+        # Windows not yet complete per department: step index -> latest values.
+        self._pending: Dict[int, Dict[int, np.ndarray]] = {}
+
+    def _grow(self) -> None:
+        capacity = self._level.shape[0] * 2
+
+        def grown(current: np.ndarray, fill=0) -> np.ndarray:
+            result = np.full((capacity,) + current.shape[1:], fill, dtype=current.dtype)
+            result[: current.shape[0]] = current
+            return result
+
+        self._level = grown(self._level)
+        self._trend = grown(self._trend)
+        self._season = grown(self._season)
+        self._count = grown(self._count)
+        self._last_step = grown(self._last_step)
+        self._breach_step = grown(self._breach_step, fill=-1)
+        self._budgets = grown(self._budgets)
+
+    def _slot(self, department: str) -> int:
+        slot = self._index.get(department)
+        if slot is None:
+            slot = len(self._departments)
+            if slot >= self._level.shape[0]:
+                self._grow()
+            self._index[department] = slot
+            self._departments.append(department)
+            self._budgets[slot] = self._resolve_budgets(department)
+        return slot
+
+    def _resolve_budgets(self, department: str) -> np.ndarray:
+        if self._budget_resolver is None:
+            return self.budgets
+        return np.asarray(self._budget_resolver(department), dtype=np.float64)
+
+    def set_budget_resolver(self, resolver: Callable[[str], Sequence[float]]) -> None:
+        """Per-department budgets (e.g. from the alert rules); applied to known departments now."""
+        with self._lock:
+            self._budget_resolver = resolver
+            for slot, department in enumerate(self._departments):
+                self._budgets[slot] = self._resolve_budgets(department)
+                if self._count[slot]:
+                    self._update_breach(slot)
+
+    def _step_index(self, epoch_seconds: float) -> int:
+        return int(epoch_seconds // self.config.step.total_seconds())
+
+    def observe(
+        self,
+        department: str,
+        window_end_epoch: float,
+        values: Sequence[float],
+        watermark: Optional[float],
+    ) -> None:
+        """
+        Record the latest aggregate of one of a department's windows, then fold
+        every window of the department that ended by `watermark` into the model,
+        oldest first. Rows for windows already folded in are ignored.
+        """
+        step = self._step_index(window_end_epoch)
+        x = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            slot = self._slot(department)
+            if self._count[slot] and step <= self._last_step[slot]:
+                return
+            pending = self._pending.setdefault(slot, {})
+            pending[step] = x
+            if watermark is None:
+                return
+            complete = self._step_index(watermark)
+            for ready in sorted(item for item in pending if item <= complete):
+                self._commit(slot, ready, pending.pop(ready))
+
+    def _commit(self, slot: int, step: int, y: np.ndarray) -> None:
+        cfg = self.config
+        season_index = step % cfg.season_length
+        if self._count[slot] == 0:
+            self._level[slot] = y
+            self._trend[slot] = 0.0
+        else:
+            # Skipped steps (gaps in the feed) advance the trend accordingly.
+            gap = max(1, step - int(self._last_step[slot]))
+            level = self._level[slot]
+            trend = self._trend[slot]
+            season = self._season[slot, season_index]
+            new_level = cfg.alpha * (y - season) + (1.0 - cfg.alpha) * (level + gap * trend)
+            self._trend[slot] = cfg.beta * (new_level - level) / gap + (1.0 - cfg.beta) * trend
+            self._season[slot, season_index] = (
+                cfg.gamma * (y - new_level) + (1.0 - cfg.gamma) * season
+            )
+            self._level[slot] = new_level
+        self._count[slot] += 1
+        self._last_step[slot] = step
+        self._update_breach(slot)
+
+    def _forecast_slot(self, slot: int, steps: np.ndarray) -> np.ndarray:
+        season_indices = (int(self._last_step[slot]) + steps) % self.config.season_length
+        return (
+            self._level[slot][None, :]
+            + steps[:, None] * self._trend[slot][None, :]
+            + self._season[slot, season_indices]
+        )
+
+    def _update_breach(self, slot: int) -> None:
+        horizon_steps = max(1, math.ceil(self.config.breach_horizon / self.config.step))
+        if self._count[slot] < self.config.warmup:
+            self._breach_step[slot] = -1
+            return
+        steps = np.arange(1, horizon_steps + 1)
+        predicted = self._forecast_slot(slot, steps)
+        budgets = self._budgets[slot]
+        over = predicted > budgets[None, :]
+        currently_over = self._level[slot] > budgets
+        first = np.where(over.any(axis=0), over.argmax(axis=0) + 1, -1)
+        # Only warn ahead of time; a metric already over budget is the static
+        # rules' business.
+        first[currently_over] = -1
+        self._breach_step[slot] = np.where(
+            first > 0, int(self._last_step[slot]) + first, -1
+        )
+
+    def forecast(self, department: str, horizon: timedelta) -> Optional[List[Dict]]:
+        with self._lock:
+            slot = self._index.get(department)
+            if slot is None or self._count[slot] == 0:
+                return None
+            step_seconds = self.config.step.total_seconds()
+            horizon_steps = max(1, math.ceil(horizon / self.config.step))
+            steps = np.arange(1, horizon_steps + 1)
+            predicted = self._forecast_slot(slot, steps)
+            last_step = int(self._last_step[slot])
+
+        points = []
+        for offset, values in zip(steps, predicted):
+            timestamp = datetime.fromtimestamp((last_step + offset) * step_seconds, timezone.utc)
+            point = {"timestamp": timestamp.isoformat()}
+            point.update({metric: float(value) for metric, value in zip(METRICS, values)})
+            points.append(point)
+        return points
+
+    def predicted_breaches(self) -> List[PredictedBreach]:
+        with self._lock:
+            used = len(self._departments)
+            if used == 0:
+                return []
+            step_seconds = self.config.step.total_seconds()
+            breaches: List[PredictedBreach] = []
+            for slot, metric_index in zip(*np.nonzero(self._breach_step[:used] >= 0)):
+                breach_step = int(self._breach_step[slot, metric_index])
+                steps = np.array([breach_step - int(self._last_step[slot])])
+                predicted = float(self._forecast_slot(slot, steps)[0, metric_index])
+                breaches.append(
+                    PredictedBreach(
+                        department=self._departments[slot],
+                        metric=METRICS[metric_index],
+                        alert_type=BREACH_ALERT_TYPES[metric_index],
+                        predicted_value=predicted,
+                        budget=float(self._budgets[slot, metric_index]),
+                        eta=datetime.fromtimestamp(breach_step * step_seconds, timezone.utc),
+                    )
+                )
+            return breaches
+
+    def departments(self) -> List[str]:
+        with self._lock:
+            return list(self._departments)
+
+
+forecaster = HoltWintersForecaster(ForecasterConfig.from_env())
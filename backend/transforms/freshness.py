@@ -0,0 +1,125 @@
+"""
+Event-time freshness per department, the pipeline watermark and late events.
+
+The watermark is the latest event time seen, which is also the time Pathway's
+window operators go by. With GREENHEALTH_WINDOW_ALLOWED_LATENESS set, windows
+ending more than that before the watermark stop updating (Pathway's `cutoff`)
+and their state is released. Pathway drops events for closed windows silently,
+so the same rule is applied here to count them per window.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from observability.metrics import LATE_EVENTS_DROPPED_TOTAL
+from transforms.windows import WindowSpec, allowed_lateness
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+def last_window_end(event_time: float, spec: WindowSpec) -> float:
+    """End of the latest sliding window (aligned to the epoch) containing `event_time`."""
+    hop = spec.hop.total_seconds()
+    return math.floor(event_time / hop) * hop + spec.duration.total_seconds()
+
+
+class FreshnessTracker:
+    def __init__(self) -> None:
+        lateness = allowed_lateness()
+        self.allowed_lateness_seconds = None if lateness is None else lateness.total_seconds()
+        self.stale_after_seconds = float(os.getenv("GREENHEALTH_STALE_AFTER_SECONDS", "60"))
+        self._specs: List[WindowSpec] = []
+        self._watermark: Optional[float] = None
+        # department -> (latest event time, wall-clock time it was published)
+        self._departments: Dict[str, Tuple[float, float]] = {}
+        self._dropped: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def configure(self, specs: Sequence[WindowSpec]) -> None:
+        with self._lock:
+            self._specs = list(specs)
+
+    def observe(self, department: str, event_time: float) -> bool:
+        """Record an event as it is published; False if it was too late for every window."""
+        published_at = time.time()
+        with self._lock:
+            watermark = self._watermark
+            if watermark is None or event_time > watermark:
+                self._watermark = event_time
+            current = self._departments.get(department)
+            if current is None or event_time >= current[0]:
+                self._departments[department] = (event_time, published_at)
+            if watermark is None or self.allowed_lateness_seconds is None:
+                return True
+            closed_before = watermark - self.allowed_lateness_seconds
+            dropped = [
+                spec.name
+                for spec in self._specs
+                if last_window_end(event_time, spec) < closed_before
+            ]
+            for name in dropped:
+                self._dropped[name] = self._dropped.get(name, 0) + 1
+            too_late = bool(dropped) and len(dropped) == len(self._specs)
+        for name in dropped:
+            LATE_EVENTS_DROPPED_TOTAL.inc(window=name)
+        return not too_late
+
+    @property
+    def watermark(self) -> Optional[float]:
+        """Latest event time seen, in epoch seconds."""
+        with self._lock:
+            return self._watermark
+
+    def clear(self) -> None:
+        with self._lock:
+            self._departments.clear()
+
+    def departments(self, now: Optional[float] = None) -> Dict[str, Dict]:
+        """Per department: event time, publish time, pipeline lag and current age."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = dict(self._departments)
+        return {
+            department: {
+                "event_time": _iso(event_time),
+                "published_at": _iso(published_at),
+                "lag_seconds": round(max(0.0, published_at - event_time), 3),
+                "age_seconds": round(max(0.0, now - event_time), 3),
+            }
+            for department, (event_time, published_at) in entries.items()
+        }
+
+    def stale_departments(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = dict(self._departments)
+        return sorted(
+            department
+            for department, (event_time, _) in entries.items()
+            if now - event_time > self.stale_after_seconds
+        )
+
+    def status(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            watermark = self._watermark
+            dropped = dict(self._dropped)
+        return {
+            "watermark": None if watermark is None else _iso(watermark),
+            "allowed_lateness_seconds": self.allowed_lateness_seconds,
+            "stale_after_seconds": self.stale_after_seconds,
+            "stale_departments": self.stale_departments(now),
+            "departments": self.departments(now),
+            "late_events_dropped": dropped,
+        }
+
+
+freshness_tracker = FreshnessTracker()
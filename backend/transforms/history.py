@@ -0,0 +1,439 @@
+"""
+Retained, columnar telemetry history with materialized time rollups.
+
+Events are folded into three rollup levels (5 minute, hourly, daily). Each level
+is split into fixed time segments holding one NumPy column per statistic, laid
+out as (bucket, department). A sorted list of segment start times is the time
+range index: a query bisects it and only touches segments overlapping the
+requested range, then re-buckets rows with vectorized group-bys.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from transforms.anomaly import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = ("avg", "sum", "max", "count")
+# Weeks start on Monday; 1970-01-01 was a Thursday.
+WEEK_ORIGIN_SECONDS = 4 * 86400
+
+
+@dataclass(frozen=True)
+class LevelSpec:
+    name: str
+    bucket_seconds: int
+    segment_buckets: int
+    retention_seconds: int
+
+    @property
+    def segment_seconds(self) -> int:
+        return self.bucket_seconds * self.segment_buckets
+
+
+def _default_levels() -> Tuple[LevelSpec, ...]:
+    def days(env_name: str, default: int) -> int:
+        return int(os.getenv(env_name, default)) * 86400
+
+    return (
+        LevelSpec("5m", 300, 288, days("GREENHEALTH_HISTORY_5M_RETENTION_DAYS", 7)),
+        LevelSpec("1h", 3600, 24 * 7, days("GREENHEALTH_HISTORY_1H_RETENTION_DAYS", 400)),
+        LevelSpec("1d", 86400, 364, days("GREENHEALTH_HISTORY_1D_RETENTION_DAYS", 3650)),
+    )
+
+
+@dataclass
+class Segment:
+    level: str
+    start: int
+    bucket_seconds: int
+    departments: List[str]
+    count: np.ndarray
+    sums: np.ndarray  # (buckets, departments, metrics)
+    maxima: np.ndarray  # (buckets, departments, metrics)
+    dirty: bool = field(default=True)
+
+    @classmethod
+    def empty(cls, level: LevelSpec, start: int, departments: int) -> "Segment":
+        metric_count = len(METRICS)
+        columns = max(departments, 8)
+        return cls(
+            level=level.name,
+            start=start,
+            bucket_seconds=level.bucket_seconds,
+            departments=[],
+            count=np.zeros((level.segment_buckets, columns), dtype=np.int32),
+            sums=np.zeros((level.segment_buckets, columns, metric_count)),
+            maxima=np.full(
+                (level.segment_buckets, columns, metric_count), -np.inf, dtype=np.float32
+            ),
+        )
+
+    def column(self, department: str) -> int:
+        try:
+            return self.departments.index(department)
+        except ValueError:
+            pass
+        column = len(self.departments)
+        if column >= self.count.shape[1]:
+            extra = max(8, self.count.shape[1])
+            self.count = np.concatenate(
+                [self.count, np.zeros((self.count.shape[0], extra), dtype=np.int32)], axis=1
+            )
+            self.sums = np.concatenate(
+                [self.sums, np.zeros((self.sums.shape[0], extra, self.sums.shape[2]))], axis=1
+            )
+            self.maxima = np.concatenate(
+                [
+                    self.maxima,
+                    np.full(
+                        (self.maxima.shape[0], extra, self.maxima.shape[2]),
+                        -np.inf,
+                        dtype=np.float32,
+                    ),
+                ],
+                axis=1,
+            )
+        self.departments.append(department)
+        return column
+
+
+class SegmentRows(NamedTuple):
+    """Copied rows of one segment: (buckets,) starts and (buckets, departments[, metrics]) stats."""
+
+    bucket_starts: np.ndarray
+    departments: List[str]
+    count: np.ndarray
+    sums: np.ndarray
+    maxima: np.ndarray
+
+
+class _Level:
+    def __init__(self, spec: LevelSpec):
+        self.spec = spec
+        self.starts: List[int] = []
+        self.segments: Dict[int, Segment] = {}
+        # Per segment: department -> column, to keep ingestion O(1).
+        self.columns: Dict[int, Dict[str, int]] = {}
+
+    def segment_for(self, epoch_seconds: int, department_hint: int) -> Segment:
+        start = epoch_seconds - epoch_seconds % self.spec.segment_seconds
+        segment = self.segments.get(start)
+        if segment is None:
+            segment = Segment.empty(self.spec, start, department_hint)
+            self.add(segment)
+        return segment
+
+    def add(self, segment: Segment) -> None:
+        position = bisect_left(self.starts, segment.start)
+        self.starts.insert(position, segment.start)
+        self.segments[segment.start] = segment
+        self.columns[segment.start] = {
+            name: index for index, name in enumerate(segment.departments)
+        }
+
+    def column(self, segment: Segment, department: str) -> int:
+        columns = self.columns[segment.start]
+        column = columns.get(department)
+        if column is None:
+            column = segment.column(department)
+            columns[department] = column
+        return column
+
+    def overlapping(self, start: int, end: int) -> List[Segment]:
+        first = bisect_right(self.starts, start - self.spec.segment_seconds)
+        last = bisect_left(self.starts, end)
+        return [self.segments[item] for item in self.starts[first:last]]
+
+    def expire(self, now: int) -> List[int]:
+        cutoff = now - self.spec.retention_seconds
+        expired = [start for start in self.starts if start + self.spec.segment_seconds <= cutoff]
+        for start in expired:
+            self.starts.remove(start)
+            self.segments.pop(start, None)
+            self.columns.pop(start, None)
+        return expired
+
+
+class HistoryStore:
+    def __init__(
+        self,
+        levels: Sequence[LevelSpec],
+        directory: Optional[Path] = None,
+    ):
+        self._lock = Lock()
+        self._levels = {spec.name: _Level(spec) for spec in levels}
+        self._directory = directory
+        self._known_departments: Dict[str, None] = {}
+        self._last_maintenance = 0
+        if directory is not None:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "HistoryStore":
+        raw_directory = os.getenv("GREENHEALTH_HISTORY_DIR", "").strip()
+        return cls(_default_levels(), Path(raw_directory) if raw_directory else None)
+
+    @property
+    def levels(self) -> List[LevelSpec]:
+        return [level.spec for level in self._levels.values()]
+
+    def departments(self) -> List[str]:
+        with self._lock:
+            return list(self._known_departments)
+
+    def record(self, department: str, epoch_seconds: float, values: Sequence[float]) -> None:
+        timestamp = int(epoch_seconds)
+        vector = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            self._known_departments.setdefault(department, None)
+            hint = len(self._known_departments)
+            for level in self._levels.values():
+                segment = level.segment_for(timestamp, hint)
+                row = (timestamp - segment.start) // segment.bucket_seconds
+                column = level.column(segment, department)
+                segment.count[row, column] += 1
+                segment.sums[row, column] += vector
+                np.maximum(segment.maxima[row, column], vector, out=segment.maxima[row, column])
+                segment.dirty = True
+
+            # Retention and persistence once per finished 5 minute bucket.
+            if timestamp - self._last_maintenance >= 300:
+                self._last_maintenance = timestamp
+                self._maintain(timestamp)
+
+    def _maintain(self, now: int) -> None:
+        for level in self._levels.values():
+            for start in level.expire(now):
+                self._delete_file(level.spec.name, start)
+        if self._directory is not None:
+            self._flush()
+
+    def aggregate(
+        self,
+        metric: str,
+        bucket_seconds: int,
+        start: int,
+        end: int,
+        agg: str = "avg",
+        group_by_department: bool = True,
+        departments: Optional[Sequence[str]] = None,
+    ) -> List[Dict]:
+        """
+        Aggregate `metric` into `bucket_seconds` buckets over [start, end).
+
+        Uses the coarsest rollup level whose bucket size divides the requested
+        bucket, so a 90 day daily query reads ~1 daily segment instead of raw data.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}.")
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation {agg!r}; expected one of {', '.join(AGGREGATIONS)}.")
+        level = self._level_for(bucket_seconds)
+        metric_index = METRICS.index(metric)
+        origin = WEEK_ORIGIN_SECONDS if bucket_seconds % (7 * 86400) == 0 else 0
+        wanted = set(departments) if departments else None
+
+        # (bucket start, department) -> [count, sum, max]
+        totals: Dict[Tuple[int, str], List[float]] = {}
+        with self._lock:
+            for segment in level.overlapping(start, end):
+                row_starts = segment.start + segment.bucket_seconds * np.arange(segment.count.shape[0])
+                rows = np.nonzero((row_starts >= start) & (row_starts < end))[0]
+                if rows.size == 0:
+                    continue
+                used = len(segment.departments)
+                if wanted is None:
+                    columns = np.arange(used)
+                else:
+                    columns = np.asarray(
+                        [i for i in range(used) if segment.departments[i] in wanted], dtype=int
+                    )
+                if columns.size == 0:
+                    continue
+
+                counts = segment.count[rows][:, columns]
+                sums = segment.sums[rows][:, columns, metric_index]
+                maxima = segment.maxima[rows][:, columns, metric_index]
+                if not group_by_department:
+                    counts = counts.sum(axis=1, keepdims=True)
+                    sums = sums.sum(axis=1, keepdims=True)
+                    maxima = maxima.max(axis=1, keepdims=True)
+                    names = ["*"]
+                else:
+                    names = [segment.departments[i] for i in columns]
+
+                # Rows are time ordered, so each output bucket is a contiguous run.
+                bucket_ids = (row_starts[rows] - origin) // bucket_seconds
+                unique_buckets, boundaries = np.unique(bucket_ids, return_index=True)
+                bucket_counts = np.add.reduceat(counts, boundaries, axis=0)
+                bucket_sums = np.add.reduceat(sums, boundaries, axis=0)
+                bucket_max = np.maximum.reduceat(maxima, boundaries, axis=0)
+
+                for position, column in zip(*np.nonzero(bucket_counts)):
+                    key = (int(unique_buckets[position]) * bucket_seconds + origin, names[column])
+                    current = totals.setdefault(key, [0.0, 0.0, -np.inf])
+                    current[0] += float(bucket_counts[position, column])
+                    current[1] += float(bucket_sums[position, column])
+                    current[2] = max(current[2], float(bucket_max[position, column]))
+
+        results = []
+        for (bucket_start, name), (count, total, maximum) in sorted(totals.items()):
+            value = {
+                "avg": total / count if count else 0.0,
+                "sum": total,
+                "max": maximum,
+                "count": count,
+            }[agg]
+            item = {"bucket_start": bucket_start, "value": float(value), "samples": int(count)}
+            if group_by_department:
+                item["department"] = name
+            results.append(item)
+        return results
+
+    def level_for_export(self, bucket: Optional[str], start: int, now: int) -> LevelSpec:
+        """
+        The named rollup level, or by default the finest one whose retention
+        still reaches back to `start`.
+        """
+        if bucket is not None:
+            level = self._levels.get(bucket)
+            if level is None:
+                raise ValueError(
+                    f"Unknown bucket {bucket!r}; expected one of {', '.join(self._levels)}."
+                )
+            return level.spec
+        for level in sorted(self._levels.values(), key=lambda item: item.spec.bucket_seconds):
+            if now - level.spec.retention_seconds <= start:
+                return level.spec
+        return max(self._levels.values(), key=lambda item: item.spec.bucket_seconds).spec
+
+    def iter_segments(
+        self,
+        level_name: str,
+        start: int,
+        end: int,
+        departments: Optional[Sequence[str]] = None,
+    ) -> Iterator[SegmentRows]:
+        """
+        Rows of one rollup level over [start, end), one time segment at a time.
+
+        The lock is held only while a segment's rows are copied, so a long
+        export interleaves with ingestion instead of stalling it, and memory
+        stays bounded by one segment.
+        """
+        level = self._levels[level_name]
+        wanted = set(departments) if departments else None
+        with self._lock:
+            starts = [segment.start for segment in level.overlapping(start, end)]
+        for segment_start in starts:
+            with self._lock:
+                segment = level.segments.get(segment_start)
+                if segment is None:  # expired since the export started
+                    continue
+                row_starts = segment.start + segment.bucket_seconds * np.arange(segment.count.shape[0])
+                rows = np.nonzero((row_starts >= start) & (row_starts < end))[0]
+                used = len(segment.departments)
+                columns = np.asarray(
+                    [
+                        i
+                        for i in range(used)
+                        if wanted is None or segment.departments[i] in wanted
+                    ],
+                    dtype=int,
+                )
+                if rows.size == 0 or columns.size == 0:
+                    continue
+                names = [segment.departments[i] for i in columns]
+                counts = segment.count[rows][:, columns]
+                sums = segment.sums[rows][:, columns]
+                maxima = segment.maxima[rows][:, columns]
+            yield SegmentRows(row_starts[rows], names, counts, sums, maxima)
+
+    def _level_for(self, bucket_seconds: int) -> _Level:
+        candidates = [
+            level
+            for level in self._levels.values()
+            if bucket_seconds % level.spec.bucket_seconds == 0
+        ]
+        if not candidates:
+            finest = min(level.spec.bucket_seconds for level in self._levels.values())
+            raise ValueError(f"Bucket must be a multiple of {finest} seconds.")
+        return max(candidates, key=lambda level: level.spec.bucket_seconds)
+
+    def _path(self, level: str, start: int) -> Path:
+        assert self._directory is not None
+        return self._directory / level / f"{start}.npz"
+
+    def _flush(self) -> None:
+        for level in self._levels.values():
+            for segment in level.segments.values():
+                if not segment.dirty:
+                    continue
+                path = self._path(level.spec.name, segment.start)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                used = len(segment.departments)
+                tmp_path = path.with_suffix(".tmp.npz")
+                np.savez(
+                    tmp_path,
+                    departments=np.asarray(segment.departments, dtype=str),
+                    count=segment.count[:, :used],
+                    sums=segment.sums[:, :used],
+                    maxima=segment.maxima[:, :used],
+                )
+                os.replace(tmp_path, path)
+                segment.dirty = False
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._directory is not None:
+                self._flush()
+
+    def _delete_file(self, level: str, start: int) -> None:
+        if self._directory is None:
+            return
+        try:
+            self._path(level, start).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _load(self) -> None:
+        assert self._directory is not None
+        for level in self._levels.values():
+            level_dir = self._directory / level.spec.name
+            if not level_dir.is_dir():
+                continue
+            for path in sorted(level_dir.glob("*.npz")):
+                if path.name.endswith(".tmp.npz"):
+                    continue
+                try:
+                    with np.load(path) as data:
+                        segment = Segment(
+                            level=level.spec.name,
+                            start=int(path.stem),
+                            bucket_seconds=level.spec.bucket_seconds,
+                            departments=[str(name) for name in data["departments"]],
+                            count=data["count"].copy(),
+                            sums=data["sums"].copy(),
+                            maxima=data["maxima"].copy(),
+                            dirty=False,
+                        )
+                except Exception:
+                    logger.exception("Skipping unreadable history segment %s", path)
+                    continue
+                level.add(segment)
+                self._known_departments.update(dict.fromkeys(segment.departments))
+
+
+history_store = HistoryStore.from_env()
@@ -0,0 +1,159 @@
+"""
+Copilot live-context text maintained incrementally from published state.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from transforms.rules import row_usage
+from transforms.state import live_context_state
+
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+def _usage_line(department: str, usage: Tuple[float, float, float]) -> str:
+    energy, waste, paper = usage
+    return (
+        f"{department}: energy={energy:.2f} kWh, waste={waste:.2f} kg, paper={paper:.2f} kg."
+    )
+
+
+def _alert_line(alert: Dict) -> str:
+    return f"- [{alert.get('severity')}] {alert.get('department')}: {alert.get('message')}"
+
+
+def _rank_alerts(alerts: List[Dict]) -> List[Dict]:
+    return sorted(
+        alerts,
+        key=lambda alert: (-SEVERITY_RANK.get(alert.get("severity"), 0), alert.get("created_at", "")),
+    )
+
+
+class LiveContextBuilder:
+    """
+    Rebuilds the copilot's live context whenever the pipeline publishes.
+
+    Per-department blocks are only re-rendered when that department's usage,
+    score or alerts changed. The hospital-wide block ranks departments by
+    relevance (highest alert severity, then lowest score) and keeps the top K,
+    instead of whichever rows happened to come first.
+    """
+
+    def __init__(self, top_k: Optional[int] = None):
+        self.top_k = top_k or int(os.getenv("GREENHEALTH_CONTEXT_TOP_K", "5"))
+        self._signatures: Dict[str, Tuple] = {}
+
+    def rebuild(self, rows: List[Dict], score: Dict, alerts: List[Dict]) -> None:
+        breakdown = score.get("breakdown") or {}
+        alerts_by_department: Dict[str, List[Dict]] = {}
+        for alert in _rank_alerts(alerts):
+            alerts_by_department.setdefault(alert.get("department"), []).append(alert)
+
+        usage_by_department = {row["department"]: row_usage(row) for row in rows}
+
+        changed: Dict[str, List[str]] = {}
+        for department, usage in usage_by_department.items():
+            department_score = breakdown.get(department, {}).get("department_score")
+            department_alerts = alerts_by_department.get(department, [])
+            signature = (
+                tuple(round(value, 2) for value in usage),
+                None if department_score is None else round(department_score, 2),
+                tuple(alert["id"] for alert in department_alerts),
+            )
+            if self._signatures.get(department) == signature:
+                continue
+            self._signatures[department] = signature
+            changed[department] = self._department_lines(
+                department, usage, department_score, department_alerts
+            )
+
+        removed = set(self._signatures) - set(usage_by_department)
+        for department in removed:
+            self._signatures.pop(department, None)
+
+        header = []
+        overall_score = score.get("overall_score")
+        if isinstance(overall_score, (int, float)):
+            header.append(f"Current sustainability score: {overall_score:.2f}/100")
+
+        live_context_state.publish(
+            header=header,
+            hospital=self._hospital_lines(usage_by_department, breakdown, alerts_by_department, alerts),
+            changed=changed,
+            removed=removed,
+        )
+
+    def _department_lines(
+        self,
+        department: str,
+        usage: Tuple[float, float, float],
+        department_score: Optional[float],
+        alerts: List[Dict],
+    ) -> List[str]:
+        lines = []
+        if department_score is not None:
+            lines.append(f"{department} department score: {department_score:.2f}/100")
+        lines.append(_usage_line(department, usage))
+        if alerts:
+            lines.append("Current alerts:")
+            lines.extend(_alert_line(alert) for alert in alerts)
+        else:
+            lines.append("No active sustainability alerts.")
+        return lines
+
+    def _hospital_lines(
+        self,
+        usage_by_department: Dict[str, Tuple[float, float, float]],
+        breakdown: Dict,
+        alerts_by_department: Dict[str, List[Dict]],
+        alerts: List[Dict],
+    ) -> List[str]:
+        if not usage_by_department:
+            return ["No live metrics snapshot available yet.", "No active sustainability alerts."]
+
+        count = len(usage_by_department)
+        energy, waste, paper = (
+            sum(usage[index] for usage in usage_by_department.values()) / count
+            for index in range(3)
+        )
+        lines = [
+            "Average live usage "
+            f"(energy={energy:.2f} kWh, waste={waste:.2f} kg, paper={paper:.2f} kg)."
+        ]
+
+        def relevance(department: str) -> Tuple[int, float]:
+            department_alerts = alerts_by_department.get(department, [])
+            worst = max(
+                (SEVERITY_RANK.get(alert.get("severity"), 0) + 1 for alert in department_alerts),
+                default=0,
+            )
+            department_score = breakdown.get(department, {}).get("department_score", 100.0)
+            return (-worst, department_score)
+
+        ranked = sorted(usage_by_department, key=relevance)
+        if count > self.top_k:
+            lines.append(
+                f"Most relevant {self.top_k} of {count} departments (alerts first, then lowest score):"
+            )
+        for department in ranked[: self.top_k]:
+            line = _usage_line(department, usage_by_department[department])
+            department_score = breakdown.get(department, {}).get("department_score")
+            if department_score is not None:
+                line = f"{line[:-1]}, score={department_score:.1f}."
+            lines.append(line)
+
+        if alerts:
+            ranked_alerts = _rank_alerts(alerts)
+            lines.append("Current alerts:")
+            lines.extend(_alert_line(alert) for alert in ranked_alerts[: self.top_k])
+            if len(ranked_alerts) > self.top_k:
+                lines.append(f"- (+{len(ranked_alerts) - self.top_k} more alerts)")
+        else:
+            lines.append("No active sustainability alerts.")
+        return lines
+
+
+live_context_builder = LiveContextBuilder()
@@ -1,38 +1,117 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
-from typing import Dict, List
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
 import uuid
 
+import numpy as np
 import pathway as pw
 
 from ingestion.simulated_feeds import read_simulated_metrics
-from transforms.state import alerts_state, metrics_state, score_state
+from observability.metrics import (
+    RECOMPUTE_SECONDS,
+    SINK_CALLBACK_SECONDS,
+    STATE_EVENT_LAG_SECONDS,
+    STATE_PUBLISH_TOTAL,
+)
+from transforms.alert_log import alert_log
+from transforms.anomaly import (
+    Anomaly,
+    DetectorConfig,
+    StreamingAnomalyDetector,
+    anomaly_mode,
+)
+from transforms.forecast import PredictedBreach, forecaster
+from transforms.freshness import freshness_tracker
+from transforms.history import history_store
+from transforms.live_context import live_context_builder
+from transforms.rules import CompiledRules, rules_engine, usage_matrix
+from transforms.sketches import quantiles
+from transforms.state import (
+    alerts_state,
+    metrics_state,
+    score_state,
+    windowed_metrics_state,
+)
+from transforms.windows import (
+    WindowSpec,
+    allowed_lateness,
+    configured_window_specs,
+    primary_window_spec,
+)
+
+
+# Configured in build_streaming_graph from GREENHEALTH_ANOMALY_MODE.
+_static_rules_enabled = True
+_detector: Optional[StreamingAnomalyDetector] = None
+# Open static, statistical and forecast alerts keyed by (department, type), so an
+# ongoing condition keeps its id and created_at across recomputes.
+_static_alerts_open: Dict[Tuple[str, str], Dict] = {}
+_statistical_alerts: Dict[Tuple[str, str], Dict] = {}
+_forecast_alerts: Dict[Tuple[str, str], Dict] = {}
 
 
 def build_streaming_graph() -> None:
     """
     Build the Pathway streaming graph:
     - ingest simulated metrics
-    - compute rolling window aggregations
+    - compute rolling window aggregations for every configured window size
     - derive sustainability score
     - detect anomalies and generate alerts
 
     Side effects are pushed into in-memory state objects consumed by the FastAPI layer.
     """
+    global _static_rules_enabled, _detector
+
+    mode = anomaly_mode()
+    _static_rules_enabled = mode in {"static", "both"}
+    _detector = (
+        StreamingAnomalyDetector(DetectorConfig.from_env())
+        if mode in {"statistical", "both"}
+        else None
+    )
+    # Scoring/alert rules are swapped in place while the graph keeps running.
+    rules_engine.add_listener(lambda rules: forecaster.set_budget_resolver(rules.budgets))
+    rules_engine.start_watching()
+    # Closed alerts are retained for GET /export?kind=alerts.
+    alerts_state.add_listener(alert_log.record)
+
     metrics_stream = read_simulated_metrics()
 
-    # Rolling 15-minute window, updated every 5 minutes, per department.
+    specs = configured_window_specs()
+    primary_spec = primary_window_spec()
+    primary_window = primary_spec.name
+    if primary_window not in {spec.name for spec in specs}:
+        specs.append(primary_spec)
+    freshness_tracker.configure(specs)
+
+    windows = {spec.name: _build_window(metrics_stream, spec) for spec in specs}
+    _wire_python_sinks(
+        windows=windows,
+        specs={spec.name: spec for spec in specs},
+        raw_metrics=metrics_stream,
+        primary_window=primary_window,
+    )
+
+
+def _build_window(metrics_stream: pw.Table, spec: WindowSpec) -> pw.Table:
+    # Sliding window per department (the default 15m window hops every 5m).
+    # `instance` keys the reduction by department, which is also how Pathway
+    # shards the window state across workers when run multi-threaded.
+    # With an allowed lateness, windows that ended longer ago than that stop
+    # updating and their state is freed; events for them are dropped.
+    lateness = allowed_lateness()
     windowed = metrics_stream.windowby(
         metrics_stream.timestamp,
-        window=pw.temporal.sliding(
-            hop=timedelta(minutes=5), duration=timedelta(minutes=15)
-        ),
+        window=pw.temporal.sliding(hop=spec.hop, duration=spec.duration),
+        behavior=None if lateness is None else pw.temporal.common_behavior(cutoff=lateness),
         instance=metrics_stream.department,
     ).reduce(
         department=pw.this._pw_instance,
         energy_kwh_avg=pw.reducers.avg(pw.this.energy_kwh),
         energy_kwh_sum=pw.reducers.sum(pw.this.energy_kwh),
+        energy_kwh_quantiles=quantiles(pw.this.energy_kwh),
         medical_waste_kg_avg=pw.reducers.avg(pw.this.medical_waste_kg),
         medical_waste_kg_sum=pw.reducers.sum(pw.this.medical_waste_kg),
         paper_kg_avg=pw.reducers.avg(pw.this.paper_kg),
@@ -40,138 +119,393 @@ def build_streaming_graph() -> None:
         window_start=pw.this._pw_window_start,
         window_end=pw.this._pw_window_end,
     )
-
-    _wire_python_sinks(windowed=windowed, raw_metrics=metrics_stream)
-
-
-def _wire_python_sinks(windowed: pw.Table, raw_metrics: pw.Table) -> None:
+    return windowed.with_columns(
+        energy_kwh_p50=pw.this.energy_kwh_quantiles[0],
+        energy_kwh_p95=pw.this.energy_kwh_quantiles[1],
+        energy_kwh_max=pw.this.energy_kwh_quantiles[2],
+    ).without(pw.this.energy_kwh_quantiles)
+
+
+def _wire_python_sinks(
+    windows: Dict[str, pw.Table],
+    specs: Dict[str, WindowSpec],
+    raw_metrics: pw.Table,
+    primary_window: str,
+) -> None:
     """
-    Subscribe to both raw and aggregated tables.
-
-    Raw events keep dashboard charts populated immediately. Windowed rows become
-    the preferred source for scores and alerting once available.
+    Subscribe to the raw table and to every windowed table.
+
+    Raw events keep dashboard charts populated immediately. Each window
+    publishes, per department, its latest closed window: the newest one whose
+    end the event-time watermark has passed, so it covers its full duration.
+    (The newest window overall started at most one hop ago.) Rows of the
+    primary window are the source for scores and alerting, with a department's
+    raw row standing in until its first window closes; the other windows are
+    only published for `/metrics?window=...`.
+
+    Pathway updates a row as a retraction followed by an addition in the same
+    batch, so changes are only merged as they arrive; state is published and
+    scores and alerts recomputed once the batch's time closes. Recomputing in
+    between would see the department missing and close and reopen its alerts.
+
+    With several Pathway workers the department partitions are reduced in
+    parallel and their updates reach these callbacks interleaved, so merges are
+    serialized under a lock and keyed by Pathway row key (a retraction only
+    removes the row it retracts); raw rows are ordered by event time (an older
+    event never replaces a newer one).
     """
-    latest_raw_by_department: Dict[str, Dict] = {}
-    latest_windowed_by_department: Dict[str, Dict] = {}
+    latest_raw_by_department: Dict[str, Tuple[pw.Pointer, Dict]] = {}
+    # Window rows not yet superseded by a newer closed window, per window and
+    # department, keyed by Pathway row key; and the latest closed row of each.
+    open_by_window: Dict[str, Dict[str, Dict[pw.Pointer, Dict]]] = {
+        name: {} for name in windows
+    }
+    closed_by_window: Dict[str, Dict[str, Dict]] = {name: {} for name in windows}
+    # Watermark, in hops, each window's closed rows were last selected at.
+    selected_at_hop: Dict[str, Optional[float]] = {name: None for name in windows}
+    # Departments changed in the current batch, per window; and whether raw
+    # rows changed.
+    pending_by_window: Dict[str, Set[str]] = {name: set() for name in windows}
+    raw_pending = False
+    closed_primary = closed_by_window[primary_window]
+    merge_lock = Lock()
 
     def _rows_for_scoring() -> List[Dict]:
-        if latest_windowed_by_department:
-            return list(latest_windowed_by_department.values())
-        return list(latest_raw_by_department.values())
-
-    def on_change_raw(key: pw.Pointer, row: Dict, time: int, is_addition: bool) -> None:
-        dept = row["department"]
-        if is_addition:
-            latest_raw_by_department[dept] = row
-        else:
-            latest_raw_by_department.pop(dept, None)
-
-        metrics_state.update(list(latest_raw_by_department.values()))
-        source_rows = _rows_for_scoring()
-        _update_metrics_and_score(source_rows)
-        _update_alerts(source_rows)
-
-    def on_change_windowed(
-        key: pw.Pointer, row: Dict, time: int, is_addition: bool
-    ) -> None:
+        rows = dict(closed_primary)
+        for department, (_, row) in latest_raw_by_department.items():
+            rows.setdefault(department, row)
+        return list(rows.values())
+
+    def _select_closed(window_name: str, departments: List[str]) -> bool:
+        """Update the latest closed row of `departments`; True if any changed."""
+        watermark = freshness_tracker.watermark
+        if watermark is None:
+            return False
+        open_rows = open_by_window[window_name]
+        closed = closed_by_window[window_name]
+        changed = False
+        for department in departments:
+            rows = open_rows.get(department, {})
+            ends = {key: _to_epoch_seconds(row.get("window_end")) for key, row in rows.items()}
+            done = [key for key, end in ends.items() if end is not None and end <= watermark]
+            if not done:
+                if department in closed and not any(
+                    row is closed[department] for row in rows.values()
+                ):
+                    # The served window was retracted without a replacement.
+                    del closed[department]
+                    changed = True
+                continue
+            newest = max(done, key=lambda key: ends[key])
+            # Older windows can no longer be served; free them.
+            for key, end in ends.items():
+                if end is not None and end < ends[newest]:
+                    del rows[key]
+            if closed.get(department) is not rows[newest]:
+                closed[department] = rows[newest]
+                changed = True
+        return changed
+
+    def _merge(
+        latest: Dict[str, Tuple[pw.Pointer, Dict]],
+        key: pw.Pointer,
+        row: Dict,
+        is_addition: bool,
+        order_key: str,
+    ) -> bool:
         dept = row["department"]
+        current = latest.get(dept)
         if is_addition:
-            latest_windowed_by_department[dept] = row
-        else:
-            latest_windowed_by_department.pop(dept, None)
+            if current is not None and current[0] != key:
+                current_order = current[1].get(order_key)
+                if current_order is not None and row.get(order_key) is not None:
+                    if row[order_key] < current_order:
+                        return False
+            latest[dept] = (key, row)
+            return True
+        if current is not None and current[0] == key:
+            latest.pop(dept, None)
+            return True
+        return False
 
-        source_rows = _rows_for_scoring()
-        _update_metrics_and_score(source_rows)
-        _update_alerts(source_rows)
+    def on_change_raw(key: pw.Pointer, row: Dict, time: int, is_addition: bool) -> None:
+        nonlocal raw_pending
+        with SINK_CALLBACK_SECONDS.time(sink="raw"), merge_lock:
+            event_time = _to_epoch_seconds(row.get("timestamp")) if is_addition else None
+            in_time = True
+            if event_time is not None:
+                in_time = freshness_tracker.observe(row["department"], event_time)
+            # Every event in time is folded into the history and the detector,
+            # including one older than the department's latest row. An event too
+            # late for every window would skew the detector's running baseline
+            # and backfill closed history; skip both.
+            if is_addition and in_time:
+                _observe_event_lag("raw", row.get("timestamp"))
+                values = (row["energy_kwh"], row["medical_waste_kg"], row["paper_kg"])
+                if _detector is not None:
+                    _detector.update(row["department"], values)
+                if event_time is not None:
+                    history_store.record(row["department"], event_time, values)
+            if _merge(latest_raw_by_department, key, row, is_addition, "timestamp"):
+                raw_pending = True
+
+    def on_time_end_raw(time: int) -> None:
+        nonlocal raw_pending
+        with merge_lock:
+            if not raw_pending:
+                return
+            raw_pending = False
+            metrics_state.update([row for _, row in latest_raw_by_department.values()])
+            STATE_PUBLISH_TOTAL.inc(store="metrics")
+            _recompute(_rows_for_scoring())
+
+    def _windowed_callback(window_name: str):
+        open_rows = open_by_window[window_name]
+        closed = closed_by_window[window_name]
+        hop_seconds = specs[window_name].hop.total_seconds()
+        is_primary = window_name == primary_window
+
+        pending = pending_by_window[window_name]
+
+        def _store(key: pw.Pointer, row: Dict, is_addition: bool) -> None:
+            department = row["department"]
+            rows = open_rows.setdefault(department, {})
+            if not is_addition:
+                rows.pop(key, None)
+                return
+            served = closed.get(department)
+            if served is not None:
+                served_end = _to_epoch_seconds(served.get("window_end"))
+                window_end = _to_epoch_seconds(row.get("window_end"))
+                if None not in (served_end, window_end) and window_end < served_end:
+                    # Older than the window already served; it never will be again.
+                    return
+            rows[key] = row
+
+        def on_change_windowed(
+            key: pw.Pointer, row: Dict, time: int, is_addition: bool
+        ) -> None:
+            with SINK_CALLBACK_SECONDS.time(sink=f"windowed_{window_name}"), merge_lock:
+                _store(key, row, is_addition)
+                pending.add(row["department"])
+                if is_primary and is_addition:
+                    _observe_event_lag("windowed", row.get("window_end"))
+                    window_end = _to_epoch_seconds(row.get("window_end"))
+                    if window_end is not None:
+                        forecaster.observe(
+                            row["department"],
+                            window_end,
+                            (
+                                row["energy_kwh_avg"],
+                                row["medical_waste_kg_avg"],
+                                row["paper_kg_avg"],
+                            ),
+                            freshness_tracker.watermark,
+                        )
+
+        def on_time_end_windowed(time: int) -> None:
+            with merge_lock:
+                # Crossing a hop boundary closes a window for every department.
+                watermark = freshness_tracker.watermark
+                hop = None if watermark is None else watermark // hop_seconds
+                if hop != selected_at_hop[window_name]:
+                    selected_at_hop[window_name] = hop
+                    pending.update(open_rows)
+                if not pending:
+                    return
+                changed = _select_closed(window_name, list(pending))
+                pending.clear()
+                if not changed:
+                    return
+                windowed_metrics_state.update(window_name, list(closed.values()))
+                STATE_PUBLISH_TOTAL.inc(store=f"windowed_{window_name}")
+                if is_primary:
+                    _recompute(_rows_for_scoring())
+
+        return on_change_windowed, on_time_end_windowed
 
     def on_end() -> None:
-        latest_raw_by_department.clear()
-        latest_windowed_by_department.clear()
-        metrics_state.update([])
-        score_state.update({"overall_score": 0.0, "breakdown": {}})
-        alerts_state.replace_alerts([])
-
-    pw.io.subscribe(raw_metrics, on_change=on_change_raw, on_end=on_end)
-    pw.io.subscribe(windowed, on_change=on_change_windowed, on_end=on_end)
-
-
-def _metric_value(row: Dict, average_key: str, raw_key: str) -> float:
-    value = row.get(average_key)
+        nonlocal raw_pending
+        history_store.flush()
+        with merge_lock:
+            raw_pending = False
+            latest_raw_by_department.clear()
+            for window_name in windows:
+                open_by_window[window_name].clear()
+                closed_by_window[window_name].clear()
+                selected_at_hop[window_name] = None
+                pending_by_window[window_name].clear()
+            metrics_state.update([])
+            windowed_metrics_state.clear()
+            freshness_tracker.clear()
+            score_state.update({"overall_score": 0.0, "breakdown": {}})
+            alerts_state.replace_alerts([])
+            live_context_builder.rebuild([], {}, [])
+
+    pw.io.subscribe(
+        raw_metrics, on_change=on_change_raw, on_end=on_end, on_time_end=on_time_end_raw
+    )
+    for window_name, windowed in windows.items():
+        on_change, on_time_end = _windowed_callback(window_name)
+        pw.io.subscribe(
+            windowed, on_change=on_change, on_end=on_end, on_time_end=on_time_end
+        )
+
+
+def _recompute(source_rows: List[Dict]) -> None:
+    # One rules version per recompute, even if a reload lands midway.
+    rules = rules_engine.active()
+    departments = [row["department"] for row in source_rows]
+    usage = usage_matrix(source_rows)
+    with RECOMPUTE_SECONDS.time(stage="score"):
+        _update_metrics_and_score(rules, departments, usage)
+    STATE_PUBLISH_TOTAL.inc(store="score")
+    with RECOMPUTE_SECONDS.time(stage="alerts"):
+        _update_alerts(rules, departments, usage)
+    STATE_PUBLISH_TOTAL.inc(store="alerts")
+    with RECOMPUTE_SECONDS.time(stage="live_context"):
+        live_context_builder.rebuild(
+            source_rows, score_state.get_latest_score(), alerts_state.get_active_alerts()
+        )
+    STATE_PUBLISH_TOTAL.inc(store="live_context")
+
+
+def _to_epoch_seconds(value) -> Optional[float]:
     if value is None:
-        value = row.get(raw_key, 0.0)
-    return float(value)
-
-
-def _update_metrics_and_score(rows: List[Dict]) -> None:
-    # Simple scoring heuristic: 100 minus penalties from normalized usage.
-    if not rows:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    to_epoch = getattr(value, "timestamp", None)
+    if callable(to_epoch):
+        return float(to_epoch())
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def _observe_event_lag(sink: str, event_time) -> None:
+    event_epoch = _to_epoch_seconds(event_time)
+    if event_epoch is not None:
+        lag = max(0.0, datetime.now(timezone.utc).timestamp() - event_epoch)
+        STATE_EVENT_LAG_SECONDS.observe(lag, sink=sink)
+
+
+def _update_metrics_and_score(
+    rules: CompiledRules, departments: List[str], usage: np.ndarray
+) -> None:
+    # 100 minus per-unit penalties, weighted per department by the active rules.
+    if not departments:
         score_state.update({"overall_score": 0.0, "breakdown": {}})
         return
 
+    components, department_scores = rules.score(departments, usage)
     breakdown = {}
-    overall = 0.0
-
-    for row in rows:
-        dept = row["department"]
-        energy = _metric_value(row, "energy_kwh_avg", "energy_kwh")
-        waste = _metric_value(row, "medical_waste_kg_avg", "medical_waste_kg")
-        paper = _metric_value(row, "paper_kg_avg", "paper_kg")
-
-        energy_score = max(0.0, 100.0 - (energy / 10.0))
-        waste_score = max(0.0, 100.0 - (waste * 2.0))
-        paper_score = max(0.0, 100.0 - (paper * 1.5))
-
-        dept_score = (energy_score * 0.4) + (waste_score * 0.35) + (paper_score * 0.25)
+    for dept, (energy_score, waste_score, paper_score), dept_score in zip(
+        departments, components.tolist(), department_scores.tolist()
+    ):
         breakdown[dept] = {
             "energy_score": energy_score,
             "waste_score": waste_score,
             "paper_score": paper_score,
             "department_score": dept_score,
         }
-        overall += dept_score
 
-    overall_score = overall / max(1, len(rows))
+    overall_score = float(department_scores.mean())
     score_state.update({"overall_score": overall_score, "breakdown": breakdown})
 
 
-def _update_alerts(rows: List[Dict]) -> None:
-    alerts = []
-    for row in rows:
-        dept = row["department"]
-        energy = _metric_value(row, "energy_kwh_avg", "energy_kwh")
-        waste = _metric_value(row, "medical_waste_kg_avg", "medical_waste_kg")
-        paper = _metric_value(row, "paper_kg_avg", "paper_kg")
-
-        # Very simple anomaly heuristics using static thresholds.
-        if energy > 200:
-            alerts.append(
-                _build_alert(
-                    dept,
-                    "energy_anomaly",
-                    "high",
-                    f"Unusually high energy usage detected in {dept} (avg {energy:.1f} kWh).",
-                )
-            )
-        if waste > 40:
-            alerts.append(
-                _build_alert(
-                    dept,
-                    "waste_anomaly",
-                    "medium",
-                    f"Elevated medical waste generation in {dept} (avg {waste:.1f} kg).",
-                )
+def _update_alerts(rules: CompiledRules, departments: List[str], usage: np.ndarray) -> None:
+    alerts = _static_alerts(rules, departments, usage) if _static_rules_enabled else []
+    if _detector is not None:
+        alerts = _merge_alerts(alerts, _open_statistical_alerts(_detector.active_anomalies()))
+    alerts.extend(_open_forecast_alerts(forecaster.predicted_breaches()))
+    alerts_state.replace_alerts(alerts)
+
+
+def _static_alerts(rules: CompiledRules, departments: List[str], usage: np.ndarray) -> List[Dict]:
+    candidates = [
+        (alert.department, alert.alert_type, alert.severity, alert.message)
+        for alert in rules.evaluate_alerts(departments, usage)
+    ]
+    return _reuse_open_alerts(_static_alerts_open, candidates)
+
+
+_METRIC_LABELS = {
+    "energy_kwh": ("energy usage", "kWh"),
+    "medical_waste_kg": ("medical waste", "kg"),
+    "paper_kg": ("paper consumption", "kg"),
+}
+
+
+def _reuse_open_alerts(
+    cache: Dict[Tuple[str, str], Dict], candidates: List[Tuple[str, str, str, str]]
+) -> List[Dict]:
+    """Build alerts from (department, type, severity, message), reusing open ones."""
+    open_alerts: Dict[Tuple[str, str], Dict] = {}
+    for department, type_, severity, message in candidates:
+        key = (department, type_)
+        alert = cache.get(key)
+        if alert is None or alert["severity"] != severity:
+            alert = _build_alert(department, type_, severity, message)
+        open_alerts[key] = alert
+
+    cache.clear()
+    cache.update(open_alerts)
+    return list(open_alerts.values())
+
+
+def _open_statistical_alerts(anomalies: List[Anomaly]) -> List[Dict]:
+    candidates = []
+    for anomaly in anomalies:
+        label, unit = _METRIC_LABELS[anomaly.metric]
+        candidates.append(
+            (
+                anomaly.department,
+                anomaly.alert_type,
+                anomaly.severity,
+                f"{label.capitalize()} in {anomaly.department} deviates from its "
+                f"baseline ({anomaly.value:.1f} {unit} vs {anomaly.baseline:.1f} {unit}, "
+                f"z={anomaly.z_score:.1f}).",
             )
-        if paper > 30:
-            alerts.append(
-                _build_alert(
-                    dept,
-                    "paper_anomaly",
-                    "low",
-                    f"Paper consumption is above target in {dept} (avg {paper:.1f} kg).",
-                )
+        )
+    return _reuse_open_alerts(_statistical_alerts, candidates)
+
+
+def _open_forecast_alerts(breaches: List[PredictedBreach]) -> List[Dict]:
+    candidates = []
+    for breach in breaches:
+        label, unit = _METRIC_LABELS[breach.metric]
+        candidates.append(
+            (
+                breach.department,
+                breach.alert_type,
+                "medium",
+                f"{label.capitalize()} in {breach.department} is forecast to exceed "
+                f"its budget of {breach.budget:.0f} {unit} around "
+                f"{breach.eta.strftime('%H:%M')} UTC "
+                f"(predicted {breach.predicted_value:.1f} {unit}).",
             )
+        )
+    return _reuse_open_alerts(_forecast_alerts, candidates)
 
-    alerts_state.replace_alerts(alerts)
+
+_SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+def _merge_alerts(static_alerts: List[Dict], statistical_alerts: List[Dict]) -> List[Dict]:
+    # One alert per (department, type); the more severe source wins.
+    merged: Dict[Tuple[str, str], Dict] = {}
+    for alert in static_alerts + statistical_alerts:
+        key = (alert["department"], alert["type"])
+        current = merged.get(key)
+        if current is None or (
+            _SEVERITY_RANK[alert["severity"]] > _SEVERITY_RANK[current["severity"]]
+        ):
+            merged[key] = alert
+    return list(merged.values())
 
 
 def _build_alert(department: str, type_: str, severity: str, message: str) -> Dict:
@@ -0,0 +1,331 @@
+"""
+Scoring and static alert rules, loaded from a JSON file and hot-reloaded.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from observability.metrics import registry
+from transforms.anomaly import ALERT_TYPES, METRICS, STATIC_THRESHOLDS
+
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES: Tuple[str, ...] = ("low", "medium", "high")
+
+RULES_RELOAD_TOTAL = registry.counter(
+    "greenhealth_rules_reload_total",
+    "Rule file reload attempts by outcome.",
+    ("outcome",),
+)
+
+# The rules the pipeline shipped with; a rules file only needs to state what
+# it changes.
+DEFAULT_RULES: Dict = {
+    "version": "builtin",
+    "defaults": {
+        "weights": {"energy_kwh": 0.4, "medical_waste_kg": 0.35, "paper_kg": 0.25},
+        # Score points lost per unit of usage (100 - value * penalty, floored at 0).
+        "penalty_per_unit": {"energy_kwh": 0.1, "medical_waste_kg": 2.0, "paper_kg": 1.5},
+        "thresholds": {
+            "energy_kwh": [{"above": STATIC_THRESHOLDS[0], "severity": "high"}],
+            "medical_waste_kg": [{"above": STATIC_THRESHOLDS[1], "severity": "medium"}],
+            "paper_kg": [{"above": STATIC_THRESHOLDS[2], "severity": "low"}],
+        },
+    },
+    "sites": {},
+    "departments": {},
+}
+
+_ALERT_MESSAGES = {
+    "energy_kwh": "Unusually high energy usage detected in {department} (avg {value:.1f} kWh).",
+    "medical_waste_kg": "Elevated medical waste generation in {department} (avg {value:.1f} kg).",
+    "paper_kg": "Paper consumption is above target in {department} (avg {value:.1f} kg).",
+}
+
+
+def _metric_value(row: Dict, average_key: str, raw_key: str) -> float:
+    value = row.get(average_key)
+    if value is None:
+        value = row.get(raw_key, 0.0)
+    return float(value)
+
+
+def row_usage(row: Dict) -> Tuple[float, float, float]:
+    """Energy, waste and paper of one row (window averages, else raw readings)."""
+    return (
+        _metric_value(row, "energy_kwh_avg", "energy_kwh"),
+        _metric_value(row, "medical_waste_kg_avg", "medical_waste_kg"),
+        _metric_value(row, "paper_kg_avg", "paper_kg"),
+    )
+
+
+def usage_matrix(rows: Sequence[Dict]) -> np.ndarray:
+    """Energy, waste and paper per row (window averages, else raw readings)."""
+    usage = np.empty((len(rows), 3))
+    for index, row in enumerate(rows):
+        usage[index] = row_usage(row)
+    return usage
+
+
+def _overlay(base: Dict, override: Dict) -> Dict:
+    """`base` with the weights, penalties and thresholds `override` sets."""
+    merged = copy.deepcopy(base)
+    for section in ("weights", "penalty_per_unit", "thresholds"):
+        values = override.get(section)
+        if values is None:
+            continue
+        if not isinstance(values, dict):
+            raise ValueError(f"{section} must be an object keyed by metric.")
+        unknown = set(values) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metric(s) in {section}: {', '.join(sorted(unknown))}.")
+        merged[section].update(values)
+    return merged
+
+
+def _tiers(metric: str, raw) -> List[Tuple[float, str]]:
+    entries = raw if isinstance(raw, list) else [raw]
+    tiers = []
+    for entry in entries:
+        if entry is None:
+            continue
+        severity = str(entry.get("severity", "medium")).lower()
+        if severity not in SEVERITIES:
+            raise ValueError(f"Unknown severity {severity!r} for {metric}.")
+        tiers.append((float(entry["above"]), severity))
+    return tiers
+
+
+@dataclass(frozen=True)
+class StaticAlert:
+    department: str
+    metric: str
+    alert_type: str
+    severity: str
+    value: float
+
+    @property
+    def message(self) -> str:
+        return _ALERT_MESSAGES[self.metric].format(department=self.department, value=self.value)
+
+
+class CompiledRules:
+    """
+    Rules resolved per department into dense arrays.
+
+    Row 0 holds the defaults and every department named in the file (directly
+    or through a site) gets its own row, so evaluating a snapshot is a gather
+    by department followed by a few array operations over all departments at
+    once; nothing is interpreted per row.
+    """
+
+    def __init__(self, spec: Dict, version: str, source: Optional[str]):
+        self.version = version
+        self.source = source
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+
+        defaults = _overlay(DEFAULT_RULES["defaults"], spec.get("defaults") or {})
+        resolved: Dict[str, Dict] = {}
+        for site_name, site in (spec.get("sites") or {}).items():
+            site_rules = _overlay(defaults, site)
+            for department in site.get("departments") or []:
+                resolved[department] = site_rules
+        for department, override in (spec.get("departments") or {}).items():
+            base = resolved.get(department, defaults)
+            site_name = override.get("site")
+            if site_name is not None:
+                site = (spec.get("sites") or {}).get(site_name)
+                if site is None:
+                    raise ValueError(f"Department {department!r} refers to unknown site {site_name!r}.")
+                base = _overlay(defaults, site)
+            resolved[department] = _overlay(base, override)
+
+        self._index: Dict[str, int] = {department: row for row, department in enumerate(resolved, 1)}
+        rows = [defaults] + list(resolved.values())
+        metric_count = len(METRICS)
+        self.weights = np.zeros((len(rows), metric_count))
+        self.penalties = np.zeros((len(rows), metric_count))
+        # Lowest limit per severity; +inf where a severity is not configured.
+        self.limits = np.full((len(rows), metric_count, len(SEVERITIES)), np.inf)
+        for row, rules in enumerate(rows):
+            for column, metric in enumerate(METRICS):
+                self.weights[row, column] = float(rules["weights"][metric])
+                self.penalties[row, column] = float(rules["penalty_per_unit"][metric])
+                for limit, severity in _tiers(metric, rules["thresholds"].get(metric)):
+                    level = SEVERITIES.index(severity)
+                    self.limits[row, column, level] = min(self.limits[row, column, level], limit)
+        if (self.weights < 0).any() or (self.penalties < 0).any():
+            raise ValueError("Weights and penalties must not be negative.")
+        weight_totals = self.weights.sum(axis=1)
+        if (weight_totals <= 0).any():
+            raise ValueError("Weights must not all be zero.")
+        # Weights are relative; scores stay on the 0-100 scale.
+        self.weights /= weight_totals[:, None]
+
+    def _rows(self, departments: Sequence[str]) -> np.ndarray:
+        return np.fromiter(
+            (self._index.get(department, 0) for department in departments),
+            dtype=np.intp,
+            count=len(departments),
+        )
+
+    def score(self, departments: Sequence[str], values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-metric scores (... x N x metrics) and department scores (... x N)
+        for usage `values` of shape (... x N x metrics); leading axes, such as
+        one per what-if scenario, are broadcast.
+        """
+        rows = self._rows(departments)
+        components = np.maximum(0.0, 100.0 - values * self.penalties[rows])
+        return components, (components * self.weights[rows]).sum(axis=-1)
+
+    def alert_levels(self, departments: Sequence[str], values: np.ndarray) -> np.ndarray:
+        """Index into SEVERITIES of the alert per value (same shape), -1 where none."""
+        rows = self._rows(departments)
+        over = values[..., None] > self.limits[rows]
+        # Highest severity whose limit is exceeded.
+        levels = len(SEVERITIES) - 1 - over[..., ::-1].argmax(axis=-1)
+        return np.where(over.any(axis=-1), levels, -1)
+
+    def evaluate_alerts(self, departments: Sequence[str], values: np.ndarray) -> List[StaticAlert]:
+        levels = self.alert_levels(departments, values)
+        alerts = []
+        for row, column in zip(*np.nonzero(levels >= 0)):
+            alerts.append(
+                StaticAlert(
+                    department=departments[row],
+                    metric=METRICS[column],
+                    alert_type=ALERT_TYPES[column],
+                    severity=SEVERITIES[levels[row, column]],
+                    value=float(values[row, column]),
+                )
+            )
+        return alerts
+
+    def budgets(self, department: str) -> np.ndarray:
+        """Lowest alert limit per metric, which is the forecast budget."""
+        return self.limits[self._index.get(department, 0)].min(axis=1)
+
+    def status(self) -> Dict:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "departments_overridden": len(self._index),
+        }
+
+
+def compile_rules(raw: bytes, source: Optional[str]) -> CompiledRules:
+    spec = json.loads(raw)
+    if not isinstance(spec, dict):
+        raise ValueError("The rules file must contain a JSON object.")
+    version = str(spec.get("version") or hashlib.sha256(raw).hexdigest()[:12])
+    return CompiledRules(spec, version, source)
+
+
+class RulesEngine:
+    """
+    Holds the active compiled rules and swaps in new ones when the file changes.
+
+    A reload compiles the file completely before the reference is replaced, so
+    readers see either the old or the new rules, never a mix; a file that
+    fails to parse or validate leaves the current rules in place. Pathway keeps
+    running throughout, and the new rules apply from the next recompute.
+    """
+
+    def __init__(self, path: Optional[str] = None, poll_seconds: Optional[float] = None):
+        self.path = path if path is not None else os.getenv(
+            "GREENHEALTH_RULES_FILE", "./data/rules/scoring_rules.json"
+        )
+        self.poll_seconds = poll_seconds or float(os.getenv("GREENHEALTH_RULES_POLL_SECONDS", "5"))
+        self._active = CompiledRules(DEFAULT_RULES, "builtin", None)
+        self._fingerprint: Optional[Tuple[float, int]] = None
+        self._last_error: Optional[str] = None
+        self._listeners: List[Callable[[CompiledRules], None]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reload()
+
+    def active(self) -> CompiledRules:
+        return self._active
+
+    def add_listener(self, listener: Callable[[CompiledRules], None]) -> None:
+        self._listeners.append(listener)
+        listener(self._active)
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the file if it changed since the last attempt; True if rules were swapped."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path) if self.path else None
+            except FileNotFoundError:
+                stat = None
+            fingerprint = None if stat is None else (stat.st_mtime, stat.st_size)
+            if fingerprint == self._fingerprint and not force:
+                return False
+            self._fingerprint = fingerprint
+            if stat is None:
+                if self._active.source is None:
+                    return False
+                compiled = CompiledRules(DEFAULT_RULES, "builtin", None)
+                logger.warning("Rules file %s disappeared; using built-in rules.", self.path)
+            else:
+                try:
+                    with open(self.path, "rb") as handle:
+                        compiled = compile_rules(handle.read(), self.path)
+                except Exception as exc:
+                    self._last_error = f"{type(exc).__name__}: {exc}"
+                    RULES_RELOAD_TOTAL.inc(outcome="error")
+                    logger.error(
+                        "Rejected rules file %s (%s); keeping version %s.",
+                        self.path,
+                        self._last_error,
+                        self._active.version,
+                    )
+                    return False
+            self._active = compiled
+            self._last_error = None
+            RULES_RELOAD_TOTAL.inc(outcome="loaded")
+            logger.info("Rules version %s active (source=%s).", compiled.version, compiled.source)
+        for listener in self._listeners:
+            try:
+                listener(compiled)
+            except Exception:  # pragma: no cover - a listener must not block the swap
+                logger.exception("Rules listener failed.")
+        return True
+
+    def start_watching(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="rules-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.reload()
+            except Exception:  # pragma: no cover - keep watching
+                logger.exception("Rules reload failed.")
+
+    def status(self) -> Dict:
+        return {**self._active.status(), "last_error": self._last_error}
+
+
+rules_engine = RulesEngine()
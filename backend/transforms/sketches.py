@@ -0,0 +1,116 @@
+"""
+Mergeable streaming quantile sketches used as custom Pathway reducers.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Optional, Tuple
+
+import pathway as pw
+
+
+class DDSketch:
+    """
+    Log-bucketed quantile sketch with bounded relative error (DDSketch).
+
+    Values are counted in buckets whose boundaries grow geometrically, so the
+    memory is proportional to the value range rather than the sample count,
+    two sketches merge by adding bucket counts, and retracted rows are removed
+    by subtracting them.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.max: Optional[float] = None
+
+    def _index(self, value: float) -> int:
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _bin_value(self, index: int) -> float:
+        return 2.0 * self._gamma**index / (self._gamma + 1.0)
+
+    def add(self, value: float) -> None:
+        if value <= 0.0:
+            self.zero_count += 1
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "DDSketch") -> None:
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def subtract(self, other: "DDSketch") -> None:
+        for index, count in other.bins.items():
+            remaining = self.bins.get(index, 0) - count
+            if remaining > 0:
+                self.bins[index] = remaining
+            else:
+                self.bins.pop(index, None)
+        self.zero_count = max(0, self.zero_count - other.zero_count)
+        self.count = max(0, self.count - other.count)
+        if self.count == 0:
+            self.max = None
+        elif other.max is not None and self.max is not None and other.max >= self.max:
+            # The exact max may be gone; fall back to the top bucket's upper bound.
+            self.max = self._gamma ** max(self.bins) if self.bins else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(self._bin_value(index), self.max or float("inf"))
+        return self.max
+
+
+class QuantileAccumulator(pw.BaseCustomAccumulator):
+    """Pathway accumulator returning `(p50, p95, max)` of one numeric column."""
+
+    def __init__(self, sketch: DDSketch):
+        self.sketch = sketch
+
+    @classmethod
+    def neutral(cls) -> "QuantileAccumulator":
+        return cls(DDSketch())
+
+    @classmethod
+    def from_row(cls, row) -> "QuantileAccumulator":
+        [value] = row
+        sketch = DDSketch()
+        sketch.add(float(value))
+        return cls(sketch)
+
+    def update(self, other: "QuantileAccumulator") -> None:
+        self.sketch.merge(other.sketch)
+
+    def retract(self, other: "QuantileAccumulator") -> None:
+        self.sketch.subtract(other.sketch)
+
+    def compute_result(self) -> Tuple[float, float, float]:
+        return (
+            self.sketch.quantile(0.50) or 0.0,
+            self.sketch.quantile(0.95) or 0.0,
+            self.sketch.max or 0.0,
+        )
+
+
+quantiles = pw.reducers.udf_reducer(QuantileAccumulator)
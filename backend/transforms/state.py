@@ -2,7 +2,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from threading import Lock
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Receives (opened, closed) alerts whenever the active set changes.
+AlertsListener = Callable[[List[Dict], List[Dict]], None]
 
 
 @dataclass
@@ -19,6 +22,26 @@ class MetricsState:
             return list(self._rows)
 
 
+@dataclass
+class WindowedMetricsState:
+    """Latest row per department for each configured window size."""
+
+    _rows_by_window: Dict[str, List[Dict]] = field(default_factory=dict)
+    _lock: Lock = field(default_factory=Lock)
+
+    def update(self, window: str, rows: List[Dict]) -> None:
+        with self._lock:
+            self._rows_by_window[window] = rows
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows_by_window = {}
+
+    def get_latest_snapshot(self, window: str) -> List[Dict]:
+        with self._lock:
+            return list(self._rows_by_window.get(window, []))
+
+
 @dataclass
 class ScoreState:
     _score: Dict = field(default_factory=dict)
@@ -36,18 +59,90 @@ class ScoreState:
 @dataclass
 class AlertsState:
     _alerts: List[Dict] = field(default_factory=list)
+    # Copilot recommendations by (department, type), kept while such an alert
+    # is active, so one that reopens with a new id keeps its answer.
+    _recommendations: Dict[Tuple[str, str], Dict] = field(default_factory=dict)
     _lock: Lock = field(default_factory=Lock)
+    _listeners: List[AlertsListener] = field(default_factory=list)
+
+    def add_listener(self, listener: AlertsListener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
 
     def replace_alerts(self, alerts: List[Dict]) -> None:
         with self._lock:
+            previous = {alert["id"]: alert for alert in self._alerts}
             self._alerts = alerts
+            current_ids = {alert["id"] for alert in alerts}
+            current_keys = {(alert["department"], alert["type"]) for alert in alerts}
+            for key in list(self._recommendations):
+                if key not in current_keys:
+                    del self._recommendations[key]
+            listeners = list(self._listeners)
+        if not listeners:
+            return
+
+        opened = [alert for alert in alerts if alert["id"] not in previous]
+        closed = [alert for alert_id, alert in previous.items() if alert_id not in current_ids]
+        if opened or closed:
+            for listener in listeners:
+                listener(opened, closed)
 
     def get_active_alerts(self) -> List[Dict]:
         with self._lock:
             return list(self._alerts)
 
+    def attach_recommendation(self, department: str, type_: str, recommendation: Dict) -> bool:
+        """Attach a recommendation to the active alert of a pair; False if none is open."""
+        key = (department, type_)
+        with self._lock:
+            if not any((alert["department"], alert["type"]) == key for alert in self._alerts):
+                return False
+            self._recommendations[key] = recommendation
+            return True
+
+    def get_recommendations(self) -> Dict[Tuple[str, str], Dict]:
+        with self._lock:
+            return dict(self._recommendations)
+
+
+@dataclass
+class LiveContextState:
+    """Ready-made copilot context lines, hospital-wide and per department."""
+
+    _header: List[str] = field(default_factory=list)
+    _hospital: List[str] = field(default_factory=list)
+    _departments: Dict[str, List[str]] = field(default_factory=dict)
+    _lock: Lock = field(default_factory=Lock)
+
+    def publish(
+        self,
+        header: List[str],
+        hospital: List[str],
+        changed: Dict[str, List[str]],
+        removed: Iterable[str],
+    ) -> None:
+        with self._lock:
+            self._header = header
+            self._hospital = hospital
+            self._departments.update(changed)
+            for department in removed:
+                self._departments.pop(department, None)
+
+    def get_lines(self, department: Optional[str] = None) -> Optional[List[str]]:
+        """Context lines, or None if nothing was published for the department yet."""
+        with self._lock:
+            if department:
+                lines = self._departments.get(department)
+                return None if lines is None else self._header + lines
+            if not self._hospital:
+                return None
+            return self._header + self._hospital
+
 
 metrics_state = MetricsState()
+windowed_metrics_state = WindowedMetricsState()
 score_state = ScoreState()
 alerts_state = AlertsState()
+live_context_state = LiveContextState()
 
@@ -0,0 +1,93 @@
+"""
+Configurable set of sliding windows computed side by side in the pipeline.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import List, Optional
+
+
+DEFAULT_WINDOWS = "5m,15m/5m,1h,24h"
+DEFAULT_PRIMARY_WINDOW = "15m"
+DEFAULT_ALLOWED_LATENESS = "10m"
+
+_DURATION_PATTERN = re.compile(r"^\s*(\d+)\s*([smhdw])\s*$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+@dataclass(frozen=True)
+class WindowSpec:
+    name: str
+    duration: timedelta
+    hop: timedelta
+
+
+def parse_duration(raw_value: str) -> timedelta:
+    match = _DURATION_PATTERN.match(raw_value)
+    if not match:
+        raise ValueError(f"Invalid duration: {raw_value!r} (expected e.g. 15m, 1h).")
+    amount, unit = match.groups()
+    return timedelta(seconds=int(amount) * _UNIT_SECONDS[unit])
+
+
+def parse_window_specs(raw_value: str) -> List[WindowSpec]:
+    """
+    Parse `duration[/hop]` entries such as `5m,15m/5m,1h,24h`.
+
+    The hop defaults to a third of the duration, so each event lands in three
+    overlapping windows like the original 15m/5m configuration.
+    """
+    specs: List[WindowSpec] = []
+    seen = set()
+    for item in raw_value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        duration_text, _, hop_text = item.partition("/")
+        name = duration_text.strip()
+        if name in seen:
+            continue
+        duration = parse_duration(name)
+        hop = parse_duration(hop_text) if hop_text else duration / 3
+        specs.append(WindowSpec(name=name, duration=duration, hop=hop))
+        seen.add(name)
+    return specs
+
+
+def configured_window_specs() -> List[WindowSpec]:
+    return parse_window_specs(os.getenv("GREENHEALTH_WINDOWS", DEFAULT_WINDOWS))
+
+
+def primary_window_spec() -> WindowSpec:
+    """
+    Window whose rows drive scoring and alerting. Accepts the same
+    `duration[/hop]` syntax as GREENHEALTH_WINDOWS; a window configured there
+    with the same duration is used as is.
+    """
+    raw_value = os.getenv("GREENHEALTH_PRIMARY_WINDOW", DEFAULT_PRIMARY_WINDOW)
+    specs = parse_window_specs(raw_value)
+    if not specs:
+        raise ValueError(f"Invalid GREENHEALTH_PRIMARY_WINDOW: {raw_value!r}.")
+    return specs[0]
+
+
+def primary_window_name() -> str:
+    """Name (duration) of the primary window, the key its rows are published under."""
+    return primary_window_spec().name
+
+
+def allowed_lateness() -> Optional[timedelta]:
+    """
+    How long after a window ends late events may still update it.
+
+    `none` keeps every window open forever, which is what Pathway does without
+    a cutoff; state then grows with the number of windows ever seen.
+    """
+    raw_value = os.getenv("GREENHEALTH_WINDOW_ALLOWED_LATENESS", DEFAULT_ALLOWED_LATENESS)
+    if raw_value.strip().lower() in {"", "none", "off"}:
+        return None
+    return parse_duration(raw_value)